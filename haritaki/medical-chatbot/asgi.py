@@ -0,0 +1,470 @@
+# asgi.py
+"""Async (ASGI) entry point serving the same routes as main.py.
+
+Run with: hypercorn asgi:app --bind 0.0.0.0:$PORT
+
+Every blocking call (LLM requests, diagnosis, session storage) is awaited on a
+worker thread, so one process can keep many slow upstream requests in flight
+instead of pinning one gunicorn worker to each.
+"""
+import asyncio
+import json
+import os
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from datetime import datetime
+from quart import Quart, render_template, request, jsonify, send_file, abort, Response, g
+from quart_cors import cors
+from config import Config
+from report_index import download_name_options, find_report_file
+from report_retention import mark_downloaded
+import metrics
+import profiler
+import time
+import uuid
+
+# Share the chatbot, session store, report queue and index with the Flask app
+from main import (PORT, REPORTS_DIR, get_chatbot, get_patient_records, get_records_index, start_background_tasks,
+                  diagnosis_batch_error, sessions, report_jobs, report_index)
+from records_index import parse_date
+
+# Create Quart app
+app = Quart(
+    __name__,
+    template_folder=os.path.join(os.path.dirname(__file__), "templates"),
+    static_folder=os.path.join(os.path.dirname(__file__), "static")
+)
+
+app.secret_key = os.environ.get("SECRET_KEY", 'medical-chatbot-secret-key-2024')
+app = cors(app)
+
+_chatbot = None
+
+# Threads that only wait for session locks. They are kept apart from the
+# threads doing the work, so a pile of waiters can never starve the request
+# that holds the lock; per-stripe asyncio locks let at most one request per
+# stripe wait on a thread
+_lock_waiters = ThreadPoolExecutor(max_workers=sessions.LOCK_STRIPES, thread_name_prefix='session-lock')
+_stripe_locks = weakref.WeakKeyDictionary()
+
+@app.before_request
+async def start_request_timer():
+    # Label every stage timed during this request (worker threads inherit the context)
+    g.request_started = time.perf_counter()
+    g.metrics_route = request.url_rule.rule if request.url_rule else 'unmatched'
+    g.metrics_token = metrics.set_route(g.metrics_route)
+    # The event loop serves every request, so only the chatbot's worker threads are profiled
+    g.profile_token = profiler.begin(g.metrics_route, request.method, request.headers.get(profiler.PROFILE_HEADER),
+                                     attach_current=False)
+
+@app.after_request
+async def record_request_time(response):
+    if 'request_started' in g:
+        g.response_status = response.status_code
+        metrics.observe_request(g.metrics_route, request.method, response.status_code,
+                                time.perf_counter() - g.request_started)
+    return response
+
+@app.teardown_request
+async def reset_request_labels(error=None):
+    if 'profile_token' in g:
+        # Writes a file only for profiled or slow requests
+        profiler.end(g.pop('profile_token'), g.get('response_status', 500))
+    if 'metrics_token' in g:
+        metrics.reset_route(g.pop('metrics_token'))
+
+@app.before_serving
+async def build_chatbot():
+    # Build the chatbot and start the background threads before taking traffic, off the event loop
+    await get_chatbot_async()
+    await run_blocking(start_background_tasks)
+
+async def get_chatbot_async():
+    """The shared chatbot; if it isn't built yet, it is built on a worker thread"""
+    global _chatbot
+    if _chatbot is None:
+        _chatbot = await asyncio.to_thread(get_chatbot)
+    return _chatbot
+
+async def run_blocking(func, *args, **kwargs):
+    """Run a blocking call on the chatbot's ASYNC_BLOCKING_THREADS pool"""
+    chatbot = await get_chatbot_async()
+    return await chatbot.run_blocking(func, *args, **kwargs)
+
+def _stripe_lock(session_id):
+    """The event loop's lock for a session's stripe"""
+    locks = _stripe_locks.setdefault(asyncio.get_running_loop(), {})
+    return locks.setdefault(sessions.stripe(session_id), asyncio.Lock())
+
+@asynccontextmanager
+async def session_lock(session_id):
+    """Hold a session's store lock without blocking the event loop"""
+    # Requests for the same stripe queue up on the loop rather than on threads
+    async with _stripe_lock(session_id):
+        lock = sessions.lock(session_id)
+        # Waiting for the store lock (other processes may hold it) happens on a
+        # lock thread; releasing it never blocks
+        acquire = asyncio.get_running_loop().run_in_executor(_lock_waiters, lock.__enter__)
+        try:
+            await asyncio.shield(acquire)
+        except asyncio.CancelledError:
+            # The thread keeps waiting after the request is cancelled, so hand
+            # the lock straight back once it gets it
+            def release(future):
+                if not future.cancelled() and future.exception() is None:
+                    lock.__exit__(None, None, None)
+            acquire.add_done_callback(release)
+            raise
+        try:
+            yield
+        finally:
+            lock.__exit__(None, None, None)
+
+@app.route('/reports/<path:filename>')
+async def download_report(filename):
+    filepath = find_report_file(REPORTS_DIR, filename)
+    if not filepath:
+        abort(404)
+
+    etag = await run_blocking(report_index.etag_for, filepath)
+    relative_path = os.path.relpath(filepath, REPORTS_DIR)
+    mark_downloaded(filepath)
+
+    if Config.REPORT_SENDFILE_MODE == 'x-accel-redirect':
+        # nginx serves the bytes (including ranges) from an internal location
+        response = app.response_class(b'', mimetype='application/pdf')
+        response.headers['X-Accel-Redirect'] = Config.REPORT_ACCEL_PREFIX + relative_path
+        response.headers.set('Content-Disposition', 'attachment', **download_name_options(filename))
+        response.set_etag(etag)
+        response.last_modified = os.path.getmtime(filepath)
+        response.cache_control.private = True
+        response.cache_control.no_cache = True
+        return await response.make_conditional(request)
+
+    # Handles If-None-Match / If-Modified-Since (304) and Range (206)
+    response = await send_file(filepath, as_attachment=True, add_etags=False)
+    response.set_etag(etag)
+    response.cache_control.public = False
+    response.cache_control.max_age = None
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    response.expires = None
+    return await response.make_conditional(
+        request, accept_ranges=True, complete_length=os.path.getsize(filepath)
+    )
+
+@app.route('/')
+async def home():
+    return await render_template('index.html')
+
+@app.route('/api/start_session', methods=['POST'])
+async def start_session():
+    patient_data = await request.get_json()
+    if not patient_data:
+        return jsonify({'error': 'No patient data'}), 400
+
+    session_id = str(uuid.uuid4())
+
+    chatbot = await get_chatbot_async()
+    welcome_msg = chatbot.get_welcome_message(patient_data)
+
+    try:
+        await run_blocking(sessions.save, session_id, {
+            "patient_data": patient_data,
+            "conversation": [{
+                "role": "assistant",
+                "message": welcome_msg,
+                "timestamp": datetime.now().isoformat()
+            }]
+        })
+    except ValueError:
+        # Patient data alone is over SESSION_MAX_BYTES
+        return jsonify({'error': 'Patient data too large'}), 413
+
+    return jsonify({
+        "session_id": session_id,
+        "message": welcome_msg
+    })
+
+@app.route('/api/chat', methods=['POST'])
+async def chat():
+    data = await request.get_json()
+    user_message = data.get('message', '')
+    session_id = data.get('session_id')
+
+    if not user_message or not session_id:
+        return jsonify({'error': 'Missing message or session_id'}), 400
+
+    # Serialize turns within a session so concurrent requests don't drop messages;
+    # the LLM call inside is capped at LLM_QUEUE_TIMEOUT + LLM_TIMEOUT
+    async with session_lock(session_id):
+        session_data = await run_blocking(sessions.get, session_id)
+        if not session_data:
+            return jsonify({'error': 'Invalid session'}), 400
+
+        patient_data = session_data['patient_data']
+        conversation_history = session_data['conversation']
+
+        conversation_history.append({
+            'role': 'user',
+            'message': user_message,
+            'timestamp': datetime.now().isoformat()
+        })
+
+        chatbot = await get_chatbot_async()
+        ai_response = await chatbot.process_message_async(
+            user_message=user_message,
+            patient_data=patient_data,
+            conversation_history=conversation_history
+        )
+
+        conversation_history.append({
+            'role': 'assistant',
+            'message': ai_response['message'],
+            'type': ai_response.get('type', 'text'),
+            'data': ai_response.get('data', {}),
+            'timestamp': datetime.now().isoformat()
+        })
+
+        # The store keeps the last Config.MAX_CONVERSATION_HISTORY messages
+        await run_blocking(sessions.save, session_id, session_data)
+
+    return jsonify({
+        'response': ai_response,
+        'session_id': session_id
+    })
+
+@app.route('/api/chat/stream', methods=['POST'])
+async def chat_stream():
+    data = await request.get_json()
+    user_message = data.get('message', '')
+    session_id = data.get('session_id')
+
+    if not user_message or not session_id:
+        return jsonify({'error': 'Missing message or session_id'}), 400
+
+    if not await run_blocking(sessions.get, session_id):
+        return jsonify({'error': 'Invalid session'}), 400
+
+    def sse(event, payload):
+        return f"event: {event}\ndata: {json.dumps(payload, default=str)}\n\n"
+
+    async def generate():
+        # Record the user turn under the session lock, but don't hold it while
+        # streaming: the reply works from a snapshot of the conversation
+        async with session_lock(session_id):
+            session_data = await run_blocking(sessions.get, session_id)
+            if session_data:
+                patient_data = session_data['patient_data']
+                session_data['conversation'].append({
+                    'role': 'user',
+                    'message': user_message,
+                    'timestamp': datetime.now().isoformat()
+                })
+                await run_blocking(sessions.save, session_id, session_data)
+                conversation_history = list(session_data['conversation'])
+
+        if not session_data:
+            yield sse('error', {'error': 'Invalid session'})
+            return
+
+        ai_response = None
+        chatbot = await get_chatbot_async()
+        async for event, payload in chatbot.stream_message_async(user_message, patient_data, conversation_history):
+            if event == 'response':
+                ai_response = payload
+            yield sse(event, payload)
+
+        async with session_lock(session_id):
+            session_data = await run_blocking(sessions.get, session_id)
+            if session_data:
+                session_data['conversation'].append({
+                    'role': 'assistant',
+                    'message': ai_response['message'],
+                    'type': ai_response.get('type', 'text'),
+                    'data': ai_response.get('data', {}),
+                    'timestamp': datetime.now().isoformat()
+                })
+                await run_blocking(sessions.save, session_id, session_data)
+
+        yield sse('done', {'session_id': session_id})
+
+    response = Response(
+        generate(),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+    # A slow upstream must not cut the stream off
+    response.timeout = None
+    return response
+
+@app.route('/api/diagnosis', methods=['POST'])
+async def get_diagnosis():
+    data = await request.get_json()
+    symptoms = data.get('symptoms', [])
+    patient_data = data.get('patient_data', {})
+
+    if not symptoms:
+        return jsonify({'error': 'No symptoms provided'}), 400
+
+    chatbot = await get_chatbot_async()
+    diagnosis = await chatbot.get_diagnosis_async(symptoms, patient_data)
+    return jsonify(diagnosis)
+
+@app.route('/api/diagnosis/batch', methods=['POST'])
+async def get_diagnosis_batch():
+    data = await request.get_json(silent=True)
+    error = diagnosis_batch_error(data)
+    if error:
+        return jsonify({'error': error}), 400
+
+    chatbot = await get_chatbot_async()
+    results = await run_blocking(chatbot.symptom_checker.analyze_symptoms_batch, data['cases'])
+    return jsonify({'results': results})
+
+@app.route('/api/treatment', methods=['POST'])
+async def get_treatment():
+    data = await request.get_json()
+    diagnosis = data.get('diagnosis', {})
+    patient_data = data.get('patient_data', {})
+
+    if not diagnosis:
+        return jsonify({'error': 'No diagnosis provided'}), 400
+
+    chatbot = await get_chatbot_async()
+    treatment = await chatbot.get_treatment_plan_async(diagnosis, patient_data)
+    return jsonify(treatment)
+
+@app.route('/api/generate_report', methods=['POST'])
+async def generate_report():
+    data = await request.get_json()
+    session_id = data.get('session_id')
+
+    if not session_id:
+        return jsonify({'error': 'Session ID missing'}), 400
+
+    session_data = await run_blocking(sessions.get, session_id)
+    if not session_data:
+        return jsonify({'error': 'Invalid session'}), 400
+
+    patient_data = session_data['patient_data']
+    conversation = session_data['conversation']
+
+    chatbot = await get_chatbot_async()
+    report_data = chatbot.prepare_report_data(patient_data, conversation)
+
+    job_id = await run_blocking(report_jobs.submit, report_data, session_id)
+
+    return jsonify({
+        'job_id': job_id,
+        'status': 'queued',
+        'status_url': f'/api/report_status/{job_id}',
+        'message': 'Report generation started'
+    }), 202
+
+@app.route('/api/report_status/<job_id>')
+async def report_status(job_id):
+    status = report_jobs.status(job_id)
+    if not status:
+        return jsonify({'error': 'Unknown report job'}), 404
+
+    return jsonify(status)
+
+@app.route('/api/save_patient_record', methods=['POST'])
+async def save_patient_record():
+    data = await request.get_json()
+    patient_data = data.get('patient_data', {})
+    conversation = data.get('conversation', [])
+    diagnosis = data.get('diagnosis', {})
+    treatment = data.get('treatment', {})
+
+    if not patient_data:
+        return jsonify({'error': 'No patient data provided'}), 400
+
+    record = {
+        'patient_data': patient_data,
+        'conversation': conversation,
+        'diagnosis': diagnosis,
+        'treatment': treatment,
+        'saved_at': datetime.now().isoformat()
+    }
+    record_id = await run_blocking(get_patient_records().save, record)
+    await run_blocking(get_records_index().add, record_id, record)
+
+    return jsonify({
+        'record_id': record_id,
+        'message': 'Patient record saved successfully'
+    })
+
+@app.route('/api/records/search')
+async def search_records():
+    args = request.args
+    try:
+        limit = min(int(args.get('limit', 20)), Config.RECORDS_SEARCH_MAX_LIMIT)
+        date_from = parse_date(args['date_from']) if args.get('date_from') else None
+        date_to = parse_date(args['date_to'], end=True) if args.get('date_to') else None
+        page = await run_blocking(
+            get_records_index().search,
+            name=args.get('name'),
+            date_from=date_from,
+            date_to=date_to,
+            diagnosis=args.get('diagnosis'),
+            urgency=args.get('urgency'),
+            limit=max(limit, 1),
+            cursor=args.get('cursor')
+        )
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    return jsonify(page)
+
+@app.route('/api/patient_record/<record_id>')
+async def get_patient_record(record_id):
+    record = await run_blocking(get_patient_records().get, record_id)
+    if record is None:
+        return jsonify({'error': 'Unknown record'}), 404
+
+    return jsonify({'record_id': record_id, 'record': record})
+
+@app.route('/api/patient_record/<record_id>', methods=['DELETE'])
+async def delete_patient_record(record_id):
+    if await run_blocking(get_patient_records().get, record_id) is None:
+        return jsonify({'error': 'Unknown record'}), 404
+
+    # Tombstone the record, then drop it from search
+    await run_blocking(get_patient_records().delete, record_id)
+    await run_blocking(get_records_index().remove, record_id)
+
+    return jsonify({'record_id': record_id, 'message': 'Patient record deleted'})
+
+@app.route('/health')
+async def health_check():
+    return jsonify({"status": "healthy", "service": "medical-chatbot"})
+
+@app.route('/metrics')
+async def metrics_endpoint():
+    return Response(metrics.render(), content_type=metrics.CONTENT_TYPE)
+
+@app.route('/admin/profiles')
+async def list_profiles():
+    # Hidden unless PROFILE_ADMIN_TOKEN is set and presented
+    if not profiler.check_token(request.headers.get(profiler.ADMIN_HEADER)):
+        abort(404)
+
+    return jsonify({'profiles': await run_blocking(profiler.list_profiles)})
+
+@app.route('/admin/profiles/<name>')
+async def download_profile(name):
+    if not profiler.check_token(request.headers.get(profiler.ADMIN_HEADER)):
+        abort(404)
+
+    filepath = profiler.profile_path(name)
+    if not filepath:
+        abort(404)
+
+    return await send_file(filepath, as_attachment=True, mimetype='application/octet-stream')
+
+if __name__ == '__main__':
+    # Run app
+    app.run(host='0.0.0.0', port=PORT, debug=False)
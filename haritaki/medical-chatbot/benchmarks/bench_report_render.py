@@ -0,0 +1,96 @@
+# benchmarks/bench_report_render.py
+"""Compare per-report PDF render time: fresh generator per report vs the shared one.
+
+Usage: python benchmarks/bench_report_render.py [--reports 50]
+"""
+import argparse
+import math
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from report_generator import ReportGenerator
+
+SAMPLE_REPORT = {
+    'consultation_date': '2024-01-01 10:00:00',
+    'patient': {
+        'name': 'Jane Doe',
+        'age': 34,
+        'gender': 'Female',
+        'contact': 'jane@example.com',
+        'medical_history': 'Seasonal allergies'
+    },
+    'symptoms': ['fever', 'cough', 'sore throat', 'fatigue'],
+    'diagnosis': [
+        {'name': 'Influenza', 'confidence': '71%'},
+        {'name': 'Common Cold', 'confidence': '50%'}
+    ],
+    'treatment_plan': [
+        {'type': 'Rest', 'description': 'Rest and fluids for 3-5 days'},
+        {'type': 'Medication', 'description': 'Acetaminophen 500mg every 6 hours as needed'}
+    ],
+    'recommendations': [],
+    'summary': ''
+}
+
+
+def sample_report(i: int):
+    """Vary the content so the report cache never short-circuits a render"""
+    return dict(SAMPLE_REPORT, summary=f"Benchmark consultation {i} at {time.time()}")
+
+
+def bench_fresh(report_path: str, reports: int):
+    """Old behaviour: every report builds its own generator and style sheet"""
+    timings = []
+    for i in range(reports):
+        start = time.perf_counter()
+        ReportGenerator(report_path=report_path).generate_pdf_report(sample_report(i), f"fresh{i}")
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def bench_shared(report_path: str, reports: int):
+    """New behaviour: one pre-warmed generator renders every report"""
+    generator = ReportGenerator(report_path=report_path)
+    timings = []
+    for i in range(reports):
+        start = time.perf_counter()
+        generator.generate_pdf_report(sample_report(i), f"shared{i}")
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def summarize(label: str, timings):
+    timings_ms = sorted(t * 1000 for t in timings)
+    p95 = timings_ms[max(math.ceil(len(timings_ms) * 0.95) - 1, 0)]
+    print(f"{label:<8} mean {statistics.mean(timings_ms):7.2f} ms   "
+          f"median {statistics.median(timings_ms):7.2f} ms   p95 {p95:7.2f} ms")
+    return statistics.mean(timings_ms)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--reports', type=int, default=50, help='reports rendered per mode')
+    args = parser.parse_args()
+
+    import reportlab
+    print(f"{args.reports} reports per mode, Python {platform.python_version()}, "
+          f"ReportLab {reportlab.Version}, {platform.machine()}")
+
+    with tempfile.TemporaryDirectory() as report_path:
+        # Warm up imports and font loading so neither mode pays for them
+        bench_shared(report_path, 2)
+
+        before = summarize('fresh', bench_fresh(report_path, args.reports))
+        after = summarize('shared', bench_shared(report_path, args.reports))
+
+    print(f"speedup  {before / after:.2f}x per report")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+# benchmarks/bench_startup.py
+"""Measure cold import time of the web app with python -X importtime.
+
+Usage: python benchmarks/bench_startup.py [--module main] [--runs 5] [--threshold-ms 400]
+
+Exits non-zero when the median import time exceeds the threshold, or when a
+module that should load lazily (ReportLab, openai, numpy, scipy) is imported
+at startup.
+"""
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Only needed on first use; importing any of them at startup is a regression
+LAZY_MODULES = ('reportlab', 'openai', 'numpy', 'scipy')
+
+IMPORTTIME_LINE = re.compile(r'^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)')
+
+
+def measure(module: str):
+    """Import the module in a fresh interpreter; returns (module_us, per-module cumulative us)"""
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        cwd=APP_DIR, capture_output=True, text=True,
+        env=dict(os.environ, PYTHONDONTWRITEBYTECODE='1')
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{result.stderr[-2000:]}")
+
+    cumulative = {}
+    for line in result.stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if match:
+            cumulative[match.group(4)] = int(match.group(2))
+
+    # Interpreter startup (site, .pth hooks) is not the app's cost
+    return cumulative.get(module, 0), cumulative
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--module', default='main', help='module to import')
+    parser.add_argument('--runs', type=int, default=5, help='fresh interpreters to time')
+    parser.add_argument('--threshold-ms', type=float, default=400, help='fail above this median import time')
+    parser.add_argument('--top', type=int, default=10, help='slowest top-level imports to list')
+    args = parser.parse_args()
+
+    # First run warms the filesystem cache and is discarded
+    measure(args.module)
+
+    totals = []
+    cumulative = {}
+    for _ in range(args.runs):
+        module_us, cumulative = measure(args.module)
+        totals.append(module_us / 1000)
+
+    median_ms = statistics.median(totals)
+    print(f"import {args.module}: median {median_ms:.1f} ms, min {min(totals):.1f} ms over {args.runs} runs")
+
+    print("slowest imports (cumulative, last run):")
+    for name, cumulative_us in sorted(cumulative.items(), key=lambda item: item[1], reverse=True)[:args.top]:
+        print(f"  {cumulative_us / 1000:8.1f} ms  {name}")
+
+    eager = sorted({name.split('.')[0] for name in cumulative} & set(LAZY_MODULES))
+    failed = False
+    if eager:
+        print(f"FAIL: imported at startup but should be lazy: {', '.join(eager)}")
+        failed = True
+    if median_ms > args.threshold_ms:
+        print(f"FAIL: median {median_ms:.1f} ms exceeds threshold {args.threshold_ms:.0f} ms")
+        failed = True
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
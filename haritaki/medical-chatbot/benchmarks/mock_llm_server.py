@@ -0,0 +1,112 @@
+# benchmarks/mock_llm_server.py
+"""Local stand-in for the OpenAI chat completions API.
+
+Usage: python benchmarks/mock_llm_server.py [--port 8099] [--latency 0.5] [--error-rate 0.1]
+                                             [--token-delay 0.02]
+
+Point the app at it with OPENAI_API_BASE=http://127.0.0.1:8099/v1 to exercise
+timeouts, the concurrency cap and the circuit breaker without a real upstream.
+Requests with "stream": true get the reply word by word as server-sent events,
+token-delay apart, like the real API.
+"""
+import argparse
+import json
+import random
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def make_handler(latency: float, jitter: float, error_rate: float, token_delay: float = 0.02):
+    class MockLLMHandler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+            time.sleep(max(0.0, random.gauss(latency, jitter)))
+
+            if random.random() < error_rate:
+                self._reply(503, {'error': {'message': 'mock upstream overloaded', 'type': 'server_error'}})
+                return
+
+            last_message = (body.get('messages') or [{}])[-1].get('content', '')
+            content = f"Mock reply to: {last_message[:80]}"
+            if body.get('stream'):
+                self._stream(body.get('model', 'mock'), content)
+                return
+
+            self._reply(200, {
+                'id': 'chatcmpl-mock',
+                'object': 'chat.completion',
+                'created': int(time.time()),
+                'model': body.get('model', 'mock'),
+                'choices': [{
+                    'index': 0,
+                    'message': {'role': 'assistant', 'content': content},
+                    'finish_reason': 'stop'
+                }],
+                'usage': {'prompt_tokens': 0, 'completion_tokens': 0, 'total_tokens': 0}
+            })
+
+        def _reply(self, status: int, payload):
+            data = json.dumps(payload).encode('utf-8')
+            try:
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+            except (BrokenPipeError, ConnectionResetError):
+                # The client gave up (its deadline passed) before the reply was ready
+                pass
+
+        def _stream(self, model: str, content: str):
+            try:
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/event-stream')
+                self.send_header('Transfer-Encoding', 'chunked')
+                self.end_headers()
+                words = content.split(' ')
+                for i, word in enumerate(words):
+                    self._send_event({
+                        'id': 'chatcmpl-mock',
+                        'object': 'chat.completion.chunk',
+                        'created': int(time.time()),
+                        'model': model,
+                        'choices': [{'index': 0, 'delta': {'content': word if i == 0 else ' ' + word},
+                                     'finish_reason': None}]
+                    })
+                    time.sleep(token_delay)
+                self._send_event('[DONE]')
+                self.wfile.write(b'0\r\n\r\n')
+            except (BrokenPipeError, ConnectionResetError):
+                pass
+
+        def _send_event(self, payload):
+            data = payload if isinstance(payload, str) else json.dumps(payload)
+            event = f"data: {data}\n\n".encode('utf-8')
+            self.wfile.write(f"{len(event):x}\r\n".encode('ascii') + event + b'\r\n')
+            self.wfile.flush()
+
+        def log_message(self, format, *args):
+            pass
+
+    return MockLLMHandler
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--port', type=int, default=8099)
+    parser.add_argument('--latency', type=float, default=0.5, help='mean response delay in seconds')
+    parser.add_argument('--jitter', type=float, default=0.1, help='standard deviation of the delay')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='fraction of requests answered with 503')
+    parser.add_argument('--token-delay', type=float, default=0.02, help='delay between streamed words in seconds')
+    args = parser.parse_args()
+
+    handler = make_handler(args.latency, args.jitter, args.error_rate, args.token_delay)
+    server = ThreadingHTTPServer(('127.0.0.1', args.port), handler)
+    print(f"Mock LLM listening on http://127.0.0.1:{args.port}/v1")
+    server.serve_forever()
+
+
+if __name__ == '__main__':
+    main()
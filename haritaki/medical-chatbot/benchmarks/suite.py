@@ -0,0 +1,298 @@
+# benchmarks/suite.py
+"""Reproducible benchmark suite for the chat, diagnosis, treatment and report paths.
+
+Usage:
+  python -m benchmarks.suite run [--output results.json] [--only micro,macro,report] [--scale 1.0]
+  python -m benchmarks.suite compare benchmarks/baseline.json results.json [--tolerance 0.15]
+
+Record a baseline with `run --output benchmarks/baseline.json` on the machine
+the comparisons will run on; compare exits non-zero when any benchmark's
+median is slower than the baseline by more than the tolerance.
+"""
+import argparse
+import gc
+import json
+import math
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, APP_DIR)
+
+# Keep the run hermetic: no artificial pauses, and every file the app writes
+# (databases, record log, report jobs, reports) goes to a scratch directory.
+# This has to happen before config.py is imported
+_SCRATCH_DIR = tempfile.mkdtemp(prefix='medical-chatbot-bench-')
+os.environ.setdefault('THINKING_DELAY_MODE', 'off')
+os.environ.setdefault('SESSION_BACKEND', 'memory')
+os.environ['SESSION_DB_PATH'] = os.path.join(_SCRATCH_DIR, 'sessions.db')
+os.environ['LLM_CACHE_DB_PATH'] = os.path.join(_SCRATCH_DIR, 'llm_cache.db')
+os.environ['RECORDS_INDEX_DB_PATH'] = os.path.join(_SCRATCH_DIR, 'records_index.db')
+os.environ['METRICS_DIR'] = ''
+os.environ['PROFILE_DIR'] = ''
+
+from config import Config  # noqa: E402
+
+Config.PATIENT_RECORDS_PATH = os.path.join(_SCRATCH_DIR, 'patient_records')
+Config.REPORT_JOBS_PATH = os.path.join(_SCRATCH_DIR, 'report_jobs')
+Config.REPORT_PATH = os.path.join(_SCRATCH_DIR, 'reports')
+
+STUB_REPLY = "Based on what you've described, this sounds like a viral infection. Rest and fluids should help."
+
+PATIENT = {'name': 'Jane Doe', 'age': 34, 'gender': 'Female', 'medical_history': 'Seasonal allergies'}
+
+CHAT_MESSAGES = [
+    "I have a fever and a bad cough since yesterday",
+    "My head hurts and I feel nauseous",
+    "What can I take for a sore throat?",
+    "Hello doctor",
+    "I have abdominal pain and vomiting",
+    "Thank you so much!",
+]
+
+SYMPTOM_CASES = [
+    ['fever', 'cough', 'fatigue'],
+    ['headache', 'nausea', 'sensitivity to light'],
+    ['runny nose', 'sneezing', 'sore throat'],
+    ['abdominal pain', 'nausea', 'vomiting', 'fever'],
+    ['chest pain', 'shortness of breath'],
+]
+
+
+def stub_llm(latency_ms: float = 0.0):
+    """Replace the upstream LLM call with a canned reply (plus optional latency)"""
+    from llm_client import LLMClient
+
+    def chat(self, messages, **kwargs):
+        if latency_ms:
+            time.sleep(latency_ms / 1000)
+        return STUB_REPLY
+
+    LLMClient.chat = chat
+
+
+def measure(func, repeat: int, warmup: int = 3) -> dict:
+    """Time repeated calls; returns summary statistics in milliseconds"""
+    # A small --scale still times every benchmark at least once
+    repeat = max(repeat, 1)
+    for _ in range(warmup):
+        func()
+
+    gc_was_enabled = gc.isenabled()
+    gc.collect()
+    gc.disable()
+    try:
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            func()
+            timings.append((time.perf_counter() - start) * 1000)
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+
+    timings.sort()
+    return {
+        'unit': 'ms',
+        'runs': repeat,
+        'mean': statistics.mean(timings),
+        'median': statistics.median(timings),
+        'p95': timings[max(math.ceil(len(timings) * 0.95) - 1, 0)],
+        'min': timings[0]
+    }
+
+
+def cycle(items):
+    """Endless round-robin over items, so every call gets a fresh input"""
+    state = {'i': 0}
+
+    def next_item():
+        item = items[state['i'] % len(items)]
+        state['i'] += 1
+        return item
+    return next_item
+
+
+def micro_benchmarks(scale: float) -> dict:
+    from symptom_checker import SymptomChecker
+    from treatment_db import TreatmentDatabase
+    from medical_api import MedicalChatbot
+
+    results = {}
+    checker = SymptomChecker()
+    next_case = cycle(SYMPTOM_CASES)
+    results['micro.analyze_symptoms'] = measure(
+        lambda: checker.analyze_symptoms(next_case(), PATIENT), int(5000 * scale))
+
+    treatments = TreatmentDatabase()
+    next_diagnosis = cycle([
+        {'primary_diagnosis': 'Common Cold', 'severity': 'mild'},
+        {'primary_diagnosis': 'Influenza', 'severity': 'moderate', 'symptoms': ['fever', 'cough']},
+    ])
+    results['micro.get_treatment'] = measure(
+        lambda: treatments.get_treatment(next_diagnosis(), PATIENT), int(5000 * scale))
+
+    chatbot = MedicalChatbot()
+    next_message = cycle(CHAT_MESSAGES)
+
+    def process_uncached():
+        # Measure the full pipeline, not the response cache
+        chatbot.response_cache.clear()
+        chatbot.process_message(next_message(), PATIENT, [])
+    results['micro.process_message'] = measure(process_uncached, int(300 * scale))
+
+    results['micro.process_message_cached'] = measure(
+        lambda: chatbot.process_message(next_message(), PATIENT, []), int(1000 * scale))
+
+    return results
+
+
+def macro_benchmarks(scale: float) -> dict:
+    import main
+
+    client = main.app.test_client()
+    session_id = client.post('/api/start_session', json=PATIENT).get_json()['session_id']
+    next_message = cycle(CHAT_MESSAGES)
+    next_case = cycle(SYMPTOM_CASES)
+
+    def post(path, payload):
+        response = client.post(path, json=payload)
+        if response.status_code >= 400:
+            raise RuntimeError(f"{path} returned {response.status_code}: {response.get_data(as_text=True)[:200]}")
+
+    results = {}
+    results['macro.start_session'] = measure(
+        lambda: post('/api/start_session', PATIENT), int(300 * scale))
+    results['macro.chat'] = measure(
+        lambda: post('/api/chat', {'message': next_message(), 'session_id': session_id}), int(300 * scale))
+    results['macro.diagnosis'] = measure(
+        lambda: post('/api/diagnosis', {'symptoms': next_case(), 'patient_data': PATIENT}), int(300 * scale))
+    results['macro.treatment'] = measure(
+        lambda: post('/api/treatment', {'diagnosis': {'primary_diagnosis': 'Influenza', 'severity': 'moderate'},
+                                        'patient_data': PATIENT}), int(300 * scale))
+
+    batch = [{'symptoms': SYMPTOM_CASES[i % len(SYMPTOM_CASES)], 'patient_data': PATIENT} for i in range(500)]
+    results['macro.diagnosis_batch_500'] = measure(
+        lambda: post('/api/diagnosis/batch', {'cases': batch}), int(30 * scale))
+    results['macro.health'] = measure(lambda: client.get('/health'), int(1000 * scale))
+
+    return results
+
+
+def report_benchmarks(scale: float) -> dict:
+    from report_generator import ReportGenerator
+    from benchmarks.bench_report_render import sample_report
+
+    with tempfile.TemporaryDirectory(dir=_SCRATCH_DIR) as report_path:
+        generator = ReportGenerator(report_path=report_path)
+        counter = {'i': 0}
+
+        def render():
+            counter['i'] += 1
+            generator.generate_pdf_report(sample_report(counter['i']), f"bench{counter['i']}")
+
+        result = measure(render, int(50 * scale), warmup=2)
+        result['throughput_per_second'] = 1000 / result['median']
+        return {'report.generate_pdf_report': result}
+
+
+SUITES = {
+    'micro': micro_benchmarks,
+    'macro': macro_benchmarks,
+    'report': report_benchmarks,
+}
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=APP_DIR,
+                              capture_output=True, text=True).stdout.strip()
+    except OSError:
+        return ''
+
+
+def run(args):
+    stub_llm(args.llm_latency_ms)
+
+    benchmarks = {}
+    for name in args.only.split(','):
+        print(f"== {name}")
+        for bench, result in SUITES[name](args.scale).items():
+            benchmarks[bench] = result
+            print(f"  {bench:<36} median {result['median']:9.3f} ms   p95 {result['p95']:9.3f} ms")
+
+    results = {
+        'meta': {
+            'created': datetime.now().isoformat(),
+            'git_revision': git_revision(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'scale': args.scale,
+            'llm_latency_ms': args.llm_latency_ms
+        },
+        'benchmarks': benchmarks
+    }
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+        print(f"Wrote {args.output}")
+
+
+def compare(args):
+    with open(args.baseline) as f:
+        baseline = json.load(f)['benchmarks']
+    with open(args.results) as f:
+        current = json.load(f)['benchmarks']
+
+    regressions = []
+    print(f"{'benchmark':<36} {'baseline':>10} {'current':>10} {'change':>8}")
+    for name in sorted(set(baseline) | set(current)):
+        if name not in baseline or name not in current:
+            print(f"{name:<36} {'(only in ' + ('baseline' if name in baseline else 'current') + ')':>30}")
+            continue
+
+        before, after = baseline[name]['median'], current[name]['median']
+        change = (after - before) / before if before else 0.0
+        flag = ''
+        if change > args.tolerance:
+            flag = '  REGRESSION'
+            regressions.append(name)
+        elif change < -args.tolerance:
+            flag = '  faster'
+        print(f"{name:<36} {before:9.3f}ms {after:9.3f}ms {change:+8.1%}{flag}")
+
+    if regressions:
+        print(f"{len(regressions)} regression(s) beyond {args.tolerance:.0%}: {', '.join(regressions)}")
+        sys.exit(1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = commands.add_parser('run', help='run the suite')
+    run_parser.add_argument('--output', help='write results to this JSON file')
+    run_parser.add_argument('--only', default='micro,macro,report', help='comma-separated suites to run')
+    run_parser.add_argument('--scale', type=float, default=1.0, help='multiply every repetition count')
+    run_parser.add_argument('--llm-latency-ms', type=float, default=0.0, help='simulated LLM latency')
+    run_parser.set_defaults(func=run)
+
+    compare_parser = commands.add_parser('compare', help='compare results against a baseline')
+    compare_parser.add_argument('baseline')
+    compare_parser.add_argument('results')
+    compare_parser.add_argument('--tolerance', type=float, default=0.15, help='allowed slowdown (0.15 = 15%%)')
+    compare_parser.set_defaults(func=compare)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == '__main__':
+    main()
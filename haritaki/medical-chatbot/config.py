@@ -7,6 +7,8 @@ load_dotenv()
 class Config:
     # OpenAI Configuration
     OPENAI_API_KEY = os.getenv("OPENAI_API_KEY", "your-openai-api-key-here")
+    # Override to use a proxy or a local mock server (benchmarks/mock_llm_server.py)
+    OPENAI_API_BASE = os.getenv("OPENAI_API_BASE", "")
     
     # Model Configuration
     GPT_MODEL = "gpt-4"  # or "gpt-3.5-turbo" for faster responses
@@ -26,4 +28,88 @@ class Config:
     # Chatbot Settings
     MAX_SYMPTOMS = 10
     MIN_SYMPTOMS = 1
-    MAX_CONVERSATION_HISTORY = 20
\ No newline at end of file
+    MAX_CONVERSATION_HISTORY = 20
+    
+    # Batch diagnosis
+    MAX_DIAGNOSIS_BATCH = int(os.getenv("MAX_DIAGNOSIS_BATCH", 500))
+    
+    # Session storage ("memory" for a single process, "sqlite" to share across workers)
+    SESSION_BACKEND = os.getenv("SESSION_BACKEND", "memory")
+    SESSION_DB_PATH = os.getenv("SESSION_DB_PATH", "sessions.db")
+    SESSION_MAX_BYTES = int(os.getenv("SESSION_MAX_BYTES", 256 * 1024))
+    # Sessions not written for this long expire; expired ones are swept at most every SESSION_SWEEP_INTERVAL
+    SESSION_TTL = int(os.getenv("SESSION_TTL", 24 * 3600))
+    SESSION_SWEEP_INTERVAL = int(os.getenv("SESSION_SWEEP_INTERVAL", 600))
+    
+    # Background PDF rendering
+    REPORT_JOBS_PATH = "report_jobs"
+    REPORT_WORKERS = int(os.getenv("REPORT_WORKERS", 2))
+    # Jobs rendering for longer than this are reported as failed (queued jobs wait as long as needed)
+    REPORT_JOB_TIMEOUT = float(os.getenv("REPORT_JOB_TIMEOUT", 300))
+    
+    # Report downloads: "" streams from Python, "x-sendfile" (Apache/lighttpd) or
+    # "x-accel-redirect" (nginx) hands the file to the front proxy
+    REPORT_SENDFILE_MODE = os.getenv("REPORT_SENDFILE_MODE", "")
+    REPORT_ACCEL_PREFIX = os.getenv("REPORT_ACCEL_PREFIX", "/protected-reports/")
+    
+    # Report retention
+    REPORT_MAX_AGE_DAYS = float(os.getenv("REPORT_MAX_AGE_DAYS", 30))
+    REPORT_MAX_BYTES = int(os.getenv("REPORT_MAX_BYTES", 1024 * 1024 * 1024))
+    REPORT_SWEEP_INTERVAL = int(os.getenv("REPORT_SWEEP_INTERVAL", 600))
+    
+    # Chat response cache
+    RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", 1000))
+    RESPONSE_CACHE_MAX_BYTES = int(os.getenv("RESPONSE_CACHE_MAX_BYTES", 32 * 1024 * 1024))
+    RESPONSE_CACHE_TTL = int(os.getenv("RESPONSE_CACHE_TTL", 600))
+    
+    # "Thinking" pause before replies: "client" sends a typing_delay_ms hint for the
+    # browser to play, "server" sleeps on the request thread, "off" disables it (API clients)
+    THINKING_DELAY_MODE = os.getenv("THINKING_DELAY_MODE", "client")
+    
+    # Threads the ASGI app (asgi.py) uses for blocking LLM, diagnosis and storage calls
+    ASYNC_BLOCKING_THREADS = int(os.getenv("ASYNC_BLOCKING_THREADS", 256))
+    
+    # LLM client: per-call deadline, in-flight cap (and how long to wait for a slot),
+    # and the circuit breaker that switches to rule-based replies
+    LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", 20))
+    LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", 32))
+    LLM_QUEUE_TIMEOUT = float(os.getenv("LLM_QUEUE_TIMEOUT", 2))
+    LLM_BREAKER_FAILURES = int(os.getenv("LLM_BREAKER_FAILURES", 5))
+    LLM_BREAKER_RESET_SECONDS = float(os.getenv("LLM_BREAKER_RESET_SECONDS", 30))
+    LLM_SLOW_CALL_SECONDS = float(os.getenv("LLM_SLOW_CALL_SECONDS", 10))
+    
+    # Persistent LLM answer cache shared by all workers
+    LLM_CACHE_DB_PATH = os.getenv("LLM_CACHE_DB_PATH", "llm_cache.db")
+    LLM_CACHE_TTL = int(os.getenv("LLM_CACHE_TTL", 7 * 86400))
+    LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", 10000))
+    
+    # Patient record log (segments under PATIENT_RECORDS_PATH). fsync policy: "group"
+    # batches concurrent writers into one sync, "always" syncs each save, "none" leaves it to the OS
+    RECORD_SEGMENT_BYTES = int(os.getenv("RECORD_SEGMENT_BYTES", 64 * 1024 * 1024))
+    RECORD_FSYNC_POLICY = os.getenv("RECORD_FSYNC_POLICY", "group")
+    RECORD_FSYNC_INTERVAL_MS = float(os.getenv("RECORD_FSYNC_INTERVAL_MS", 0))
+    RECORD_COMPACT_RATIO = float(os.getenv("RECORD_COMPACT_RATIO", 0.5))
+    RECORD_COMPACT_INTERVAL = int(os.getenv("RECORD_COMPACT_INTERVAL", 3600))
+    
+    # Searchable index over saved patient records
+    RECORDS_INDEX_DB_PATH = os.getenv("RECORDS_INDEX_DB_PATH", "records_index.db")
+    RECORDS_SEARCH_MAX_LIMIT = int(os.getenv("RECORDS_SEARCH_MAX_LIMIT", 100))
+    
+    # Latency histograms on /metrics. Set METRICS_DIR (cleared on deploy) to merge
+    # the histograms of every worker process into each scrape
+    METRICS_DIR = os.getenv("METRICS_DIR", "")
+    METRICS_FLUSH_SECONDS = float(os.getenv("METRICS_FLUSH_SECONDS", 5))
+    
+    # Per-request profiling (see profiler.py). Requests slower than PROFILE_SLOW_MS are
+    # stack-sampled automatically; X-Profile-Request: <PROFILE_ADMIN_TOKEN> or
+    # PROFILE_SAMPLE_RATE runs a request under cProfile. Empty PROFILE_DIR turns it off
+    PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+    PROFILE_ADMIN_TOKEN = os.getenv("PROFILE_ADMIN_TOKEN", "")
+    PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", 0))
+    PROFILE_SLOW_MS = float(os.getenv("PROFILE_SLOW_MS", 2000))
+    PROFILE_SAMPLE_AFTER_MS = float(os.getenv("PROFILE_SAMPLE_AFTER_MS", 100))
+    PROFILE_SAMPLE_INTERVAL_MS = float(os.getenv("PROFILE_SAMPLE_INTERVAL_MS", 10))
+    PROFILE_MAX_FILES = int(os.getenv("PROFILE_MAX_FILES", 200))
+    
+    # Memoized raw symptom phrase -> canonical ID lookups (symptom_normalizer.py)
+    SYMPTOM_NORMALIZER_CACHE_SIZE = int(os.getenv("SYMPTOM_NORMALIZER_CACHE_SIZE", 4096))
\ No newline at end of file
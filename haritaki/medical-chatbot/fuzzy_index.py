@@ -0,0 +1,132 @@
+# fuzzy_index.py
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+
+
+def trigrams(text: str) -> List[str]:
+    """Distinct trigrams of each word, padded so word starts and ends count"""
+    grams = []
+    seen = set()
+    for word in text.lower().split():
+        padded = f"  {word} "
+        for i in range(len(padded) - 2):
+            gram = padded[i:i + 3]
+            if gram not in seen:
+                seen.add(gram)
+                grams.append(gram)
+    return grams
+
+
+class TrigramIndex:
+    def __init__(self, terms: Union[Iterable[str], Dict[str, str]] = ()):
+        """Build a trigram inverted index over lexicon terms.
+
+        terms is either a list of terms or a mapping of term (e.g. a synonym)
+        to the value suggested for it (e.g. its canonical symptom).
+        """
+        self.terms: List[str] = []
+        self.values: List[str] = []
+        self.gram_counts: List[int] = []
+        self.postings: Dict[str, List[int]] = {}
+        self.term_ids: Dict[str, int] = {}
+
+        # Flat posting arrays, built on the first search after a change
+        self._compiled = None
+
+        items = terms.items() if isinstance(terms, dict) else ((term, term) for term in terms)
+        for term, value in items:
+            self.add(term, value)
+
+    def add(self, term: str, value: Optional[str] = None):
+        """Index one term; re-adding a term only updates its value"""
+        key = ' '.join(term.lower().split())
+        if not key:
+            return
+        term_id = self.term_ids.get(key)
+        if term_id is not None:
+            self.values[term_id] = value or term
+            return
+
+        term_id = len(self.terms)
+        self.term_ids[key] = term_id
+        self.terms.append(key)
+        self.values.append(value or term)
+        grams = trigrams(key)
+        self.gram_counts.append(len(grams))
+        for gram in grams:
+            self.postings.setdefault(gram, []).append(term_id)
+        self._compiled = None
+
+    def __len__(self) -> int:
+        return len(self.terms)
+
+    def __contains__(self, term: str) -> bool:
+        return ' '.join(term.lower().split()) in self.term_ids
+
+    def _compile(self):
+        """Pack the postings into one array so a query counts them in C"""
+        import numpy as np
+
+        slices = {}
+        flat = []
+        for gram, term_ids in self.postings.items():
+            slices[gram] = (len(flat), len(flat) + len(term_ids))
+            flat.extend(term_ids)
+
+        self._compiled = (
+            slices,
+            np.array(flat, dtype=np.int32),
+            np.array(self.gram_counts, dtype=np.float32)
+        )
+        return self._compiled
+
+    def search(self, query: str, limit: int = 3, min_similarity: float = 0.45) -> List[Tuple[str, float]]:
+        """Ranked (value, score) suggestions for a possibly misspelled query.
+
+        The score averages trigram Jaccard similarity (penalizes typos and
+        extra words) with the share of the query's trigrams the term contains
+        (so "pain" still suggests "back pain"). Values are deduplicated, so
+        synonyms of one symptom yield a single suggestion.
+        """
+        import numpy as np
+
+        grams = trigrams(query)
+        if not grams or not self.terms:
+            return []
+
+        slices, postings, gram_counts = self._compiled or self._compile()
+        parts = [postings[start:end] for start, end in (slices[gram] for gram in grams if gram in slices)]
+        if not parts:
+            return []
+
+        # Shared trigram count for every term that has any
+        shared = np.bincount(np.concatenate(parts), minlength=len(self.terms))
+        candidates = np.flatnonzero(shared)
+        common = shared[candidates].astype(np.float32)
+        query_count = len(grams)
+        jaccard = common / (query_count + gram_counts[candidates] - common)
+        scores = (jaccard + common / query_count) / 2
+
+        keep = scores >= min_similarity
+        candidates, scores = candidates[keep], scores[keep]
+        if not len(candidates):
+            return []
+
+        # Best few by score; extra room for synonyms that collapse into one value
+        top = min(len(candidates), limit * 4)
+        best = np.argpartition(-scores, top - 1)[:top]
+        ranked = sorted(
+            ((float(scores[i]), int(candidates[i])) for i in best),
+            key=lambda item: (-item[0], len(self.terms[item[1]]), self.terms[item[1]])
+        )
+
+        results = []
+        seen = set()
+        for score, term_id in ranked:
+            value = self.values[term_id]
+            if value in seen:
+                continue
+            seen.add(value)
+            results.append((value, round(score, 3)))
+            if len(results) == limit:
+                break
+        return results
@@ -0,0 +1,65 @@
+# intent_router.py
+import re
+from typing import Callable, Dict, List, Optional, Set
+
+
+class IntentRouter:
+    def __init__(self, intents: Dict[str, List[str]], normalize: Optional[Callable[[str], str]] = None):
+        """Compile intent keyword lists into a single word-bounded matcher.
+
+        The order of ``intents`` is the dispatch priority: when a message hits
+        several intents, the one listed first wins. Keywords and messages both
+        go through ``normalize`` (lowercasing by default), e.g. phrase_key so
+        inflections of a keyword meet at one form.
+        """
+        self.normalize = normalize or str.lower
+        self.priority = {intent: rank for rank, intent in enumerate(intents)}
+
+        # Map every keyword back to the intents that own it
+        self.keyword_intents: Dict[str, Set[str]] = {}
+        for intent, keywords in intents.items():
+            for keyword in keywords:
+                self.keyword_intents.setdefault(self.normalize(keyword).strip(), set()).add(intent)
+
+        self.pattern = self._compile(self.keyword_intents)
+
+    def _compile(self, keywords) -> re.Pattern:
+        """Build one regex from a keyword trie so matching cost stays flat as lists grow"""
+        trie: Dict = {}
+        for keyword in keywords:
+            node = trie
+            for char in keyword:
+                node = node.setdefault(char, {})
+            node[''] = True
+
+        body = self._trie_to_regex(trie) if trie else '(?!)'
+        # Keywords must start and end on word boundaries so "hi" no longer hits "this"
+        return re.compile(rf'(?<!\w)(?:{body})(?!\w)')
+
+    def _trie_to_regex(self, node: Dict) -> str:
+        """Convert a trie node into a prefix-factored regex fragment"""
+        terminal = '' in node
+        branches = []
+        for char in sorted(key for key in node if key):
+            branches.append(re.escape(char) + self._trie_to_regex(node[char]))
+
+        if not branches:
+            return ''
+
+        if len(branches) == 1 and not terminal:
+            return branches[0]
+
+        group = '(?:' + '|'.join(branches) + ')'
+        # Trie branches are tried before the shorter terminal so the longest keyword wins
+        return group + '?' if terminal else group
+
+    def match(self, text: str) -> Set[str]:
+        """Return every intent whose keywords occur in text, in a single scan"""
+        hits = set()
+        for found in self.pattern.finditer(self.normalize(text)):
+            hits.update(self.keyword_intents.get(found.group(0), ()))
+        return hits
+
+    def classify(self, text: str) -> List[str]:
+        """Return the matched intents ordered by dispatch priority"""
+        return sorted(self.match(text), key=self.priority.__getitem__)
@@ -0,0 +1,175 @@
+# llm_cache.py
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+# Patient fields replaced by placeholders before an answer is stored
+TEMPLATE_FIELDS = (
+    ('name', '[[patient_name]]'),
+    ('contact', '[[patient_contact]]'),
+)
+
+# The patient is only templated where the answer opens by addressing them ("Hi Ann,")
+GREETING = r'\s*(?:(?i:hi|hello|hey|dear)\s+)?({})(?=\s*[,!.:])'
+
+# A hit refreshes last_used at most this often, so hot keys don't write on every read
+TOUCH_INTERVAL = 60
+
+
+def age_band(age) -> str:
+    """Coarse age group; answers rarely change within a band"""
+    try:
+        age = int(age)
+    except (TypeError, ValueError):
+        return 'unknown'
+
+    if age < 13:
+        return 'child'
+    if age < 18:
+        return 'teen'
+    if age < 40:
+        return 'adult'
+    if age < 65:
+        return 'middle_aged'
+    return 'senior'
+
+
+def _template_values(patient_data: Dict) -> List[Tuple[str, str]]:
+    """(value, placeholder) pairs, longest value first so full names beat first names"""
+    pairs = []
+    for field, placeholder in TEMPLATE_FIELDS:
+        value = str(patient_data.get(field) or '').strip()
+        if value:
+            pairs.append((value, placeholder))
+            if field == 'name' and ' ' in value:
+                pairs.append((value.split()[0], placeholder.replace('name', 'first_name')))
+    return sorted(pairs, key=lambda pair: len(pair[0]), reverse=True)
+
+
+class LLMAnswerCache:
+    """LLM answers keyed on clinical facets, shared by every worker through SQLite"""
+
+    def __init__(self, db_path: str, ttl_seconds: float = 7 * 86400, max_entries: int = 10000):
+        self.db_path = db_path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._local = threading.local()
+        self._sets = 0
+
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        conn = self._connection()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS answers ("
+            "key TEXT PRIMARY KEY, template TEXT NOT NULL, expires_at REAL NOT NULL, last_used REAL NOT NULL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS answers_last_used ON answers (last_used)")
+        conn.commit()
+
+    def _connection(self) -> sqlite3.Connection:
+        """One connection per thread, reopened after a fork"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def make_key(self, kind: str, intent: str, symptoms: List[str], patient_data: Dict, **facets) -> str:
+        """Hash the normalized facets that decide the answer, never the raw message text"""
+        payload = json.dumps([
+            kind,
+            intent,
+            sorted({' '.join(str(s).lower().split()) for s in symptoms}),
+            age_band(patient_data.get('age')),
+            str(patient_data.get('gender', '')).lower(),
+            facets
+        ], sort_keys=True, separators=(',', ':'), default=str)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def get(self, key: str, patient_data: Dict) -> Optional[str]:
+        """Cached answer personalized for this patient, or None"""
+        conn = self._connection()
+        now = time.time()
+        row = conn.execute(
+            "SELECT template, last_used FROM answers WHERE key = ? AND expires_at > ?", (key, now)
+        ).fetchone()
+        if not row:
+            return None
+
+        # LRU order only needs to be roughly right; most hits are read-only
+        if now - row[1] >= TOUCH_INTERVAL:
+            conn.execute("UPDATE answers SET last_used = ? WHERE key = ?", (now, key))
+            conn.commit()
+        return self.render(row[0], patient_data)
+
+    def set(self, key: str, answer: str, patient_data: Dict):
+        """Store an answer with this patient's identifiers templated out
+        (answers that can't be templated safely are not stored)"""
+        template = self.templatize(answer, patient_data)
+        if template is None:
+            return
+
+        now = time.time()
+        conn = self._connection()
+        conn.execute(
+            "INSERT OR REPLACE INTO answers (key, template, expires_at, last_used) VALUES (?, ?, ?, ?)",
+            (key, template, now + self.ttl_seconds, now)
+        )
+        conn.commit()
+
+        # Evict in batches rather than on every write
+        self._sets += 1
+        if self._sets % 100 == 0:
+            self.evict()
+
+    def evict(self):
+        """Drop expired answers, then least recently used ones beyond max_entries"""
+        conn = self._connection()
+        conn.execute("DELETE FROM answers WHERE expires_at <= ?", (time.time(),))
+        conn.execute(
+            "DELETE FROM answers WHERE key IN ("
+            "SELECT key FROM answers ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,)
+        )
+        conn.commit()
+
+    def templatize(self, answer: str, patient_data: Dict) -> Optional[str]:
+        """Replace the name in the answer's greeting with a placeholder.
+
+        Returns None when the patient's name or contact also appears anywhere
+        else: a name such as "Will" or "May" can't be told apart from the same
+        word in the medical text, which must not be refilled for the next patient.
+        """
+        values = _template_values(patient_data)
+        for value, placeholder in values:
+            if placeholder == '[[patient_contact]]':
+                continue
+            greeting = re.match(GREETING.format(re.escape(value)), answer)
+            if greeting:
+                answer = answer[:greeting.start(1)] + placeholder + answer[greeting.end(1):]
+                break
+
+        for value, _ in values:
+            # Whole words only, so a short name like "Al" leaves "Also" alone
+            if re.search(r'(?<!\w)' + re.escape(value) + r'(?!\w)', answer, re.IGNORECASE):
+                return None
+        return answer
+
+    def render(self, template: str, patient_data: Dict) -> str:
+        """Fill the placeholders with this patient's details"""
+        name = str(patient_data.get('name') or '').strip() or 'Patient'
+        values = {
+            '[[patient_name]]': name,
+            '[[patient_first_name]]': name.split()[0],
+            '[[patient_contact]]': str(patient_data.get('contact') or '')
+        }
+        for placeholder, value in values.items():
+            template = template.replace(placeholder, value)
+        return template
@@ -0,0 +1,179 @@
+# llm_client.py
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+
+class LLMUnavailable(Exception):
+    """The LLM could not answer in time; callers should use their rule-based reply"""
+
+
+class CircuitBreaker:
+    def __init__(self, failure_threshold: int = 5, reset_seconds: float = 30):
+        """Open after consecutive failures, then let one trial call through after a cool-down"""
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.state = 'closed'
+        self.failures = 0
+        self.opened_at = 0.0
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        """Whether a call may go upstream right now"""
+        with self._lock:
+            if self.state == 'closed':
+                return True
+
+            if self.state == 'open' and time.monotonic() - self.opened_at >= self.reset_seconds:
+                self.state = 'half_open'
+
+            # Half-open: exactly one trial call decides whether to close again
+            if self.state == 'half_open' and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.state = 'closed'
+            self.failures = 0
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._trial_in_flight = False
+            if self.state == 'half_open' or self.failures >= self.failure_threshold:
+                self.state = 'open'
+                self.opened_at = time.monotonic()
+
+
+class LLMClient:
+    def __init__(self, api_key: str, model: str, api_base: Optional[str] = None,
+                 timeout: float = 20, max_concurrency: int = 32, queue_timeout: float = 2,
+                 failure_threshold: int = 5, reset_seconds: float = 30, slow_call_seconds: float = 10):
+        """Chat completion client with pooled connections, a concurrency cap,
+        per-call deadlines and a circuit breaker.
+
+        timeout is a wall-clock deadline for the whole call. openai's
+        request_timeout only bounds each socket read, so completions are always
+        streamed and the deadline is checked as each chunk arrives.
+
+        Credentials are passed on every call rather than set on the openai module,
+        so api_base can point at a local mock server.
+        """
+        self.api_key = api_key
+        self.model = model
+        self.api_base = api_base or None
+        self.timeout = timeout
+        self.queue_timeout = queue_timeout
+        self.slow_call_seconds = slow_call_seconds
+
+        self.max_concurrency = max_concurrency
+
+        self.breaker = CircuitBreaker(failure_threshold, reset_seconds)
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+
+        # openai and the pooled session are set up on the first call
+        self.session = None
+        self._openai = None
+        self._setup_lock = threading.Lock()
+
+        self.calls = 0
+        self.failures = 0
+        self.rejected = 0
+        self._stats_lock = threading.Lock()
+
+    def _get_openai(self):
+        """Import openai and install the shared connection pool on first use"""
+        with self._setup_lock:
+            if self._openai is None:
+                import openai
+                import requests
+                from requests.adapters import HTTPAdapter
+
+                # One keep-alive pool shared by every thread, sized to the concurrency cap
+                self.session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=4, pool_maxsize=self.max_concurrency, max_retries=0)
+                self.session.mount('https://', adapter)
+                self.session.mount('http://', adapter)
+                # openai 0.28 only accepts a custom session through this module attribute
+                openai.requestssession = self.session
+                self._openai = openai
+            return self._openai
+
+    def chat(self, messages: List[Dict], on_delta: Optional[Callable[[str], None]] = None, **kwargs) -> str:
+        """Return the reply text, or raise LLMUnavailable.
+
+        With on_delta the completion is streamed and each piece of text is
+        passed to on_delta as it arrives; the full text is still returned.
+        """
+        # Shed load instead of queueing behind a slow upstream
+        if not self._slots.acquire(timeout=self.queue_timeout):
+            self._count('rejected')
+            raise LLMUnavailable('too many requests in flight')
+
+        if not self.breaker.allow():
+            self._slots.release()
+            self._count('rejected')
+            raise LLMUnavailable('circuit open')
+
+        start = time.monotonic()
+        timeout = kwargs.pop('timeout', self.timeout)
+        deadline = start + timeout
+        try:
+            self._count('calls')
+            completion = self._get_openai().ChatCompletion.create(
+                model=kwargs.pop('model', self.model),
+                messages=messages,
+                api_key=self.api_key,
+                api_base=self.api_base,
+                request_timeout=timeout,
+                stream=True,
+                **kwargs
+            )
+            parts = []
+            try:
+                for chunk in completion:
+                    # A reply that keeps trickling in must not hold its slot past the deadline
+                    if time.monotonic() > deadline:
+                        raise TimeoutError(f"no complete reply within {timeout:g}s")
+                    text = chunk['choices'][0].get('delta', {}).get('content')
+                    if text:
+                        parts.append(text)
+                        if on_delta is not None:
+                            on_delta(text)
+            finally:
+                # Stop reading a stream abandoned part way
+                if hasattr(completion, 'close'):
+                    completion.close()
+            reply = ''.join(parts)
+        except Exception as e:
+            self._count('failures')
+            self.breaker.record_failure()
+            raise LLMUnavailable(str(e)) from e
+        finally:
+            self._slots.release()
+
+        # A reply that arrives but is too slow still counts against the upstream
+        if time.monotonic() - start > self.slow_call_seconds:
+            self.breaker.record_failure()
+        else:
+            self.breaker.record_success()
+
+        return reply
+
+    def _count(self, counter: str):
+        with self._stats_lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def stats(self) -> Dict:
+        """Breaker state and call counters"""
+        return {
+            'state': self.breaker.state,
+            'calls': self.calls,
+            'failures': self.failures,
+            'rejected': self.rejected
+        }
@@ -1,13 +1,23 @@
 # main.py
 import os
-from flask import Flask, render_template, request, jsonify, send_from_directory
+from flask import Flask, render_template, request, jsonify, send_from_directory, abort, Response, stream_with_context, g
 from flask_cors import CORS
 from datetime import datetime
 from medical_api import MedicalChatbot
-from report_generator import ReportGenerator
+from config import Config
+from session_store import create_session_store
+from report_jobs import ReportJobQueue
+from report_index import ReportIndex, download_name_options, find_report_file
+from report_retention import RetentionManager, RetentionSweeper, mark_downloaded
+from record_store import RecordStore
+from records_index import RecordsIndex, parse_date
+import metrics
+import profiler
 import uuid
-
-SESSIONS = {}
+import json
+import threading
+import time
+from typing import Optional
 
 # Get PORT from Railway environment
 PORT = int(os.environ.get("PORT", 5000))
@@ -22,13 +32,176 @@ app = Flask(
 app.secret_key = os.environ.get("SECRET_KEY", 'medical-chatbot-secret-key-2024')
 CORS(app)
 
-# Initialize chatbot
-chatbot = MedicalChatbot()
+# Let the front proxy stream report bytes instead of this worker
+app.use_x_sendfile = Config.REPORT_SENDFILE_MODE == 'x-sendfile'
+
+REPORTS_DIR = os.path.join(os.path.dirname(__file__), Config.REPORT_PATH)
+
+# The chatbot and its knowledge base are built on the first request that needs them,
+# so workers serving only /health or static files start fast
+_chatbot = None
+_chatbot_lock = threading.Lock()
+
+def get_chatbot() -> MedicalChatbot:
+    global _chatbot
+    if _chatbot is None:
+        with _chatbot_lock:
+            if _chatbot is None:
+                _chatbot = MedicalChatbot()
+    return _chatbot
+
+# Session storage (use the sqlite backend when running more than one worker)
+sessions = create_session_store(
+    Config.SESSION_BACKEND,
+    os.path.join(os.path.dirname(__file__), Config.SESSION_DB_PATH)
+)
+
+# PDF renders run in a process pool so they never hold a request worker
+report_jobs = ReportJobQueue(
+    os.path.join(os.path.dirname(__file__), Config.REPORT_JOBS_PATH),
+    REPORTS_DIR,
+    max_workers=Config.REPORT_WORKERS,
+    job_timeout=Config.REPORT_JOB_TIMEOUT
+)
+
+# Content-addressed report index, also the source of download ETags
+report_index = ReportIndex(REPORTS_DIR)
+
+# Background eviction keeps reports/ within its age and disk quota
+report_sweeper = RetentionSweeper(
+    RetentionManager(
+        REPORTS_DIR,
+        max_age_seconds=Config.REPORT_MAX_AGE_DAYS * 86400,
+        max_bytes=Config.REPORT_MAX_BYTES
+    ),
+    interval_seconds=Config.REPORT_SWEEP_INTERVAL
+)
+
+# The record log, its search index and the background threads are opened on
+# first use, so importing the app (tests, CLI tools, a preloading master
+# process) starts nothing
+_patient_records = None
+_records_index = None
+_storage_lock = threading.Lock()
+_background_pid = None
+
+def get_patient_records() -> RecordStore:
+    """Append-only patient record log, compacted in the background"""
+    global _patient_records
+    if _patient_records is None:
+        with _storage_lock:
+            if _patient_records is None:
+                _patient_records = RecordStore(
+                    os.path.join(os.path.dirname(__file__), Config.PATIENT_RECORDS_PATH),
+                    segment_bytes=Config.RECORD_SEGMENT_BYTES,
+                    fsync_policy=Config.RECORD_FSYNC_POLICY,
+                    fsync_interval=Config.RECORD_FSYNC_INTERVAL_MS / 1000,
+                    compact_ratio=Config.RECORD_COMPACT_RATIO
+                )
+    return _patient_records
+
+def get_records_index() -> RecordsIndex:
+    """SQLite index for record search, kept current on save and delete
+    (reconcile it after restoring the log: python records_index.py rebuild)"""
+    global _records_index
+    if _records_index is None:
+        with _storage_lock:
+            if _records_index is None:
+                _records_index = RecordsIndex(os.path.join(os.path.dirname(__file__), Config.RECORDS_INDEX_DB_PATH))
+    return _records_index
+
+def start_background_tasks():
+    """Start the report sweeper and the record compactor (once per process)"""
+    global _background_pid
+    if _background_pid == os.getpid():
+        return
+    records = get_patient_records()
+    with _storage_lock:
+        if _background_pid != os.getpid():
+            report_sweeper.start()
+            records.start_compactor(Config.RECORD_COMPACT_INTERVAL)
+            _background_pid = os.getpid()
+
+def diagnosis_batch_error(data) -> Optional[str]:
+    """Why a /api/diagnosis/batch body is invalid, or None when it is fine"""
+    if not isinstance(data, dict):
+        return 'Request body must be a JSON object'
+
+    cases = data.get('cases')
+    if not cases:
+        return 'No cases provided'
+    if not isinstance(cases, list):
+        return 'cases must be a list'
+    if len(cases) > Config.MAX_DIAGNOSIS_BATCH:
+        return f'Too many cases (max {Config.MAX_DIAGNOSIS_BATCH})'
+
+    for i, case in enumerate(cases):
+        if not isinstance(case, dict):
+            return f'cases[{i}] must be an object'
+        # A bare string would otherwise be read one character at a time
+        symptoms = case.get('symptoms')
+        if symptoms is not None and (not isinstance(symptoms, list)
+                                     or not all(isinstance(symptom, str) for symptom in symptoms)):
+            return f'cases[{i}].symptoms must be a list of strings'
+        patient_data = case.get('patient_data')
+        if patient_data is not None and not isinstance(patient_data, dict):
+            return f'cases[{i}].patient_data must be an object'
+    return None
+
+@app.before_request
+def start_request_timer():
+    start_background_tasks()
+    # Label every stage timed during this request with its route template
+    g.request_started = time.perf_counter()
+    g.metrics_route = request.url_rule.rule if request.url_rule else 'unmatched'
+    g.metrics_token = metrics.set_route(g.metrics_route)
+    # Opt-in cProfile, plus stack sampling in case the request turns out slow
+    g.profile_token = profiler.begin(g.metrics_route, request.method, request.headers.get(profiler.PROFILE_HEADER))
+
+@app.after_request
+def record_request_time(response):
+    if 'request_started' in g:
+        g.response_status = response.status_code
+        metrics.observe_request(g.metrics_route, request.method, response.status_code,
+                                time.perf_counter() - g.request_started)
+    return response
+
+@app.teardown_request
+def reset_request_labels(error=None):
+    # Runs after a streamed response has finished, so profiles cover the whole stream
+    if 'profile_token' in g:
+        profiler.end(g.pop('profile_token'), g.get('response_status', 500))
+    if 'metrics_token' in g:
+        metrics.reset_route(g.pop('metrics_token'))
 
 @app.route('/reports/<path:filename>')
 def download_report(filename):
-    reports_dir = os.path.join(os.path.dirname(__file__), 'reports')
-    return send_from_directory(reports_dir, filename, as_attachment=True)
+    filepath = find_report_file(REPORTS_DIR, filename)
+    if not filepath:
+        abort(404)
+
+    etag = report_index.etag_for(filepath)
+    relative_path = os.path.relpath(filepath, REPORTS_DIR)
+    mark_downloaded(filepath)
+
+    if Config.REPORT_SENDFILE_MODE == 'x-accel-redirect':
+        # nginx serves the bytes (including ranges) from an internal location
+        response = app.response_class(mimetype='application/pdf')
+        response.headers['X-Accel-Redirect'] = Config.REPORT_ACCEL_PREFIX + relative_path
+        response.headers.set('Content-Disposition', 'attachment', **download_name_options(filename))
+        response.set_etag(etag)
+        response.last_modified = os.path.getmtime(filepath)
+        response.cache_control.private = True
+        response.cache_control.no_cache = True
+        return response.make_conditional(request)
+
+    # Handles If-None-Match / If-Modified-Since (304) and Range (206)
+    response = send_from_directory(
+        REPORTS_DIR, relative_path, as_attachment=True, conditional=True, etag=etag
+    )
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    return response
 
 @app.route('/')
 def home():
@@ -42,18 +215,20 @@ def start_session():
 
     session_id = str(uuid.uuid4())
 
-    SESSIONS[session_id] = {
-        "patient_data": patient_data,
-        "conversation": []
-    }
-
-    welcome_msg = chatbot.get_welcome_message(patient_data)
-
-    SESSIONS[session_id]["conversation"].append({
-        "role": "assistant",
-        "message": welcome_msg,
-        "timestamp": datetime.now().isoformat()
-    })
+    welcome_msg = get_chatbot().get_welcome_message(patient_data)
+
+    try:
+        sessions.save(session_id, {
+            "patient_data": patient_data,
+            "conversation": [{
+                "role": "assistant",
+                "message": welcome_msg,
+                "timestamp": datetime.now().isoformat()
+            }]
+        })
+    except ValueError:
+        # Patient data alone is over SESSION_MAX_BYTES
+        return jsonify({'error': 'Patient data too large'}), 413
 
     return jsonify({
         "session_id": session_id,
@@ -69,39 +244,103 @@ def chat():
     if not user_message or not session_id:
         return jsonify({'error': 'Missing message or session_id'}), 400
 
-    session_data = SESSIONS.get(session_id)
-    if not session_data:
-        return jsonify({'error': 'Invalid session'}), 400
-
-    patient_data = session_data['patient_data']
-    conversation_history = session_data['conversation']
+    # Serialize turns within a session so concurrent requests don't drop messages;
+    # the LLM call inside is capped at LLM_QUEUE_TIMEOUT + LLM_TIMEOUT
+    with sessions.lock(session_id):
+        session_data = sessions.get(session_id)
+        if not session_data:
+            return jsonify({'error': 'Invalid session'}), 400
+
+        patient_data = session_data['patient_data']
+        conversation_history = session_data['conversation']
+
+        conversation_history.append({
+            'role': 'user',
+            'message': user_message,
+            'timestamp': datetime.now().isoformat()
+        })
+
+        ai_response = get_chatbot().process_message(
+            user_message=user_message,
+            patient_data=patient_data,
+            conversation_history=conversation_history
+        )
+
+        conversation_history.append({
+            'role': 'assistant',
+            'message': ai_response['message'],
+            'type': ai_response.get('type', 'text'),
+            'data': ai_response.get('data', {}),
+            'timestamp': datetime.now().isoformat()
+        })
+
+        # The store keeps the last Config.MAX_CONVERSATION_HISTORY messages
+        sessions.save(session_id, session_data)
 
-    conversation_history.append({
-        'role': 'user',
-        'message': user_message,
-        'timestamp': datetime.now().isoformat()
+    return jsonify({
+        'response': ai_response,
+        'session_id': session_id
     })
 
-    ai_response = chatbot.process_message(
-        user_message=user_message,
-        patient_data=patient_data,
-        conversation_history=conversation_history
-    )
+@app.route('/api/chat/stream', methods=['POST'])
+def chat_stream():
+    data = request.json
+    user_message = data.get('message', '')
+    session_id = data.get('session_id')
 
-    conversation_history.append({
-        'role': 'assistant',
-        'message': ai_response['message'],
-        'type': ai_response.get('type', 'text'),
-        'data': ai_response.get('data', {}),
-        'timestamp': datetime.now().isoformat()
-    })
+    if not user_message or not session_id:
+        return jsonify({'error': 'Missing message or session_id'}), 400
 
-    SESSIONS[session_id]['conversation'] = conversation_history[-20:]
+    if not sessions.get(session_id):
+        return jsonify({'error': 'Invalid session'}), 400
 
-    return jsonify({
-        'response': ai_response,
-        'session_id': session_id
-    })
+    def sse(event, payload):
+        return f"event: {event}\ndata: {json.dumps(payload, default=str)}\n\n"
+
+    def generate():
+        # Record the user turn under the session lock, but don't hold it while
+        # streaming: the reply works from a snapshot of the conversation
+        with sessions.lock(session_id):
+            session_data = sessions.get(session_id)
+            if session_data:
+                patient_data = session_data['patient_data']
+                session_data['conversation'].append({
+                    'role': 'user',
+                    'message': user_message,
+                    'timestamp': datetime.now().isoformat()
+                })
+                sessions.save(session_id, session_data)
+                conversation_history = list(session_data['conversation'])
+
+        if not session_data:
+            yield sse('error', {'error': 'Invalid session'})
+            return
+
+        ai_response = None
+        for event, payload in get_chatbot().stream_message(user_message, patient_data, conversation_history):
+            if event == 'response':
+                ai_response = payload
+            yield sse(event, payload)
+
+        with sessions.lock(session_id):
+            session_data = sessions.get(session_id)
+            if session_data:
+                session_data['conversation'].append({
+                    'role': 'assistant',
+                    'message': ai_response['message'],
+                    'type': ai_response.get('type', 'text'),
+                    'data': ai_response.get('data', {}),
+                    'timestamp': datetime.now().isoformat()
+                })
+                sessions.save(session_id, session_data)
+
+        yield sse('done', {'session_id': session_id})
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
 
 @app.route('/api/diagnosis', methods=['POST'])
 def get_diagnosis():
@@ -112,9 +351,19 @@ def get_diagnosis():
     if not symptoms:
         return jsonify({'error': 'No symptoms provided'}), 400
 
-    diagnosis = chatbot.get_diagnosis(symptoms, patient_data)
+    diagnosis = get_chatbot().get_diagnosis(symptoms, patient_data)
     return jsonify(diagnosis)
 
+@app.route('/api/diagnosis/batch', methods=['POST'])
+def get_diagnosis_batch():
+    data = request.get_json(silent=True)
+    error = diagnosis_batch_error(data)
+    if error:
+        return jsonify({'error': error}), 400
+
+    results = get_chatbot().symptom_checker.analyze_symptoms_batch(data['cases'])
+    return jsonify({'results': results})
+
 @app.route('/api/treatment', methods=['POST'])
 def get_treatment():
     data = request.json
@@ -124,7 +373,7 @@ def get_treatment():
     if not diagnosis:
         return jsonify({'error': 'No diagnosis provided'}), 400
 
-    treatment = chatbot.get_treatment_plan(diagnosis, patient_data)
+    treatment = get_chatbot().get_treatment_plan(diagnosis, patient_data)
     return jsonify(treatment)
 
 @app.route('/api/generate_report', methods=['POST'])
@@ -135,22 +384,31 @@ def generate_report():
     if not session_id:
         return jsonify({'error': 'Session ID missing'}), 400
 
-    session_data = SESSIONS.get(session_id)
+    session_data = sessions.get(session_id)
     if not session_data:
         return jsonify({'error': 'Invalid session'}), 400
 
     patient_data = session_data['patient_data']
     conversation = session_data['conversation']
 
-    report_generator = ReportGenerator()
-    report_data = chatbot.prepare_report_data(patient_data, conversation)
+    report_data = get_chatbot().prepare_report_data(patient_data, conversation)
 
-    pdf_path = report_generator.generate_pdf_report(report_data, session_id)
+    job_id = report_jobs.submit(report_data, session_id)
 
     return jsonify({
-        'report_url': f'/reports/{os.path.basename(pdf_path)}',
-        'message': 'Report generated successfully'
-    })
+        'job_id': job_id,
+        'status': 'queued',
+        'status_url': f'/api/report_status/{job_id}',
+        'message': 'Report generation started'
+    }), 202
+
+@app.route('/api/report_status/<job_id>')
+def report_status(job_id):
+    status = report_jobs.status(job_id)
+    if not status:
+        return jsonify({'error': 'Unknown report job'}), 404
+
+    return jsonify(status)
 
 @app.route('/api/save_patient_record', methods=['POST'])
 def save_patient_record():
@@ -163,22 +421,88 @@ def save_patient_record():
     if not patient_data:
         return jsonify({'error': 'No patient data provided'}), 400
 
-    record_id = chatbot.save_patient_record(
-        patient_data=patient_data,
-        conversation=conversation,
-        diagnosis=diagnosis,
-        treatment=treatment
-    )
+    record = {
+        'patient_data': patient_data,
+        'conversation': conversation,
+        'diagnosis': diagnosis,
+        'treatment': treatment,
+        'saved_at': datetime.now().isoformat()
+    }
+    record_id = get_patient_records().save(record)
+    get_records_index().add(record_id, record)
 
     return jsonify({
         'record_id': record_id,
         'message': 'Patient record saved successfully'
     })
 
+@app.route('/api/records/search')
+def search_records():
+    args = request.args
+    try:
+        limit = min(int(args.get('limit', 20)), Config.RECORDS_SEARCH_MAX_LIMIT)
+        date_from = parse_date(args['date_from']) if args.get('date_from') else None
+        date_to = parse_date(args['date_to'], end=True) if args.get('date_to') else None
+        page = get_records_index().search(
+            name=args.get('name'),
+            date_from=date_from,
+            date_to=date_to,
+            diagnosis=args.get('diagnosis'),
+            urgency=args.get('urgency'),
+            limit=max(limit, 1),
+            cursor=args.get('cursor')
+        )
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    return jsonify(page)
+
+@app.route('/api/patient_record/<record_id>')
+def get_patient_record(record_id):
+    record = get_patient_records().get(record_id)
+    if record is None:
+        return jsonify({'error': 'Unknown record'}), 404
+
+    return jsonify({'record_id': record_id, 'record': record})
+
+@app.route('/api/patient_record/<record_id>', methods=['DELETE'])
+def delete_patient_record(record_id):
+    if get_patient_records().get(record_id) is None:
+        return jsonify({'error': 'Unknown record'}), 404
+
+    # Tombstone the record, then drop it from search
+    get_patient_records().delete(record_id)
+    get_records_index().remove(record_id)
+
+    return jsonify({'record_id': record_id, 'message': 'Patient record deleted'})
+
 @app.route('/health')
 def health_check():
     return jsonify({"status": "healthy", "service": "medical-chatbot"})
 
+@app.route('/metrics')
+def metrics_endpoint():
+    return Response(metrics.render(), content_type=metrics.CONTENT_TYPE)
+
+@app.route('/admin/profiles')
+def list_profiles():
+    # Hidden unless PROFILE_ADMIN_TOKEN is set and presented
+    if not profiler.check_token(request.headers.get(profiler.ADMIN_HEADER)):
+        abort(404)
+
+    return jsonify({'profiles': profiler.list_profiles()})
+
+@app.route('/admin/profiles/<name>')
+def download_profile(name):
+    if not profiler.check_token(request.headers.get(profiler.ADMIN_HEADER)):
+        abort(404)
+
+    if not profiler.profile_path(name):
+        abort(404)
+
+    return send_from_directory(profiler.profile_dir(), name, as_attachment=True,
+                               mimetype='application/octet-stream')
+
 if __name__ == '__main__':
     # Create necessary directories
     os.makedirs('patient_records', exist_ok=True)
@@ -1,20 +1,55 @@
 # medical_api.py
-import openai
 import json
 import os
 from datetime import datetime
 from typing import Dict, List, Any
 import random
+import re
 import time
+import heapq
+import asyncio
+import functools
+import contextvars
+import threading
+import queue
+from concurrent.futures import ThreadPoolExecutor
 from config import Config
 from symptom_checker import SymptomChecker
 from treatment_db import TreatmentDatabase
+from intent_router import IntentRouter
+from symptom_index import SymptomIndex
+from response_cache import ResponseCache
+from llm_client import LLMClient, LLMUnavailable
+from llm_cache import LLMAnswerCache, age_band
+from symptom_normalizer import get_normalizer, phrase_key
+import metrics
+import profiler
+
+# Set while a reply is being streamed: LLM text is passed to it as it arrives
+_llm_delta_sink = contextvars.ContextVar('llm_delta_sink', default=None)
 
 class MedicalChatbot:
     def __init__(self):
         """Initialize the medical chatbot with enhanced personality"""
-        # Set OpenAI API key
-        openai.api_key = Config.OPENAI_API_KEY
+        # Pooled, rate-limited LLM client; replies fall back to the rule-based text
+        self.llm = LLMClient(
+            api_key=Config.OPENAI_API_KEY,
+            model=Config.GPT_MODEL,
+            api_base=Config.OPENAI_API_BASE,
+            timeout=Config.LLM_TIMEOUT,
+            max_concurrency=Config.LLM_MAX_CONCURRENCY,
+            queue_timeout=Config.LLM_QUEUE_TIMEOUT,
+            failure_threshold=Config.LLM_BREAKER_FAILURES,
+            reset_seconds=Config.LLM_BREAKER_RESET_SECONDS,
+            slow_call_seconds=Config.LLM_SLOW_CALL_SECONDS
+        )
+        
+        # LLM answers shared across workers, keyed on intent, symptoms and age band
+        self.llm_cache = LLMAnswerCache(
+            os.path.join(os.path.dirname(__file__), Config.LLM_CACHE_DB_PATH),
+            ttl_seconds=Config.LLM_CACHE_TTL,
+            max_entries=Config.LLM_CACHE_MAX_ENTRIES
+        )
         
         # Initialize symptom checker and treatment database
         self.symptom_checker = SymptomChecker()
@@ -23,6 +58,28 @@ class MedicalChatbot:
         # Medical knowledge base - expanded
         self.medical_knowledge = self._load_medical_knowledge()
         
+        # Extracted symptoms become canonical IDs, so synonyms score the same disease
+        self.symptom_normalizer = get_normalizer()
+        self.symptom_normalizer.register_terms(self.medical_knowledge['symptoms_db'])
+        for info in self.medical_knowledge['common_diseases'].values():
+            self.symptom_normalizer.register_terms(info['symptoms'])
+        self.disease_index = SymptomIndex({
+            disease: {'symptoms': self.symptom_normalizer.normalize_all(info['symptoms'])}
+            for disease, info in self.medical_knowledge['common_diseases'].items()
+        })
+        
+        # Compiled keyword matcher used to route every message; keywords and
+        # messages are lemmatized the same way symptom phrases are
+        self.intent_router = IntentRouter(self._load_intent_keywords(), normalize=phrase_key)
+        
+        # Symptom phrases and condition names are matched the same way; symptom
+        # phrases are lemmatized so inflections ("coughing", "headaches") still hit
+        symptom_phrases = {}
+        for phrase, symptom_id in self.symptom_normalizer.variants().items():
+            symptom_phrases.setdefault(symptom_id, []).append(phrase_key(phrase))
+        self.symptom_router = IntentRouter(symptom_phrases)
+        self.disease_router = IntentRouter(self._load_disease_aliases())
+        
         # Human-like behavior configurations
         self.doctor_personalities = [
             {"name": "Dr. Smith", "style": "warm", "emoji": "👨‍⚕️", "greeting": "Hello there"},
@@ -34,11 +91,20 @@ class MedicalChatbot:
         self.conversation_memory = {}
         
         # Response cache for faster replies
-        self.response_cache = {}
+        self.response_cache = ResponseCache(
+            max_entries=Config.RESPONSE_CACHE_MAX_ENTRIES,
+            max_bytes=Config.RESPONSE_CACHE_MAX_BYTES,
+            ttl_seconds=Config.RESPONSE_CACHE_TTL,
+            name='response'
+        )
         
         # Current doctor personality
         self.current_doctor = random.choice(self.doctor_personalities)
         
+        # Worker threads for the async API, created on first use
+        self._blocking_executor = None
+        self._executor_lock = threading.Lock()
+        
     def _load_medical_knowledge(self) -> Dict:
         """Load enhanced medical knowledge base"""
         return {
@@ -128,6 +194,25 @@ class MedicalChatbot:
             ]
         }
     
+    def _load_intent_keywords(self) -> Dict[str, List[str]]:
+        """Load intent keywords, listed in dispatch priority order"""
+        return {
+            # Matched on whole lemmatized words: inflections meet, spelling variants are listed explicitly
+            "emergency": ["emergency", "emergencies", "911", "heart attack", "heart attacks", "stroke", "strokes",
+                          "bleeding", "bleed", "bleeds", "unconscious", "unresponsive", "can't breathe",
+                          "can’t breathe", "cant breathe", "cannot breathe", "can not breathe"],
+            "treatment": ["treatment", "treatments", "medicine", "medicines", "medication", "medications",
+                          "prescription", "prescriptions", "drug", "drugs"],
+            "report": ["report", "reports", "summary", "record", "records", "download", "document", "documents"],
+            "thanks": ["thank", "thanks", "thank you", "thankful", "appreciate", "appreciated", "grateful"],
+            "greeting": ["hi", "hello", "hey", "greetings", "morning", "afternoon"],
+            "personal_greeting": ["how are you", "how do you do"],
+            "goodbye": ["bye", "goodbye", "see you", "farewell"],
+            "pain": ["pain", "pains", "painful", "hurt", "hurts", "hurting", "ache", "aches", "aching",
+                     "uncomfortable", "headache", "headaches", "stomachache", "stomachaches", "backache",
+                     "backaches", "toothache", "toothaches", "earache", "earaches", "bellyache", "bellyaches"]
+        }
+    
     def get_welcome_message(self, patient_data: Dict) -> str:
         """Generate warm, personalized welcome message"""
         name = patient_data.get('name', 'Patient')
@@ -177,48 +262,62 @@ Take your time - I'm here to listen carefully. What would you like to share firs
             # Clean and analyze user message
             user_message_lower = user_message.lower().strip()
             
-            # Check cache for similar messages
-            cache_key = f"{user_message_lower[:50]}_{patient_data.get('name', '')}"
-            if cache_key in self.response_cache:
-                cached_response = self.response_cache[cache_key]
+            # Find every intent hit in a single pass, ordered by priority
+            with metrics.timed('intent_routing'):
+                intents = self.intent_router.classify(user_message_lower)
+
+            # Emergencies always win
+            if 'emergency' in intents:
+                with metrics.timed('handler', handler='emergency'):
+                    return self._handle_emergency_response(user_message, patient_data)
+
+            # Extract symptoms with context
+            with metrics.timed('symptom_extraction'):
+                symptoms = self._extract_symptoms_with_context(user_message, conversation_history)
+                symptoms = self.symptom_normalizer.normalize_all(symptoms)
+            has_symptoms = len(symptoms) > 0
+            intent = intents[0] if intents else 'general'
+
+            # Check cache for equivalent messages (returns a private copy)
+            cache_key = self._response_cache_key('symptoms' if has_symptoms else intent, symptoms,
+                                                 user_message_lower, patient_data, conversation_history)
+            with metrics.timed('response_cache_lookup'):
+                cached_response = self.response_cache.get(cache_key)
+            if cached_response is not None:
                 cached_response['data']['processing_time'] = round(time.time() - start_time, 3)
                 return cached_response
             
-            # Human-like thinking simulation (brief pause for realism)
+            # Human-like thinking simulation (brief pause for realism). By default the
+            # browser plays the pause so the worker is free to serve other requests
             thinking_time = random.uniform(0.1, 0.3)
-            time.sleep(thinking_time)
-            
-            # Check for emergency keywords
-            emergency_keywords = ['emergency', '911', 'heart attack', 'stroke', 'bleeding', 'unconscious', 'can\'t breathe']
-            if any(keyword in user_message_lower for keyword in emergency_keywords):
-                return self._handle_emergency_response(user_message, patient_data)
-            
-            # Extract symptoms with context
-            symptoms = self._extract_symptoms_with_context(user_message, conversation_history)
-            has_symptoms = len(symptoms) > 0
-            
+            if Config.THINKING_DELAY_MODE == 'server':
+                time.sleep(thinking_time)
+
             # Get response based on message type with human-like flow
-            if has_symptoms:
-                response = self._handle_symptom_based_message_enhanced(user_message, symptoms, patient_data, conversation_history)
-            elif any(keyword in user_message_lower for keyword in ['treatment', 'medicine', 'medication', 'prescription', 'drug']):
-                response = self._handle_treatment_inquiry_enhanced(user_message, patient_data, conversation_history)
-            elif any(keyword in user_message_lower for keyword in ['report', 'summary', 'record', 'download', 'document']):
-                response = self._handle_report_request_enhanced(user_message, patient_data, conversation_history)
-            elif any(keyword in user_message_lower for keyword in ['thank', 'thanks', 'appreciate', 'grateful']):
-                response = self._handle_thankyou_message_enhanced(patient_data, conversation_history)
-            elif any(keyword in user_message_lower for keyword in ['hi', 'hello', 'hey', 'greetings', 'morning', 'afternoon']):
-                response = self._handle_greeting_enhanced(patient_data, conversation_history)
-            elif any(keyword in user_message_lower for keyword in ['how are you', 'how do you do']):
-                response = self._handle_personal_greeting(patient_data)
-            elif any(keyword in user_message_lower for keyword in ['bye', 'goodbye', 'see you', 'farewell']):
-                response = self._handle_goodbye_message(patient_data)
-            elif any(keyword in user_message_lower for keyword in ['pain', 'hurt', 'ache', 'uncomfortable']):
-                response = self._handle_pain_message(user_message, patient_data, conversation_history)
-            else:
-                response = self._handle_general_message_enhanced(user_message, patient_data, conversation_history)
+            handler_name = 'symptoms' if has_symptoms else intent
+            with metrics.timed('handler', handler=handler_name):
+                if has_symptoms:
+                    response = self._handle_symptom_based_message_enhanced(user_message, symptoms, patient_data, conversation_history)
+                elif intent == 'treatment':
+                    response = self._handle_treatment_inquiry_enhanced(user_message, patient_data, conversation_history)
+                elif intent == 'report':
+                    response = self._handle_report_request_enhanced(user_message, patient_data, conversation_history)
+                elif intent == 'thanks':
+                    response = self._handle_thankyou_message_enhanced(patient_data, conversation_history)
+                elif intent == 'greeting':
+                    response = self._handle_greeting_enhanced(patient_data, conversation_history)
+                elif intent == 'personal_greeting':
+                    response = self._handle_personal_greeting(patient_data)
+                elif intent == 'goodbye':
+                    response = self._handle_goodbye_message(patient_data)
+                elif intent == 'pain':
+                    response = self._handle_pain_message(user_message, patient_data, conversation_history)
+                else:
+                    response = self._handle_general_message_enhanced(user_message, patient_data, conversation_history)
             
             # Add human-like touches
-            response = self._add_human_touches(response, conversation_history)
+            with metrics.timed('human_touches'):
+                response = self._add_human_touches(response, conversation_history)
             
             # Add processing time
             processing_time = round(time.time() - start_time, 3)
@@ -230,10 +329,12 @@ Take your time - I'm here to listen carefully. What would you like to share firs
             
             # Cache the response (except for emergencies)
             if response.get('type') != 'emergency':
-                self.response_cache[cache_key] = response.copy()
-                # Limit cache size
-                if len(self.response_cache) > 100:
-                    self.response_cache.pop(next(iter(self.response_cache)))
+                with metrics.timed('response_cache_store'):
+                    self.response_cache.set(cache_key, response)
+            
+            # Typing-delay hint for the web client (not cached; cache hits reply at once)
+            if Config.THINKING_DELAY_MODE == 'client':
+                response['data']['typing_delay_ms'] = int(thinking_time * 1000)
             
             return response
             
@@ -241,35 +342,175 @@ Take your time - I'm here to listen carefully. What would you like to share firs
             print(f"Error in process_message: {str(e)}")
             return self._get_error_response_enhanced(str(e), patient_data)
     
+    def stream_message(self, user_message: str, patient_data: Dict, conversation_history: List):
+        """Yield (event, payload) pairs for a streamed reply.
+
+        A 'start' event goes out before any work is done. When the reply comes
+        from the LLM its text is relayed in 'delta' events as the completion
+        streams in; rule-based and cached replies arrive in a single 'delta'.
+        A final 'response' event carries the complete response including the
+        structured analysis.
+        """
+        yield 'start', {'doctor': self.current_doctor}
+        
+        # The reply is built on a worker thread while this one relays its text
+        deltas = queue.SimpleQueue()
+        context = self._streaming_context(deltas.put)
+        future = self._get_blocking_executor().submit(
+            context.run, profiler.run_attached, self.process_message, user_message, patient_data, conversation_history
+        )
+        future.add_done_callback(lambda _: deltas.put(None))
+        
+        streamed = []
+        for text in iter(deltas.get, None):
+            streamed.append(text)
+            yield 'delta', {'text': text}
+        
+        yield from self._stream_response_events(future.result(), ''.join(streamed))
+    
+    def _streaming_context(self, sink) -> contextvars.Context:
+        """Copy of the current context in which LLM text is passed to sink as it arrives"""
+        context = contextvars.copy_context()
+        context.run(_llm_delta_sink.set, sink)
+        return context
+    
+    def _stream_response_events(self, response: Dict, streamed: str = ''):
+        """Yield the text not streamed yet as a 'delta', then the final 'response' event"""
+        # Nothing to wait for on a stream; the browser renders text as it arrives
+        response['data'].pop('typing_delay_ms', None)
+        
+        # Handlers may add to the LLM text (or fall back mid-stream, in which
+        # case the final event replaces what was shown)
+        message = response['message']
+        if message.startswith(streamed) and len(message) > len(streamed):
+            yield 'delta', {'text': message[len(streamed):]}
+        
+        yield 'response', response
+    
+    def _ask_llm(self, messages: List[Dict], fallback, cache_key: str = None,
+                 patient_data: Dict = None, **kwargs) -> str:
+        """Get an LLM reply, or the rule-based fallback when the upstream is slow or down.
+
+        fallback may be a string or a callable, so the rule-based text is only
+        built when it is actually needed. With a cache_key from
+        self.llm_cache.make_key(...), answers are reused across patients who share
+        the same clinical facets, with patient_data filled back in.
+        """
+        patient_data = patient_data or {}
+        if cache_key:
+            with metrics.timed('llm_cache_lookup'):
+                cached_answer = self.llm_cache.get(cache_key, patient_data)
+            if cached_answer is not None:
+                return cached_answer
+        
+        try:
+            with metrics.timed('llm_call'):
+                answer = self.llm.chat(messages, on_delta=_llm_delta_sink.get(), **kwargs)
+        except LLMUnavailable as e:
+            print(f"Error in _ask_llm: {str(e)}")
+            return fallback() if callable(fallback) else fallback
+        
+        # Only real LLM answers are cached; fallbacks are cheap to rebuild
+        if cache_key:
+            with metrics.timed('llm_cache_write'):
+                self.llm_cache.set(cache_key, answer, patient_data)
+        return answer
+    
+    def _get_blocking_executor(self) -> ThreadPoolExecutor:
+        """Thread pool that runs blocking chatbot work for the async API"""
+        with self._executor_lock:
+            if self._blocking_executor is None:
+                self._blocking_executor = ThreadPoolExecutor(
+                    max_workers=Config.ASYNC_BLOCKING_THREADS,
+                    thread_name_prefix='chatbot-io'
+                )
+            return self._blocking_executor
+    
+    async def run_blocking(self, func, *args, **kwargs):
+        """Run a blocking call off the event loop"""
+        loop = asyncio.get_running_loop()
+        # Carry the request's context (metrics labels, profile) into the worker thread
+        context = contextvars.copy_context()
+        return await loop.run_in_executor(self._get_blocking_executor(),
+                                          functools.partial(context.run, profiler.run_attached, func, *args, **kwargs))
+    
+    async def process_message_async(self, user_message: str, patient_data: Dict, conversation_history: List) -> Dict:
+        """Async variant of process_message; the event loop stays free while the LLM answers"""
+        return await self.run_blocking(self.process_message, user_message, patient_data, conversation_history)
+    
+    async def stream_message_async(self, user_message: str, patient_data: Dict, conversation_history: List):
+        """Async variant of stream_message"""
+        yield 'start', {'doctor': self.current_doctor}
+        
+        loop = asyncio.get_running_loop()
+        deltas = asyncio.Queue()
+        context = self._streaming_context(lambda text: loop.call_soon_threadsafe(deltas.put_nowait, text))
+        future = loop.run_in_executor(self._get_blocking_executor(), functools.partial(
+            context.run, profiler.run_attached, self.process_message, user_message, patient_data, conversation_history
+        ))
+        # Scheduled after every delta the worker thread queued
+        future.add_done_callback(lambda _: deltas.put_nowait(None))
+        
+        streamed = []
+        while True:
+            text = await deltas.get()
+            if text is None:
+                break
+            streamed.append(text)
+            yield 'delta', {'text': text}
+        
+        for event, payload in self._stream_response_events(await future, ''.join(streamed)):
+            yield event, payload
+    
+    async def get_diagnosis_async(self, symptoms: List[str], patient_data: Dict) -> Dict:
+        """Async variant of get_diagnosis"""
+        return await self.run_blocking(self.get_diagnosis, symptoms, patient_data)
+    
+    async def get_treatment_plan_async(self, diagnosis: Dict, patient_data: Dict) -> Dict:
+        """Async variant of get_treatment_plan"""
+        return await self.run_blocking(self.get_treatment_plan, diagnosis, patient_data)
+    
+    def _response_cache_key(self, intent: str, symptoms: List[str], user_message_lower: str,
+                            patient_data: Dict, conversation_history: List) -> tuple:
+        """Build a cache key from the facets that actually shape the response"""
+        # Symptom replies depend on the symptom set; handlers that read the message
+        # itself (medication names, pain details, free text) also key on its wording
+        if intent == 'symptoms':
+            message_facet = tuple(sorted(set(symptoms)))
+        elif intent in ('treatment', 'pain', 'general'):
+            message_facet = ' '.join(user_message_lower.split())
+        else:
+            message_facet = None
+        
+        # Greeting and thank-you replies change with the conversation so far
+        last_diagnosis = None
+        for msg in reversed(conversation_history):
+            if msg.get('type') == 'diagnosis':
+                last_diagnosis = msg.get('data', {}).get('suggested_diagnosis')
+                break
+        conversation_facet = (len(conversation_history) > 5, last_diagnosis)
+        
+        patient_facet = (
+            str(patient_data.get('name', '')),
+            str(patient_data.get('age', '')),
+            str(patient_data.get('gender', '')).lower(),
+            str(patient_data.get('medical_history', '')).lower()
+        )
+        
+        return (intent, message_facet, conversation_facet, patient_facet)
+    
     def _handle_symptom_based_message_enhanced(self, user_message: str, symptoms: List[str], 
                                              patient_data: Dict, conversation_history: List) -> Dict:
         """Handle symptom descriptions with empathy and detailed analysis"""
         # Analyze symptoms
-        analysis = self.symptom_checker.analyze_symptoms(symptoms, patient_data)
+        with metrics.timed('symptom_analysis'):
+            analysis = self.symptom_checker.analyze_symptoms(symptoms, patient_data)
         
         # Get AI response with human-like empathy
         ai_response_text = self._get_ai_response_for_symptoms_enhanced(user_message, patient_data, symptoms, analysis)
         
         # Determine possible diseases with confidence
-        possible_diseases = []
-        for disease, info in self.medical_knowledge['common_diseases'].items():
-            disease_symptoms = info['symptoms']
-            matched_symptoms = set(symptoms) & set(disease_symptoms)
-            if matched_symptoms:
-                match_score = len(matched_symptoms) / len(disease_symptoms)
-                if match_score > 0.2:  # Lower threshold for more possibilities
-                    possible_diseases.append({
-                        'name': disease.replace('_', ' ').title(),
-                        'match_score': round(match_score, 2),
-                        'description': info['description'],
-                        'severity': info['severity'],
-                        'urgency': info.get('urgency', 'medium'),
-                        'common_in': info.get('common_in', 'Various ages'),
-                        'recovery': info.get('recovery', 'Varies')
-                    })
-        
-        # Sort by match score
-        possible_diseases.sort(key=lambda x: x['match_score'], reverse=True)
+        possible_diseases = self._rank_possible_diseases(symptoms)
         
         # Generate personalized treatment recommendations
         treatment_recommendations = self._get_personalized_treatment_recommendations(symptoms, possible_diseases, patient_data)
@@ -278,7 +519,7 @@ Take your time - I'm here to listen carefully. What would you like to share firs
         response_data = {
             'symptoms': symptoms,
             'analysis': {
-                'possible_conditions': possible_diseases[:5],  # Top 5
+                'possible_conditions': possible_diseases,  # Top 5
                 'urgency_level': analysis.get('urgency_level', 'medium'),
                 'severity': analysis.get('severity', 'moderate'),
                 'recommended_actions': analysis.get('recommended_actions', [])
@@ -640,4 +881,775 @@ I'll be here whenever you need me - 24/7. Feel better soon!
 **To help me understand better:**
 1. **Location:** Where exactly is the pain?
 2. **Type:** Is it sharp, dull, throbbing, burning, or aching?
-3. **Scale:** On a scale of 
+3. **Scale:** On a scale of 1-10, how strong is it right now?
+4. **Timing:** When did it start, and is it constant or does it come and go?
+5. **Triggers:** Does anything make it better or worse?
+
+**Please get emergency care right away if the pain:**
+• Is sudden and severe - the worst you've ever felt
+• Is in your chest and spreads to your arm, jaw or back
+• Comes with difficulty breathing, fainting or confusion
+
+I'm right here with you. Tell me a little more so I can help. 💙"""
+        
+        if pain_keywords['locations']:
+            response_text += f"\n\nYou mentioned your **{', '.join(pain_keywords['locations'])}** - that helps me a lot already."
+        
+        return {
+            'message': response_text,
+            'type': 'pain_assessment',
+            'data': {
+                'pain_details': pain_keywords,
+                'needs_more_info': True,
+                'doctor': self.current_doctor
+            }
+        }
+    
+    def _handle_general_message_enhanced(self, user_message: str, patient_data: Dict, conversation_history: List) -> Dict:
+        """Handle free-form questions and anything that didn't match an intent"""
+        response_text = self._get_ai_response_for_general_message(user_message, patient_data, conversation_history)
+        
+        return {
+            'message': response_text,
+            'type': 'general',
+            'data': {
+                'follow_up_questions': [
+                    'What symptoms are you experiencing?',
+                    'When did they start?',
+                    'Have you taken any medication for this?'
+                ],
+                'doctor': self.current_doctor
+            }
+        }
+    
+    # Message parsing
+    
+    def _extract_symptoms_with_context(self, user_message: str, conversation_history: List) -> List[str]:
+        """Find the known symptoms named in a message, skipping negated ones ("no fever")"""
+        # Lemmatized, so "headaches" and "coughing" match "headache" and "cough"
+        message_key = phrase_key(user_message)
+        negations = ("no", "not", "without", "never", "dont", "didnt", "havent")
+        
+        symptoms = []
+        for found in self.symptom_router.pattern.finditer(message_key):
+            preceding = message_key[:found.start()].split()
+            if preceding and preceding[-1] in negations:
+                continue
+            for symptom_id in sorted(self.symptom_router.keyword_intents.get(found.group(0), ())):
+                if symptom_id not in symptoms:
+                    symptoms.append(symptom_id)
+        
+        return symptoms[:Config.MAX_SYMPTOMS]
+    
+    def _extract_pain_details(self, user_message: str) -> Dict:
+        """Pick out where the pain is, what it feels like and how strong it is"""
+        words = set(re.findall(r"[a-z]+", user_message.lower()))
+        
+        locations_db = {
+            "head": ["head", "headache", "headaches", "forehead", "temple", "temples"],
+            "chest": ["chest"],
+            "back": ["back", "backache", "backaches", "spine"],
+            "stomach": ["stomach", "stomachache", "belly", "tummy", "abdomen", "abdominal"],
+            "throat": ["throat"],
+            "ear": ["ear", "ears", "earache"],
+            "teeth": ["tooth", "teeth", "toothache", "jaw"],
+            "joints": ["joint", "joints", "knee", "knees", "hip", "hips", "shoulder", "shoulders", "elbow", "wrist", "ankle"],
+            "muscles": ["muscle", "muscles"],
+            "legs": ["leg", "legs", "foot", "feet", "calf"],
+            "arms": ["arm", "arms", "hand", "hands"]
+        }
+        pain_types = ["sharp", "dull", "throbbing", "burning", "aching", "stabbing", "cramping", "shooting", "pounding"]
+        
+        # An explicit rating ("7/10", "8 out of 10") beats the wording
+        scale = re.search(r"\b(10|[0-9])\s*(?:/|out of)\s*10\b", user_message.lower())
+        if scale:
+            severity = int(scale.group(1))
+        else:
+            severity = self.symptom_checker.get_symptom_severity('pain', user_message)
+        
+        return {
+            'locations': [location for location, keywords in locations_db.items() if not words.isdisjoint(keywords)],
+            'types': [pain_type for pain_type in pain_types if pain_type in words],
+            'severity': severity
+        }
+    
+    def _extract_medication_keywords_enhanced(self, user_message: str) -> List[str]:
+        """Medications named in a message (generic or common brand names), as database names"""
+        words = set(re.findall(r"[a-z]+", user_message.lower()))
+        brand_names = {
+            "tylenol": "Acetaminophen", "paracetamol": "Acetaminophen", "panadol": "Acetaminophen",
+            "advil": "Ibuprofen", "motrin": "Ibuprofen", "aleve": "Naproxen",
+            "zyrtec": "Cetirizine", "claritin": "Loratadine", "allegra": "Fexofenadine",
+            "amoxil": "Amoxicillin", "zithromax": "Azithromycin", "zpack": "Azithromycin"
+        }
+        
+        medications = []
+        for meds in self.treatment_db.medications.values():
+            for med in meds:
+                if med['name'].lower() in words and med['name'] not in medications:
+                    medications.append(med['name'])
+        for brand, generic in brand_names.items():
+            if brand in words and generic not in medications:
+                medications.append(generic)
+        
+        return medications
+    
+    def _extract_disease_keywords(self, user_message: str) -> List[str]:
+        """Conditions named in a message, as knowledge base keys"""
+        return self.disease_router.classify(user_message)
+    
+    def _load_disease_aliases(self) -> Dict[str, List[str]]:
+        """Condition key -> the names patients use for it"""
+        aliases = {
+            "common_cold": ["cold", "colds", "common cold"],
+            "influenza": ["flu", "influenza"],
+            "migraine": ["migraine", "migraines"],
+            "gastroenteritis": ["stomach flu", "stomach bug", "gastro", "gastroenteritis"],
+            "sinusitis": ["sinusitis", "sinus infection"],
+            "bronchitis": ["bronchitis"],
+            "strep_throat": ["strep", "strep throat"],
+            "urinary_tract_infection": ["uti", "utis", "urinary tract infection", "bladder infection"],
+            "anxiety_disorder": ["anxiety disorder", "panic disorder"]
+        }
+        for disease in list(self.medical_knowledge['common_diseases']) + list(self.treatment_db.treatments):
+            aliases.setdefault(disease, []).append(disease.replace('_', ' '))
+        return aliases
+    
+    def _patient_age(self, patient_data: Dict) -> int:
+        """Patient age as an int (0 when missing or not a number)"""
+        try:
+            return int(patient_data.get('age') or 0)
+        except (TypeError, ValueError):
+            return 0
+    
+    def _treatment_patient(self, patient_data: Dict) -> Dict:
+        """patient_data in the shape TreatmentDatabase compares against (int age, string history)"""
+        return dict(patient_data,
+                    age=self._patient_age(patient_data),
+                    gender=str(patient_data.get('gender') or ''),
+                    medical_history=str(patient_data.get('medical_history') or ''))
+    
+    # LLM replies
+    
+    def _history_facet(self, patient_data: Dict) -> str:
+        """Medical history as an LLM cache facet (case and spacing don't matter)"""
+        return ' '.join(str(patient_data.get('medical_history') or '').lower().split())
+    
+    def _llm_messages(self, request: str, patient_data: Dict, conversation_history: List = ()) -> List[Dict]:
+        """System persona, optional recent turns, then one user turn describing the patient and the task"""
+        doctor = self.current_doctor
+        system_prompt = (
+            f"You are {doctor['name']}, a {doctor['style']} and empathetic medical assistant. "
+            "Explain things in plain language, acknowledge how the patient feels, never give a "
+            "definitive diagnosis, and say clearly when they should see a doctor or call emergency services. "
+            "Keep replies under 250 words and use short markdown sections."
+        )
+        # The age band rather than the exact age: the answer (and its cache entry) is the same within a band
+        patient = (
+            f"Patient: {patient_data.get('name', 'Patient')}, age group {age_band(patient_data.get('age'))}, "
+            f"gender {patient_data.get('gender') or 'not given'}, "
+            f"medical history: {patient_data.get('medical_history') or 'none given'}"
+        )
+        
+        messages = [{'role': 'system', 'content': system_prompt}]
+        for msg in list(conversation_history)[-6:]:
+            role = 'assistant' if msg.get('role') == 'assistant' else 'user'
+            messages.append({'role': role, 'content': msg.get('message', '')})
+        messages.append({'role': 'user', 'content': f"{patient}\n\n{request}"})
+        return messages
+    
+    def _get_ai_response_for_symptoms_enhanced(self, user_message: str, patient_data: Dict,
+                                               symptoms: List[str], analysis: Dict) -> str:
+        """Empathetic explanation of the reported symptoms"""
+        request = (
+            f"The patient reports: {', '.join(symptoms)}.\n"
+            f"Preliminary urgency: {analysis.get('urgency_level', 'medium')}; "
+            f"severity: {analysis.get('severity', 'moderate')}.\n"
+            "Explain what these symptoms could mean, what they can do right now, and when to seek care."
+        )
+        cache_key = self.llm_cache.make_key(
+            'symptoms', 'diagnosis', symptoms, patient_data,
+            doctor=self.current_doctor['name'],
+            medical_history=self._history_facet(patient_data),
+            urgency=analysis.get('urgency_level', 'medium'),
+            severity=analysis.get('severity', 'moderate')
+        )
+        return self._ask_llm(
+            self._llm_messages(request, patient_data),
+            fallback=lambda: self._symptom_response_text(patient_data, symptoms, analysis),
+            cache_key=cache_key,
+            patient_data=patient_data
+        )
+    
+    def _get_ai_response_for_medication_enhanced(self, user_message: str, medication_info: List[Dict],
+                                                 patient_data: Dict) -> str:
+        """Explain the medications the patient asked about"""
+        if not medication_info:
+            return self._medication_response_text(medication_info, patient_data)
+        
+        request = (
+            f"The patient asked about: {', '.join(info['name'] for info in medication_info)}.\n"
+            "Explain what each is used for, how to take it safely, its important side effects and "
+            "precautions for this patient, and when to ask a pharmacist or doctor."
+        )
+        cache_key = self.llm_cache.make_key(
+            'medication', 'treatment', [], patient_data,
+            doctor=self.current_doctor['name'],
+            medical_history=self._history_facet(patient_data),
+            medications=sorted(info['name'] for info in medication_info)
+        )
+        return self._ask_llm(
+            self._llm_messages(request, patient_data),
+            fallback=lambda: self._medication_response_text(medication_info, patient_data),
+            cache_key=cache_key,
+            patient_data=patient_data
+        )
+    
+    def _get_ai_response_for_disease_treatment(self, user_message: str, treatment_info: Dict,
+                                               patient_data: Dict) -> str:
+        """Explain how the conditions the patient asked about are treated"""
+        request = (
+            f"The patient asked how {', '.join(d['disease'] for d in treatment_info['diseases'])} is treated.\n"
+            "Summarize the usual treatment, helpful self-care, the expected recovery time and the "
+            "warning signs that need a doctor."
+        )
+        cache_key = self.llm_cache.make_key(
+            'disease', 'treatment', [], patient_data,
+            doctor=self.current_doctor['name'],
+            medical_history=self._history_facet(patient_data),
+            diseases=sorted(d['disease'] for d in treatment_info['diseases'])
+        )
+        return self._ask_llm(
+            self._llm_messages(request, patient_data),
+            fallback=lambda: self._disease_treatment_text(treatment_info, patient_data),
+            cache_key=cache_key,
+            patient_data=patient_data
+        )
+    
+    def _get_ai_response_for_general_message(self, user_message: str, patient_data: Dict,
+                                             conversation_history: List) -> str:
+        """Answer a free-form health question in the context of the conversation so far"""
+        # The current message is already the last turn of the history. Free text
+        # with its conversation has no clinical facets to key on, so it is not cached
+        history = list(conversation_history)[:-1]
+        request = f"The patient says: {user_message}"
+        return self._ask_llm(
+            self._llm_messages(request, patient_data, history),
+            fallback=lambda: self._general_response_text(patient_data)
+        )
+    
+    # Rule-based replies (also used when the LLM is unavailable)
+    
+    def _symptom_response_text(self, patient_data: Dict, symptoms: List[str], analysis: Dict) -> str:
+        """Rule-based explanation of the reported symptoms"""
+        name = patient_data.get('name', 'Patient')
+        urgency = analysis.get('urgency_level', 'medium')
+        
+        urgency_notes = {
+            "high": "⚠️ **Some of what you describe needs prompt medical attention.** Please don't wait this out.",
+            "medium": "These symptoms deserve attention, but they are usually manageable with the right care.",
+            "low": "The good news is that symptoms like these are usually mild and tend to improve with self-care."
+        }
+        symptom_list = '\n'.join(f"• {symptom.title()}" for symptom in symptoms)
+        actions = '\n'.join(f"• {action}" for action in analysis.get('recommended_actions', []))
+        
+        response_text = f"""Thank you for telling me how you're feeling, {name}. I'm sorry you're dealing with this. 💙
+
+**What you've described:**
+{symptom_list}
+
+{urgency_notes.get(urgency, urgency_notes['medium'])}"""
+        
+        conditions = analysis.get('possible_conditions', [])
+        if conditions:
+            likely = ', '.join(condition['disease'] for condition in conditions[:3])
+            response_text += f"\n\n**Conditions that can cause this pattern:** {likely}"
+        
+        if actions:
+            response_text += f"\n\n**What I'd suggest right now:**\n{actions}"
+        
+        response_text += "\n\nI've added possible conditions, tests and self-care tips beside our chat. How long have you had these symptoms?"
+        return response_text
+    
+    def _medication_response_text(self, medication_info: List[Dict], patient_data: Dict) -> str:
+        """Rule-based summary of the medications the patient asked about"""
+        name = patient_data.get('name', 'Patient')
+        if not medication_info:
+            return f"""I couldn't find that medication in my reference list, {name}. 💊
+
+Your pharmacist is a great (and free) source of advice - they can tell you what it's for, how to take it and whether it's safe with your other medications.
+
+Could you tell me the exact name on the package, or what you're hoping to treat?"""
+        
+        sections = []
+        for info in medication_info:
+            availability = "available over the counter" if info.get('otc') else "prescription only"
+            lines = [f"**💊 {info['name']}** ({info.get('type', 'Medication')}, {availability})"]
+            if info.get('max_daily'):
+                lines.append(f"• Maximum daily dose: {info['max_daily']}")
+            lines.append(f"• Common side effects: {', '.join(info.get('common_side_effects', []))}")
+            lines.append(f"• Precautions: {'; '.join(info.get('precautions', []))}")
+            sections.append('\n'.join(lines))
+        
+        return f"""Here's what you should know, {name}:
+
+""" + '\n\n'.join(sections) + """
+
+**Always** read the label, don't combine products with the same active ingredient, and check with a pharmacist or doctor if you take other medications."""
+    
+    def _disease_treatment_text(self, treatment_info: Dict, patient_data: Dict) -> str:
+        """Rule-based treatment overview for the conditions the patient asked about"""
+        name = patient_data.get('name', 'Patient')
+        
+        sections = []
+        for disease in treatment_info['diseases']:
+            plan = disease['treatment_plan']
+            lines = [f"**{disease['disease']}**" + (f" - {disease['description']}" if disease['description'] else "")]
+            lines.extend(f"• {treatment}" for treatment in plan.get('treatments', [])[:4])
+            if plan.get('duration'):
+                lines.append(f"• Usual recovery: {plan['duration']}")
+            if plan.get('follow_up'):
+                lines.append(f"• See a doctor: {plan['follow_up'].lower()}")
+            sections.append('\n'.join(lines))
+        
+        return f"""Good question, {name}. Here's how this is usually treated:
+
+""" + '\n\n'.join(sections) + """
+
+Everyone is different, so please check with your doctor before starting any new medication."""
+    
+    def _general_response_text(self, patient_data: Dict) -> str:
+        """Rule-based reply to a message that didn't match anything specific"""
+        name = patient_data.get('name', 'Patient')
+        return f"""I want to make sure I understand you correctly, {name}. 🤔
+
+**You can tell me about:**
+• Symptoms you're experiencing (e.g. "I have a headache and a fever")
+• Medications you'd like to know more about
+• How a condition is usually treated
+• A report of our consultation
+
+What's on your mind?"""
+    
+    def _get_general_treatment_advice_enhanced(self, user_message: str, patient_data: Dict) -> str:
+        """General treatment guidance when no medication or condition was named"""
+        name = patient_data.get('name', 'Patient')
+        return f"""I'd be glad to help with treatment options, {name}. 🩺
+
+The right treatment depends on what's causing your symptoms, so the most useful thing you can do is tell me:
+• **What symptoms** you have and **how long** you've had them
+• **Any medications** you're already taking
+• **Allergies** or ongoing health conditions
+
+**In the meantime, these help with most common illnesses:**
+• Rest and plenty of fluids
+• Over-the-counter pain or fever relief if appropriate (follow the label)
+• Keeping track of how your symptoms change
+
+What would you like help treating?"""
+    
+    # Recommendations
+    
+    def _get_disease_specific_treatments(self, disease_keywords: List[str], patient_data: Dict) -> Dict:
+        """Treatment plans for the conditions the patient named (at most 3)"""
+        diseases = []
+        for disease in disease_keywords[:3]:
+            info = self.medical_knowledge['common_diseases'].get(disease, {})
+            plan = self.treatment_db.get_treatment({
+                'primary_diagnosis': disease,
+                'severity': info.get('severity'),
+                'symptoms': info.get('symptoms', [])
+            }, self._treatment_patient(patient_data))
+            diseases.append({
+                'disease': disease.replace('_', ' ').title(),
+                'description': info.get('description', ''),
+                'treatment_plan': plan
+            })
+        
+        return {'diseases': diseases}
+    
+    def _rank_possible_diseases(self, symptoms: List[str]) -> List[Dict]:
+        """Top 5 knowledge base conditions for a set of canonical symptom IDs"""
+        # Only diseases sharing a symptom are scored
+        possible_diseases = []
+        for disease, match_score in self.disease_index.score(symptoms, threshold=0.2):  # Lower threshold for more possibilities
+            info = self.medical_knowledge['common_diseases'][disease]
+            possible_diseases.append({
+                'name': disease.replace('_', ' ').title(),
+                'match_score': round(match_score, 2),
+                'description': info['description'],
+                'severity': info['severity'],
+                'urgency': info.get('urgency', 'medium'),
+                'common_in': info.get('common_in', 'Various ages'),
+                'recovery': info.get('recovery', 'Varies')
+            })
+        
+        # Keep the top 5 by match score
+        return heapq.nlargest(5, possible_diseases, key=lambda x: x['match_score'])
+    
+    def _get_personalized_treatment_recommendations(self, symptoms: List[str], possible_diseases: List[Dict],
+                                                    patient_data: Dict) -> List[Dict]:
+        """Medications and self-care for the most likely condition, adjusted for the patient"""
+        if possible_diseases:
+            top = possible_diseases[0]
+            diagnosis = {'primary_diagnosis': top['name'], 'severity': top['severity'], 'symptoms': symptoms}
+            reason = f"Recommended for {top['name']}"
+        else:
+            diagnosis = {'primary_diagnosis': '', 'symptoms': symptoms}
+            reason = "Symptom relief"
+        plan = self.treatment_db.get_treatment(diagnosis, self._treatment_patient(patient_data))
+        
+        recommendations = []
+        for med in plan.get('medications', [])[:3]:
+            recommendations.append({
+                'name': med['name'],
+                'type': 'Medication',
+                'description': med.get('purpose', reason),
+                'dosage': med.get('dosage', '')
+            })
+        for treatment in plan.get('treatments', [])[:3]:
+            recommendations.append({'name': treatment, 'type': 'Self-care', 'description': reason})
+        for adjustment in plan.get('patient_specific_adjustments', []):
+            recommendations.append({'name': 'Patient-specific note', 'type': 'Precaution', 'description': adjustment})
+        
+        return recommendations
+    
+    def _suggest_comprehensive_tests(self, symptoms: List[str], patient_data: Dict) -> List[str]:
+        """Tests worth discussing with a doctor for these symptoms"""
+        symptom_ids = frozenset(symptoms)
+        tests = []
+        for rule_symptoms, rule_tests in self.treatment_db.test_rules:
+            if not rule_symptoms.isdisjoint(symptom_ids):
+                tests.extend(test for test in rule_tests if test not in tests)
+        
+        if self._patient_age(patient_data) >= 50:
+            tests.append("Age-appropriate routine health screening")
+        if not tests:
+            tests.append("Physical examination")
+        
+        return tests[:6]
+    
+    def _get_detailed_follow_up_advice(self, urgency: str, patient_data: Dict) -> Dict:
+        """When to follow up and what to watch for, by urgency"""
+        timelines = {
+            "high": "Seek medical care today - don't wait",
+            "medium": "See a healthcare provider within 24-48 hours",
+            "low": "Follow up if you're not improving within 3-5 days"
+        }
+        advice = {
+            'timeline': timelines.get(urgency, timelines['medium']),
+            'warning_signs': [
+                "Difficulty breathing or chest pain",
+                "A fever above 103°F (39.4°C) or lasting more than 3 days",
+                "Confusion, fainting or severe dizziness",
+                "Symptoms that suddenly get much worse"
+            ],
+            'next_steps': [
+                "Keep a simple symptom diary",
+                "Bring a list of your medications to your appointment",
+                "Come back and tell me how you're doing"
+            ]
+        }
+        
+        age = self._patient_age(patient_data)
+        if age >= 65 or 0 < age < 5:
+            advice['age_note'] = "At your age it's worth seeing a doctor sooner rather than later"
+        
+        return advice
+    
+    def _get_self_care_tips(self, symptoms: List[str]) -> List[str]:
+        """Self-care tips for the given canonical symptoms, most specific first"""
+        tips_db = {
+            "fever": "Rest, dress lightly and keep sipping fluids",
+            "cough": "Warm drinks with honey can soothe a cough (not for children under 1)",
+            "sore throat": "Gargle with warm salt water several times a day",
+            "headache": "Rest in a quiet, dark room and stay hydrated",
+            "nausea": "Eat small, bland meals and sip clear fluids slowly",
+            "vomiting": "Take small sips of an oral rehydration solution",
+            "diarrhea": "Replace lost fluids with an oral rehydration solution",
+            "congestion": "Steam inhalation or a saline nasal spray can ease congestion",
+            "runny nose": "Use soft tissues and a saline spray; rest as much as you can",
+            "fatigue": "Keep a regular sleep schedule and pace your activities",
+            "abdominal pain": "A warm compress on your stomach may ease cramping",
+            "back pain": "Gentle movement and heat usually help more than bed rest",
+            "muscle pain": "Warm baths and gentle stretching can relax sore muscles",
+            "insomnia": "Avoid screens and caffeine for a few hours before bed",
+            "anxiety": "Slow breathing (in for 4, out for 6) can calm a racing mind"
+        }
+        
+        tips = [tips_db[symptom] for symptom in symptoms if symptom in tips_db]
+        tips.extend(["Drink plenty of fluids", "Get as much rest as you can"])
+        return tips[:6]
+    
+    def _get_symptom_tracking_advice(self, symptoms: List[str]) -> Dict:
+        """What to record so the next conversation (or doctor's visit) is more useful"""
+        what_to_record = [
+            "When each symptom started and whether it's getting better or worse",
+            "How strong it is on a 1-10 scale, morning and evening",
+            "Anything that makes it better or worse",
+            "Any medications you take and whether they help"
+        ]
+        if "fever" in symptoms:
+            what_to_record.insert(1, "Your temperature, twice a day")
+        
+        return {
+            'symptoms_to_track': [symptom.title() for symptom in symptoms],
+            'what_to_record': what_to_record,
+            'review_after': '48 hours'
+        }
+    
+    def _get_comprehensive_self_care_advice(self) -> List[str]:
+        """General self-care that helps with most common illnesses"""
+        return [
+            "Rest and give your body time to recover",
+            "Drink plenty of water, clear broths or herbal teas",
+            "Eat light, nourishing meals",
+            "Use over-the-counter remedies only as directed on the label",
+            "Wash your hands often to avoid spreading illness"
+        ]
+    
+    def _get_when_to_seek_medical_attention(self) -> List[str]:
+        """Warning signs that need a doctor (or emergency care)"""
+        return [
+            "Chest pain or difficulty breathing - call 911",
+            "A high fever that doesn't come down with medication",
+            "Symptoms lasting more than a week or getting worse",
+            "Severe pain, confusion or fainting",
+            "Signs of dehydration (very little urine, dizziness, dry mouth)"
+        ]
+    
+    def _get_home_remedies_based_on_context(self, conversation_history: List) -> List[str]:
+        """Home remedies for the symptoms discussed most recently"""
+        symptoms = []
+        for msg in reversed(conversation_history):
+            if msg.get('type') == 'diagnosis':
+                symptoms = msg.get('data', {}).get('symptoms', [])
+                break
+        
+        remedies_db = {
+            "sore throat": "Warm salt-water gargles or honey in warm tea",
+            "cough": "Honey and steam inhalation",
+            "congestion": "A steamy shower or a saline nasal rinse",
+            "nausea": "Ginger tea and dry crackers",
+            "headache": "A cool compress on your forehead",
+            "fever": "A lukewarm sponge bath and light clothing",
+            "muscle pain": "A warm bath with Epsom salts",
+            "diarrhea": "Bananas, rice, applesauce and toast",
+            "insomnia": "Chamomile tea and a consistent bedtime"
+        }
+        
+        remedies = [remedies_db[symptom] for symptom in symptoms if symptom in remedies_db]
+        return remedies or ["Warm fluids and rest", "Honey and lemon in warm water", "A humidifier in your bedroom"]
+    
+    # Medication details
+    
+    def _get_common_side_effects(self, medication: str) -> List[str]:
+        """Common side effects of a medication"""
+        return self.treatment_db.get_medication_info(medication).get(
+            'common_side_effects', ["Consult medication guide for side effects"])
+    
+    def _get_medication_precautions(self, medication: str, patient_data: Dict) -> List[str]:
+        """General precautions for a medication plus this patient's own"""
+        precautions = list(self.treatment_db.get_medication_info(medication).get('precautions', []))
+        age = self._patient_age(patient_data)
+        history = str(patient_data.get('medical_history', '')).lower()
+        
+        if 0 < age < 12:
+            precautions.append("Use children's dosing - check the label or ask a pharmacist")
+        if age >= 65:
+            precautions.append("Older adults may need a lower dose - ask your pharmacist")
+        if 'liver' in history:
+            precautions.append("You mentioned liver problems - check with your doctor first")
+        if 'kidney' in history:
+            precautions.append("You mentioned kidney problems - check with your doctor first")
+        if 'pregnan' in history:
+            precautions.append("Talk to your OB/GYN before taking this during pregnancy")
+        if 'allerg' in history:
+            precautions.append("Check the ingredients against your known allergies")
+        
+        return precautions
+    
+    def _get_potential_interactions(self, medication: str) -> List[str]:
+        """Well-known interactions for a medication"""
+        interactions = {
+            "acetaminophen": ["Alcohol (liver damage)", "Warfarin (with regular use)", "Other products containing acetaminophen"],
+            "ibuprofen": ["Aspirin and other NSAIDs", "Blood thinners such as warfarin", "Blood pressure medications", "Lithium"],
+            "naproxen": ["Aspirin and other NSAIDs", "Blood thinners such as warfarin", "Blood pressure medications"],
+            "cetirizine": ["Alcohol", "Sedatives and sleep aids"],
+            "loratadine": ["Ketoconazole", "Erythromycin"],
+            "fexofenadine": ["Antacids containing aluminum or magnesium", "Fruit juices (reduce absorption)"],
+            "amoxicillin": ["Methotrexate", "Warfarin", "Allopurinol (rash)"],
+            "azithromycin": ["Antacids", "Warfarin", "Medications that affect heart rhythm"],
+            "doxycycline": ["Antacids, calcium and iron supplements", "Isotretinoin", "Warfarin"]
+        }
+        
+        return interactions.get(medication.lower(), ["Ask your pharmacist to check it against your other medications"])
+    
+    def _get_medication_safety_notes(self) -> List[str]:
+        """Safety notes that apply to every medication"""
+        return [
+            "Read the label and never exceed the maximum daily dose",
+            "Don't combine products that contain the same active ingredient",
+            "Tell your doctor or pharmacist about every medication and supplement you take",
+            "Keep medications out of reach of children"
+        ]
+    
+    def _get_when_to_consult_doctor(self, medication_keywords: List[str]) -> List[str]:
+        """When the patient should talk to a doctor about these medications"""
+        advice = [
+            "If your symptoms don't improve within a few days",
+            "If you notice a rash, swelling or trouble breathing after a dose",
+            "Before combining it with prescription medication"
+        ]
+        antibiotics = {med['name'] for med in self.treatment_db.medications.get('antibiotics', [])}
+        if antibiotics.intersection(medication_keywords):
+            advice.insert(0, "Antibiotics need a prescription and only help bacterial infections")
+        return advice
+    
+    def _get_alternative_treatments(self, medication_keywords: List[str], patient_data: Dict) -> List[str]:
+        """Non-drug options worth trying alongside (or instead of) medication"""
+        alternatives = ["Rest and hydration", "Warm or cold compresses for aches", "Steam inhalation for congestion"]
+        if 'pregnan' in str(patient_data.get('medical_history', '')).lower():
+            alternatives.insert(0, "Non-drug options first - ask your OB/GYN which medications are safe")
+        return alternatives
+    
+    # Response finishing
+    
+    def _add_human_touches(self, response: Dict, conversation_history: List) -> Dict:
+        """Connect a new diagnosis to the one discussed earlier in the conversation"""
+        if response.get('type') != 'diagnosis':
+            return response
+        
+        last_diagnosis = None
+        for msg in reversed(conversation_history):
+            if msg.get('type') == 'diagnosis':
+                last_diagnosis = msg.get('data', {}).get('suggested_diagnosis')
+                break
+        
+        suggested = response['data'].get('suggested_diagnosis')
+        if last_diagnosis and suggested and last_diagnosis != suggested:
+            response['message'] += (f"\n\n**Note:** Earlier we talked about {last_diagnosis.lower()}. "
+                                    "This looks a little different, so please keep an eye on how things change.")
+        elif last_diagnosis:
+            response['message'] += "\n\nThis fits with what we discussed earlier - thank you for keeping me updated."
+        
+        return response
+    
+    def _ensure_response_structure(self, response: Dict) -> Dict:
+        """Make sure every reply has the message/type/data shape the frontend expects"""
+        response['message'] = str(response.get('message') or '')
+        response.setdefault('type', 'general')
+        if not isinstance(response.get('data'), dict):
+            response['data'] = {}
+        return response
+    
+    def _get_error_response_enhanced(self, error: str, patient_data: Dict) -> Dict:
+        """Friendly reply when something went wrong while answering"""
+        name = patient_data.get('name', 'Patient')
+        
+        return {
+            'message': f"""I'm sorry, {name} - something went wrong on my side while I was looking into that. 🙏
+
+Could you try sending your message again? If you're worried about your symptoms in the meantime, please don't wait for me: contact a healthcare provider, or call 911 in an emergency.""",
+            'type': 'error',
+            'data': {
+                'error': True,
+                'retry': True,
+                'doctor': self.current_doctor
+            }
+        }
+    
+    # Structured API
+    
+    def _symptom_list(self, symptoms) -> List[str]:
+        """Accept a list of symptom strings or one comma-separated string"""
+        if isinstance(symptoms, str):
+            symptoms = symptoms.split(',')
+        if not isinstance(symptoms, list):
+            return []
+        return [symptom.strip() for symptom in symptoms if isinstance(symptom, str) and symptom.strip()]
+    
+    def get_diagnosis(self, symptoms: List[str], patient_data: Dict) -> Dict:
+        """Structured diagnosis for an explicit symptom list"""
+        raw_symptoms = self._symptom_list(symptoms)
+        symptoms = self.symptom_normalizer.normalize_all(raw_symptoms)
+        analysis = self.symptom_checker.analyze_symptoms(symptoms, self._treatment_patient(patient_data))
+        possible_diseases = self._rank_possible_diseases(symptoms)
+        validation = self.symptom_checker.validate_symptoms(raw_symptoms)
+        
+        return {
+            'symptoms': symptoms,
+            'primary_diagnosis': possible_diseases[0]['name'] if possible_diseases else 'Requires further evaluation',
+            'confidence': possible_diseases[0]['match_score'] if possible_diseases else 0.3,
+            'possible_conditions': possible_diseases,
+            'urgency': analysis.get('urgency_level', 'medium'),
+            'severity': analysis.get('severity', 'moderate'),
+            'recommended_actions': analysis.get('recommended_actions', []),
+            'recommended_tests': self._suggest_comprehensive_tests(symptoms, patient_data),
+            'unrecognized_symptoms': validation['unrecognized_symptoms'],
+            'suggestions': validation['suggestions'],
+            'timestamp': datetime.now().isoformat()
+        }
+    
+    def get_treatment_plan(self, diagnosis: Dict, patient_data: Dict) -> Dict:
+        """Treatment plan for a diagnosis (e.g. the result of get_diagnosis)"""
+        diagnosis = dict(diagnosis, symptoms=self._symptom_list(diagnosis.get('symptoms') or []))
+        treatment = self.treatment_db.get_treatment(diagnosis, self._treatment_patient(patient_data))
+        
+        symptoms = self.symptom_normalizer.normalize_all(diagnosis['symptoms'])
+        treatment['self_care_tips'] = self._get_self_care_tips(symptoms)
+        treatment['follow_up_advice'] = self._get_detailed_follow_up_advice(diagnosis.get('urgency', 'medium'), patient_data)
+        treatment['when_to_seek_help'] = self._get_when_to_seek_medical_attention()
+        return treatment
+    
+    def prepare_report_data(self, patient_data: Dict, conversation: List[Dict]) -> Dict:
+        """Collect the consultation into the structure ReportGenerator renders"""
+        symptoms = []
+        last_diagnosis = None
+        for msg in conversation:
+            if msg.get('type') == 'diagnosis':
+                data = msg.get('data') or {}
+                for symptom in data.get('symptoms', []):
+                    if symptom not in symptoms:
+                        symptoms.append(symptom)
+                last_diagnosis = data
+        
+        diagnosis = []
+        treatment_plan = []
+        recommendations = []
+        if last_diagnosis:
+            analysis = last_diagnosis.get('analysis', {})
+            for condition in analysis.get('possible_conditions', [])[:3]:
+                diagnosis.append({
+                    'name': condition['name'],
+                    'confidence': f"{round(condition['match_score'] * 100)}%"
+                })
+            for rec in last_diagnosis.get('treatment_recommendations', []):
+                details = rec.get('description', '')
+                if rec.get('dosage'):
+                    details += f" ({rec['dosage']})"
+                treatment_plan.append({'type': rec.get('type', 'General'), 'description': f"{rec['name']}: {details}"})
+            recommendations.extend(analysis.get('recommended_actions', []))
+            recommendations.extend(f"Discuss with your doctor: {test}" for test in last_diagnosis.get('recommended_tests', []))
+        
+        name = patient_data.get('name', 'The patient')
+        if diagnosis:
+            summary = (f"{name} described {', '.join(symptoms)}. The most likely condition discussed was "
+                       f"{diagnosis[0]['name']} (urgency: {last_diagnosis.get('urgency', 'medium')}). "
+                       "This is a preliminary assessment and should be confirmed by a healthcare provider.")
+        elif symptoms:
+            summary = (f"{name} described {', '.join(symptoms)}. No single condition stood out; "
+                       "a healthcare provider should evaluate these symptoms in person.")
+        else:
+            summary = (f"{name} consulted {self.current_doctor['name']} about general health questions; "
+                       "no symptom assessment was made.")
+        
+        return {
+            'consultation_date': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            'patient': patient_data,
+            'symptoms': symptoms,
+            'diagnosis': diagnosis,
+            'treatment_plan': treatment_plan,
+            'recommendations': recommendations,
+            'summary': summary
+        }
@@ -0,0 +1,373 @@
+# metrics.py
+"""Per-stage latency histograms and cache counters in the Prometheus text format.
+
+Stages are timed with `timed('stage')`; the route and handler labels come
+from the request being served, so the same stage can be broken down by
+endpoint and by chat handler. Caches report hits and misses with
+`count_cache`. With METRICS_DIR set, every worker process
+flushes its histograms there and /metrics merges them, so a scrape through
+the load balancer sees the whole server rather than one worker. Exited
+workers' counts are folded into one aggregate file.
+"""
+import atexit
+import bisect
+import contextvars
+import fcntl
+import json
+import math
+import os
+import re
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Tuple
+from config import Config
+
+# Upper bounds in seconds: from in-memory cache hits up to slow LLM replies
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Labels of the request being served; copied into worker threads with the context
+_route = contextvars.ContextVar('metrics_route', default='none')
+_handler = contextvars.ContextVar('metrics_handler', default='none')
+
+
+def _escape(value: str) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_bound(bound: float) -> str:
+    return '+Inf' if math.isinf(bound) else repr(float(bound))
+
+
+class Histogram:
+    """Latency histogram; each label combination keeps per-bucket counts and a sum"""
+
+    def __init__(self, name: str, documentation: str, label_names: Tuple[str, ...],
+                 buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        # label values -> [count per bucket..., sum]
+        self._series: Dict[Tuple[str, ...], List] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, seconds: float, *label_values: str):
+        index = bisect.bisect_left(self.buckets, seconds)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [0] * len(self.buckets) + [0.0]
+            series[index] += 1
+            series[-1] += seconds
+
+    def snapshot(self) -> Dict[Tuple[str, ...], List]:
+        with self._lock:
+            return {labels: list(series) for labels, series in self._series.items()}
+
+    def render(self, series: Dict[Tuple[str, ...], List]) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        for label_values, counts in sorted(series.items()):
+            labels = ','.join(f'{name}="{_escape(value)}"' for name, value in zip(self.label_names, label_values))
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{{{labels},le="{_format_bound(bound)}"}} {cumulative}')
+            lines.append(f'{self.name}_sum{{{labels}}} {counts[-1]!r}')
+            lines.append(f'{self.name}_count{{{labels}}} {cumulative}')
+        return lines
+
+
+class Counter:
+    """Monotonic counter; each label combination keeps one total"""
+
+    def __init__(self, name: str, documentation: str, label_names: Tuple[str, ...]):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        # label values -> [total], the same list shape the histograms merge with
+        self._series: Dict[Tuple[str, ...], List] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values: str, amount: int = 1):
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [0]
+            series[0] += amount
+
+    def snapshot(self) -> Dict[Tuple[str, ...], List]:
+        with self._lock:
+            return {labels: list(series) for labels, series in self._series.items()}
+
+    def render(self, series: Dict[Tuple[str, ...], List]) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        for label_values, (total,) in sorted(series.items()):
+            labels = ','.join(f'{name}="{_escape(value)}"' for name, value in zip(self.label_names, label_values))
+            lines.append(f'{self.name}{{{labels}}} {total}')
+        return lines
+
+
+REQUEST_SECONDS = Histogram(
+    'chatbot_request_duration_seconds', 'HTTP request latency by route.', ('route', 'method', 'status')
+)
+STAGE_SECONDS = Histogram(
+    'chatbot_stage_duration_seconds', 'Latency of each processing stage by route and chat handler.',
+    ('route', 'handler', 'stage')
+)
+CACHE_EVENTS = Counter(
+    'chatbot_cache_events_total', 'Cache hits, misses, evictions and expirations by cache.', ('cache', 'event')
+)
+COLLECTORS = (REQUEST_SECONDS, STAGE_SECONDS, CACHE_EVENTS)
+
+
+def set_route(route: str) -> contextvars.Token:
+    """Label everything timed in this context with the route; pass the token to reset_route"""
+    return _route.set(route)
+
+
+def reset_route(token: contextvars.Token):
+    _route.reset(token)
+
+
+def current_route() -> str:
+    return _route.get()
+
+
+def observe_stage(stage: str, seconds: float, route: str = None, handler: str = None):
+    """Record a stage timed elsewhere (e.g. in another process)"""
+    STAGE_SECONDS.observe(seconds, route or _route.get(), handler or _handler.get(), stage)
+    _ensure_flusher()
+
+
+@contextmanager
+def timed(stage: str, handler: str = None):
+    """Time the enclosed block as a stage; with handler, nested stages are labelled with it too"""
+    token = _handler.set(handler) if handler else None
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe_stage(stage, time.perf_counter() - start)
+        if token is not None:
+            _handler.reset(token)
+
+
+def observe_request(route: str, method: str, status: int, seconds: float):
+    REQUEST_SECONDS.observe(seconds, route, method, str(status))
+    _ensure_flusher()
+
+
+def count_cache(cache: str, event: str, amount: int = 1):
+    """Count a cache event: hit, miss, eviction or expiration"""
+    CACHE_EVENTS.inc(cache, event, amount=amount)
+    _ensure_flusher()
+
+
+# Multi-process export
+#
+# Each process flushes to metrics-<pid>-<token>.json; the random token keeps a
+# reused PID from overwriting an exited process's counts. Files of exited
+# processes are folded into metrics-aggregate.json, so the directory stays one
+# file per live worker and the merged counters never go backwards.
+
+AGGREGATE_FILE = 'metrics-aggregate.json'
+_PROCESS_FILE = re.compile(r'^metrics-(\d+)-([0-9a-f]+)\.json$')
+
+_flusher = None
+_flusher_pid = None
+_flusher_lock = threading.Lock()
+_file_token = (None, None)
+_exit_hook_registered = False
+
+
+def _process_file() -> str:
+    """This process's flush file (a new token after a fork)"""
+    global _file_token
+    pid, token = _file_token
+    if pid != os.getpid():
+        pid, token = _file_token = (os.getpid(), uuid.uuid4().hex[:12])
+    return os.path.join(Config.METRICS_DIR, f"metrics-{pid}-{token}.json")
+
+
+def _process_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _ensure_flusher():
+    """Start this process's flush thread on first use (again after a fork)"""
+    global _flusher, _flusher_pid, _exit_hook_registered
+    if not Config.METRICS_DIR or _flusher_pid == os.getpid():
+        return
+    with _flusher_lock:
+        if _flusher_pid != os.getpid():
+            os.makedirs(Config.METRICS_DIR, exist_ok=True)
+            _flusher_pid = os.getpid()
+            _flusher = threading.Thread(target=_flush_loop, name='metrics-flush', daemon=True)
+            _flusher.start()
+            if not _exit_hook_registered:
+                # Inherited by forked children; it always acts on the exiting process's own file
+                atexit.register(_flush_on_exit)
+                _exit_hook_registered = True
+
+
+def _flush_loop():
+    while True:
+        time.sleep(Config.METRICS_FLUSH_SECONDS)
+        try:
+            flush()
+        except OSError as e:
+            print(f"Error in metrics flush: {str(e)}")
+
+
+def _flush_on_exit():
+    """Hand this process's final counts to the aggregate on a clean exit"""
+    if _flusher_pid != os.getpid():
+        return
+    try:
+        flush()
+        fold_exited(include_self=True)
+    except OSError as e:
+        print(f"Error in metrics flush: {str(e)}")
+
+
+def _state() -> Dict[str, List]:
+    return {c.name: [[list(labels), series] for labels, series in c.snapshot().items()] for c in COLLECTORS}
+
+
+def _write_json(path: str, state: Dict):
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(state, f)
+    os.replace(tmp_path, path)
+
+
+def _read_json(path: str) -> Optional[Dict]:
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def flush():
+    """Write this process's histograms and counters to METRICS_DIR"""
+    _write_json(_process_file(), _state())
+
+
+def _add_state(merged: Dict[str, Dict[Tuple[str, ...], List]], state: Dict):
+    """Add a flushed state into merged series, element-wise"""
+    for name, rows in state.items():
+        target = merged.get(name)
+        if target is None:
+            continue
+        for labels, series in rows:
+            key = tuple(labels)
+            if key in target and len(target[key]) == len(series):
+                target[key] = [a + b for a, b in zip(target[key], series)]
+            else:
+                target[key] = list(series)
+
+
+@contextmanager
+def _directory_lock():
+    """Serialize folding between the processes sharing METRICS_DIR"""
+    with open(os.path.join(Config.METRICS_DIR, '.lock'), 'a') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def fold_exited(include_self: bool = False) -> int:
+    """Fold the files of exited processes into the aggregate and remove them;
+    returns how many were folded"""
+    own = os.path.basename(_process_file())
+    with _directory_lock():
+        aggregate_path = os.path.join(Config.METRICS_DIR, AGGREGATE_FILE)
+        aggregate = _read_json(aggregate_path) or {}
+        # Files already added but not yet removed (a fold interrupted in between)
+        folded = set(aggregate.get('folded', ()))
+        for name in folded:
+            try:
+                os.remove(os.path.join(Config.METRICS_DIR, name))
+            except FileNotFoundError:
+                pass
+
+        names = []
+        for entry in os.scandir(Config.METRICS_DIR):
+            match = _PROCESS_FILE.match(entry.name)
+            if not match or entry.name in folded:
+                continue
+            if entry.name == own:
+                if include_self:
+                    names.append(entry.name)
+            elif not _process_alive(int(match.group(1))):
+                names.append(entry.name)
+        if not names:
+            return 0
+
+        merged = {c.name: {} for c in COLLECTORS}
+        _add_state(merged, aggregate)
+        for name in names:
+            _add_state(merged, _read_json(os.path.join(Config.METRICS_DIR, name)) or {})
+
+        state = {name: [[list(labels), series] for labels, series in series_by_labels.items()]
+                 for name, series_by_labels in merged.items()}
+        # Record what was folded before deleting it, so a crash in between can't double count
+        state['folded'] = sorted(names)
+        _write_json(aggregate_path, state)
+        for name in names:
+            try:
+                os.remove(os.path.join(Config.METRICS_DIR, name))
+            except FileNotFoundError:
+                pass
+        return len(names)
+
+
+def _merged_series() -> Dict[str, Dict[Tuple[str, ...], List]]:
+    """Sum the aggregate of exited processes and every live process's last flush"""
+    try:
+        fold_exited()
+    except OSError as e:
+        print(f"Error in metrics fold: {str(e)}")
+
+    merged = {c.name: {} for c in COLLECTORS}
+    own = os.path.basename(_process_file())
+    # Read under the lock so a concurrent fold can't move a file out from under the scan
+    with _directory_lock():
+        aggregate = _read_json(os.path.join(Config.METRICS_DIR, AGGREGATE_FILE)) or {}
+        _add_state(merged, aggregate)
+        folded = set(aggregate.get('folded', ()))
+        for entry in os.scandir(Config.METRICS_DIR):
+            if not _PROCESS_FILE.match(entry.name) or entry.name in folded or entry.name == own:
+                continue
+            _add_state(merged, _read_json(entry.path) or {})
+
+    # This process's live counts rather than its last flush
+    _add_state(merged, _state())
+    return merged
+
+
+def render() -> str:
+    """All histograms and counters in the Prometheus text exposition format"""
+    if Config.METRICS_DIR and os.path.isdir(Config.METRICS_DIR):
+        merged = _merged_series()
+        series = [merged[c.name] for c in COLLECTORS]
+    else:
+        series = [c.snapshot() for c in COLLECTORS]
+
+    lines = []
+    for collector, collector_series in zip(COLLECTORS, series):
+        lines.extend(collector.render(collector_series))
+    return '\n'.join(lines) + '\n'
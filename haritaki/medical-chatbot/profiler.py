@@ -0,0 +1,320 @@
+# profiler.py
+"""Opt-in per-request profiling.
+
+A request runs under cProfile when it carries the X-Profile-Request header
+(its value must be PROFILE_ADMIN_TOKEN) or is picked by PROFILE_SAMPLE_RATE.
+Independently, a background stack sampler watches every request that has run
+longer than PROFILE_SAMPLE_AFTER_MS; if it ends up slower than PROFILE_SLOW_MS
+its sampled stacks are saved in the collapsed ("folded") flame graph format.
+Profiles go to PROFILE_DIR, which keeps the newest PROFILE_MAX_FILES.
+"""
+import contextvars
+import cProfile
+import hmac
+import os
+import pstats
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, List, Optional
+from config import Config
+
+PROFILE_HEADER = 'X-Profile-Request'
+ADMIN_HEADER = 'X-Admin-Token'
+
+PROFILE_SUFFIXES = ('.prof', '.folded')
+
+# The profile session of the request being served
+_session = contextvars.ContextVar('profile_session', default=None)
+
+_active: Dict[int, 'ProfileSession'] = {}
+_active_lock = threading.Lock()
+_sampler = None
+_sampler_pid = None
+
+
+def profile_dir() -> str:
+    """PROFILE_DIR, relative to the app directory; empty when profiling is off"""
+    if not Config.PROFILE_DIR:
+        return ''
+    return os.path.join(os.path.dirname(os.path.abspath(__file__)), Config.PROFILE_DIR)
+
+
+class ProfileSession:
+    """Profiling state for one request, possibly spread over several threads"""
+
+    def __init__(self, route: str, method: str, deterministic: bool):
+        self.route = route
+        self.method = method
+        self.deterministic = deterministic
+        self.started = time.perf_counter()
+        self.threads = Counter()
+        self.profiles: List[cProfile.Profile] = []
+        self.stacks = Counter()
+        self.lock = threading.Lock()
+        # Set when begin() attached the request thread itself
+        self.attached = False
+        self.attached_profile: Optional[cProfile.Profile] = None
+
+
+def check_token(value: Optional[str]) -> bool:
+    """Constant-time check against PROFILE_ADMIN_TOKEN (never true when it is unset)"""
+    token = Config.PROFILE_ADMIN_TOKEN
+    return bool(token and value) and hmac.compare_digest(value.encode('utf-8'), token.encode('utf-8'))
+
+
+def begin(route: str, method: str, header_value: Optional[str] = None,
+          attach_current: bool = True) -> Optional[contextvars.Token]:
+    """Start profiling the current request; returns the token for end(), or None.
+
+    attach_current puts the calling thread under the profile; async apps pass
+    False and attach their worker threads with run_attached instead.
+    """
+    if not Config.PROFILE_DIR:
+        return None
+
+    deterministic = check_token(header_value) or (
+        Config.PROFILE_SAMPLE_RATE > 0 and random.random() < Config.PROFILE_SAMPLE_RATE
+    )
+    if not deterministic and not Config.PROFILE_SLOW_MS:
+        return None
+
+    session = ProfileSession(route, method, deterministic)
+    token = _session.set(session)
+    if Config.PROFILE_SLOW_MS:
+        _ensure_sampler()
+    if attach_current:
+        session.attached = True
+        session.attached_profile = _attach(session)
+    return token
+
+
+def end(token: Optional[contextvars.Token], status: int = 0) -> List[str]:
+    """Stop profiling the request; returns the paths of any profiles written"""
+    if token is None:
+        return []
+    session = _session.get()
+    _session.reset(token)
+    if session is None:
+        return []
+    if session.attached:
+        _detach(session, session.attached_profile)
+
+    elapsed_ms = (time.perf_counter() - session.started) * 1000
+    written = []
+    try:
+        if session.deterministic and session.profiles:
+            written.append(_write_cprofile(session, elapsed_ms, status))
+        if Config.PROFILE_SLOW_MS and elapsed_ms >= Config.PROFILE_SLOW_MS and session.stacks:
+            written.append(_write_folded(session, elapsed_ms, status))
+        if written:
+            _rotate()
+    except OSError as e:
+        print(f"Error in profiler: {str(e)}")
+    return written
+
+
+def _attach(session: ProfileSession) -> Optional[cProfile.Profile]:
+    thread_id = threading.get_ident()
+    with session.lock:
+        session.threads[thread_id] += 1
+    with _active_lock:
+        _active[id(session)] = session
+
+    if not session.deterministic or sys.getprofile() is not None:
+        return None
+    profile = cProfile.Profile()
+    profile.enable()
+    return profile
+
+
+def _detach(session: ProfileSession, profile: cProfile.Profile = None):
+    if profile is not None:
+        profile.disable()
+
+    thread_id = threading.get_ident()
+    with session.lock:
+        if profile is not None:
+            session.profiles.append(profile)
+        session.threads[thread_id] -= 1
+        if session.threads[thread_id] <= 0:
+            del session.threads[thread_id]
+        idle = not session.threads
+    if idle:
+        with _active_lock:
+            _active.pop(id(session), None)
+
+
+@contextmanager
+def attach():
+    """Run the enclosed work (on any thread) as part of the current request's profile"""
+    session = _session.get()
+    if session is None:
+        yield
+        return
+    profile = _attach(session)
+    try:
+        yield
+    finally:
+        _detach(session, profile)
+
+
+def run_attached(func, *args, **kwargs):
+    with attach():
+        return func(*args, **kwargs)
+
+
+def profiling_requested() -> bool:
+    """Whether the current request is under the deterministic profiler"""
+    session = _session.get()
+    return session is not None and session.deterministic
+
+
+# Stack sampler
+
+def _ensure_sampler():
+    """Start this process's sampler thread on first use (again after a fork)"""
+    global _sampler, _sampler_pid
+    if _sampler_pid == os.getpid():
+        return
+    with _active_lock:
+        if _sampler_pid != os.getpid():
+            _active.clear()
+            _sampler_pid = os.getpid()
+            _sampler = threading.Thread(target=_sample_loop, name='profile-sampler', daemon=True)
+            _sampler.start()
+
+
+def _collapse(frame) -> str:
+    """Root-first 'function (file:line)' frames joined with ';'"""
+    parts = []
+    while frame is not None:
+        code = frame.f_code
+        parts.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+        frame = frame.f_back
+    return ';'.join(reversed(parts))
+
+
+def _sample_loop():
+    interval = Config.PROFILE_SAMPLE_INTERVAL_MS / 1000
+    sample_after = Config.PROFILE_SAMPLE_AFTER_MS / 1000
+    while True:
+        time.sleep(interval)
+        with _active_lock:
+            sessions = list(_active.values())
+        if not sessions:
+            continue
+
+        # Requests that finish quickly are never sampled
+        now = time.perf_counter()
+        sessions = [session for session in sessions if now - session.started >= sample_after]
+        if not sessions:
+            continue
+
+        frames = sys._current_frames()
+        for session in sessions:
+            with session.lock:
+                thread_ids = list(session.threads)
+            for thread_id in thread_ids:
+                frame = frames.get(thread_id)
+                if frame is not None:
+                    stack = _collapse(frame)
+                    with session.lock:
+                        session.stacks[stack] += 1
+        del frames
+
+
+# Profile files
+
+def _profile_name(session: ProfileSession, elapsed_ms: float, status: int, suffix: str) -> str:
+    route = re.sub(r'[^A-Za-z0-9]+', '_', session.route).strip('_') or 'root'
+    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S_%f')
+    return f"{timestamp}-{session.method}-{route}-{status}-{int(elapsed_ms)}ms-{os.getpid()}{suffix}"
+
+
+def _write_cprofile(session: ProfileSession, elapsed_ms: float, status: int) -> str:
+    os.makedirs(profile_dir(), exist_ok=True)
+    with session.lock:
+        profiles = list(session.profiles)
+    stats = pstats.Stats(profiles[0])
+    for profile in profiles[1:]:
+        stats.add(profile)
+
+    path = os.path.join(profile_dir(), _profile_name(session, elapsed_ms, status, '.prof'))
+    stats.dump_stats(path)
+    return path
+
+
+def _write_folded(session: ProfileSession, elapsed_ms: float, status: int) -> str:
+    os.makedirs(profile_dir(), exist_ok=True)
+    path = os.path.join(profile_dir(), _profile_name(session, elapsed_ms, status, '.folded'))
+    with session.lock:
+        stacks = sorted(session.stacks.items())
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w') as f:
+        for stack, count in stacks:
+            f.write(f"{stack} {count}\n")
+    os.replace(tmp_path, path)
+    return path
+
+
+def profile_call(label: str, func, *args, **kwargs):
+    """Run func under cProfile and save the result as '<label>' (e.g. inside a render process)"""
+    profile = cProfile.Profile()
+    start = time.perf_counter()
+    try:
+        return profile.runcall(func, *args, **kwargs)
+    finally:
+        session = ProfileSession(label, 'JOB', True)
+        session.profiles.append(profile)
+        try:
+            _write_cprofile(session, (time.perf_counter() - start) * 1000, 0)
+            _rotate()
+        except OSError as e:
+            print(f"Error in profiler: {str(e)}")
+
+
+def _rotate():
+    """Keep only the newest PROFILE_MAX_FILES profiles"""
+    profiles = list_profiles()
+    for profile in profiles[Config.PROFILE_MAX_FILES:]:
+        try:
+            os.remove(os.path.join(profile_dir(), profile['name']))
+        except FileNotFoundError:
+            pass
+
+
+def list_profiles() -> List[Dict]:
+    """Saved profiles, newest first"""
+    if not profile_dir() or not os.path.isdir(profile_dir()):
+        return []
+
+    profiles = []
+    for entry in os.scandir(profile_dir()):
+        if not entry.name.endswith(PROFILE_SUFFIXES):
+            continue
+        try:
+            stat = entry.stat()
+        except FileNotFoundError:
+            continue
+        profiles.append({
+            'name': entry.name,
+            'format': 'pstats' if entry.name.endswith('.prof') else 'folded',
+            'size': stat.st_size,
+            'created': datetime.fromtimestamp(stat.st_mtime).isoformat()
+        })
+    profiles.sort(key=lambda profile: profile['name'], reverse=True)
+    return profiles
+
+
+def profile_path(name: str) -> Optional[str]:
+    """Path of a saved profile, or None for unknown (or unsafe) names"""
+    if not profile_dir() or os.path.basename(name) != name or not name.endswith(PROFILE_SUFFIXES):
+        return None
+    path = os.path.join(profile_dir(), name)
+    return path if os.path.isfile(path) else None
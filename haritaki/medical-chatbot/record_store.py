@@ -0,0 +1,356 @@
+# record_store.py
+import fcntl
+import json
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Tuple
+import metrics
+
+
+class RecordStore:
+    """Append-only patient record log.
+
+    Records are appended as JSON lines to numbered segment files. An index
+    file maps each record ID to (segment, offset, length) so reads are a
+    single pread. Durability follows the fsync policy: "always" syncs every
+    write, "group" batches the syncs of concurrent writers, "none" leaves it
+    to the OS. Sealed segments that are mostly superseded or deleted records
+    are compacted in the background.
+    """
+
+    SEGMENT_PREFIX = 'segment-'
+    SEGMENT_SUFFIX = '.jsonl'
+    INDEX_FILENAME = 'records.idx'
+
+    def __init__(self, path: str, segment_bytes: int = 64 * 1024 * 1024, fsync_policy: str = 'group',
+                 fsync_interval: float = 0.0, compact_ratio: float = 0.5):
+        if fsync_policy not in ('always', 'group', 'none'):
+            raise ValueError(f"Unknown fsync policy: {fsync_policy}")
+
+        self.path = path
+        self.segment_bytes = segment_bytes
+        self.fsync_policy = fsync_policy
+        self.fsync_interval = fsync_interval
+        self.compact_ratio = compact_ratio
+        self.index_path = os.path.join(path, self.INDEX_FILENAME)
+        self.lock_path = os.path.join(path, '.records.lock')
+
+        self._lock = threading.Lock()
+        self._pid = None
+        self._compactor = None
+        self._stop = threading.Event()
+
+        os.makedirs(path, exist_ok=True)
+        self._reset()
+
+    def _reset(self):
+        """Per-process state; rebuilt after a fork"""
+        self._pid = os.getpid()
+        self._index: Dict[str, Tuple[int, int, int]] = {}
+        self._index_fd = None
+        self._index_ino = None
+        self._index_pos = 0
+        self._segment_fds: Dict[int, int] = {}
+        self._active_segment = None
+        self._write_seq = 0
+        self._synced_seq = 0
+        self._dirty_fds = set()
+        self._sync_cond = threading.Condition()
+        self._flusher = None
+
+    def _check_process(self):
+        if self._pid != os.getpid():
+            self._reset()
+
+    @contextmanager
+    def _file_lock(self):
+        """Serialize appends and compaction across worker processes"""
+        with open(self.lock_path, 'a+b') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    # Segments
+
+    def _segment_path(self, segment_no: int) -> str:
+        return os.path.join(self.path, f"{self.SEGMENT_PREFIX}{segment_no:06d}{self.SEGMENT_SUFFIX}")
+
+    def _segment_numbers(self) -> List[int]:
+        numbers = []
+        for name in os.listdir(self.path):
+            if name.startswith(self.SEGMENT_PREFIX) and name.endswith(self.SEGMENT_SUFFIX):
+                numbers.append(int(name[len(self.SEGMENT_PREFIX):-len(self.SEGMENT_SUFFIX)]))
+        return sorted(numbers)
+
+    def _segment_fd(self, segment_no: int, create: bool = False) -> int:
+        fd = self._segment_fds.get(segment_no)
+        if fd is None:
+            flags = os.O_RDWR | os.O_APPEND | (os.O_CREAT if create else 0)
+            fd = os.open(self._segment_path(segment_no), flags, 0o600)
+            self._segment_fds[segment_no] = fd
+        return fd
+
+    def _writable_segment(self, size: int) -> int:
+        """The segment the next record goes to, rolling over when it is full"""
+        if self._active_segment is None:
+            numbers = self._segment_numbers()
+            self._active_segment = numbers[-1] if numbers else 1
+
+        # Another process may have rolled over already
+        while os.path.exists(self._segment_path(self._active_segment + 1)):
+            self._active_segment += 1
+
+        fd = self._segment_fd(self._active_segment, create=True)
+        current_size = os.fstat(fd).st_size
+        if current_size and current_size + size > self.segment_bytes:
+            self._active_segment += 1
+        return self._active_segment
+
+    # Index
+
+    def _refresh_index(self):
+        """Catch up with index entries appended by other processes, or reload after compaction"""
+        try:
+            stat = os.stat(self.index_path)
+        except FileNotFoundError:
+            stat = None
+
+        if stat is None or stat.st_ino != self._index_ino:
+            # Compacted (or first use): sync anything pending, then reopen against the new index
+            open_fds = list(self._segment_fds.values())
+            if self._index_fd is not None:
+                open_fds.append(self._index_fd)
+            for fd in open_fds:
+                os.fsync(fd)
+                os.close(fd)
+            self._segment_fds = {}
+            self._dirty_fds = set()
+            self._active_segment = None
+            self._index = {}
+            self._index_pos = 0
+            self._index_fd = os.open(self.index_path, os.O_RDWR | os.O_APPEND | os.O_CREAT, 0o600)
+            self._index_ino = os.fstat(self._index_fd).st_ino
+
+        size = os.fstat(self._index_fd).st_size
+        if size <= self._index_pos:
+            return
+
+        data = os.pread(self._index_fd, size - self._index_pos, self._index_pos)
+        # Only consume complete lines; a concurrent writer may be mid-append
+        end = data.rfind(b'\n') + 1
+        for line in data[:end].splitlines():
+            self._apply_index_line(line)
+        self._index_pos += end
+
+    def _apply_index_line(self, line: bytes):
+        record_id, segment_no, offset, length = line.decode('utf-8').split('\t')
+        if int(length) == 0:
+            self._index.pop(record_id, None)
+        else:
+            self._index[record_id] = (int(segment_no), int(offset), int(length))
+
+    # Writes
+
+    def _append(self, record_id: str, line: bytes) -> int:
+        """Append one record line (empty for a deletion) and its index entry"""
+        with self._lock:
+            self._check_process()
+            with self._file_lock():
+                self._refresh_index()
+
+                if line:
+                    segment_no = self._writable_segment(len(line))
+                    fd = self._segment_fd(segment_no, create=True)
+                    offset = os.fstat(fd).st_size
+                    os.write(fd, line)
+                    self._dirty_fds.add(fd)
+                    location = (segment_no, offset, len(line))
+                else:
+                    location = (0, 0, 0)
+
+                index_line = f"{record_id}\t{location[0]}\t{location[1]}\t{location[2]}\n".encode('utf-8')
+                os.write(self._index_fd, index_line)
+                self._index_pos += len(index_line)
+                self._dirty_fds.add(self._index_fd)
+                self._apply_index_line(index_line[:-1])
+
+                if self.fsync_policy == 'always':
+                    self._sync_dirty()
+
+            self._write_seq += 1
+            return self._write_seq
+
+    def _sync_dirty(self):
+        dirty, self._dirty_fds = self._dirty_fds, set()
+        for fd in dirty:
+            os.fsync(fd)
+
+    def _wait_durable(self, seq: int):
+        """Group commit: block until a flusher pass has synced this write"""
+        if self.fsync_policy != 'group':
+            return
+
+        with self._sync_cond:
+            if self._flusher is None:
+                self._flusher = threading.Thread(target=self._flush_loop, name='record-fsync', daemon=True)
+                self._flusher.start()
+            self._sync_cond.notify_all()
+            while self._synced_seq < seq:
+                self._sync_cond.wait()
+
+    def _flush_loop(self):
+        while True:
+            with self._sync_cond:
+                while self._synced_seq >= self._write_seq:
+                    self._sync_cond.wait()
+
+            # Writers arriving while a sync runs join the next batch; an optional
+            # delay trades a little latency for even larger batches
+            if self.fsync_interval:
+                time.sleep(self.fsync_interval)
+
+            # Sync private duplicates of the dirty fds: compaction may close (and
+            # the OS reuse) the originals while the sync runs outside the lock
+            with self._lock:
+                seq = self._write_seq
+                dirty = [os.dup(fd) for fd in self._dirty_fds]
+                self._dirty_fds = set()
+            for fd in dirty:
+                try:
+                    os.fsync(fd)
+                except OSError as e:
+                    print(f"Error in record fsync: {str(e)}")
+                finally:
+                    os.close(fd)
+
+            with self._sync_cond:
+                self._synced_seq = seq
+                self._sync_cond.notify_all()
+
+    def save(self, record: Dict, record_id: str = None) -> str:
+        """Append a record (replacing any earlier version with this ID) and return its ID"""
+        record_id = record_id or str(uuid.uuid4())
+        if '\t' in record_id or '\n' in record_id:
+            raise ValueError("Record IDs cannot contain tabs or newlines")
+
+        line = json.dumps({'id': record_id, 'saved_at': time.time(), 'record': record},
+                          separators=(',', ':'), default=str).encode('utf-8') + b'\n'
+        with metrics.timed('record_write'):
+            self._wait_durable(self._append(record_id, line))
+        return record_id
+
+    def delete(self, record_id: str):
+        """Append a tombstone; the record's bytes are reclaimed by compaction"""
+        self._wait_durable(self._append(record_id, b''))
+
+    # Reads
+
+    def get(self, record_id: str) -> Optional[Dict]:
+        """Random-access read of one record by ID"""
+        with self._lock:
+            self._check_process()
+            self._refresh_index()
+            location = self._index.get(record_id)
+            if location is None:
+                return None
+            segment_no, offset, length = location
+            try:
+                data = os.pread(self._segment_fd(segment_no), length, offset)
+            except FileNotFoundError:
+                # Another process compacted the segment away since our last refresh
+                self._index_ino = None
+                self._refresh_index()
+                location = self._index.get(record_id)
+                if location is None:
+                    return None
+                segment_no, offset, length = location
+                data = os.pread(self._segment_fd(segment_no), length, offset)
+
+        return json.loads(data)['record']
+
+    def record_ids(self) -> List[str]:
+        with self._lock:
+            self._check_process()
+            self._refresh_index()
+            return list(self._index)
+
+    # Compaction
+
+    def compact(self) -> Dict:
+        """Rewrite the live records of mostly-dead sealed segments into the active one"""
+        with self._lock:
+            self._check_process()
+            with self._file_lock():
+                self._refresh_index()
+                numbers = self._segment_numbers()
+                if len(numbers) < 2:
+                    return {'segments': 0, 'records': 0}
+
+                live_bytes = {}
+                for segment_no, _, length in self._index.values():
+                    live_bytes[segment_no] = live_bytes.get(segment_no, 0) + length
+
+                # Never the newest segment, which is still taking writes
+                victims = []
+                for segment_no in numbers[:-1]:
+                    size = os.path.getsize(self._segment_path(segment_no))
+                    if size and live_bytes.get(segment_no, 0) / size <= 1 - self.compact_ratio:
+                        victims.append(segment_no)
+                if not victims:
+                    return {'segments': 0, 'records': 0}
+
+                moved = 0
+                for record_id, (segment_no, offset, length) in list(self._index.items()):
+                    if segment_no not in victims:
+                        continue
+                    line = os.pread(self._segment_fd(segment_no), length, offset)
+                    target = self._writable_segment(length)
+                    fd = self._segment_fd(target, create=True)
+                    new_offset = os.fstat(fd).st_size
+                    os.write(fd, line)
+                    self._index[record_id] = (target, new_offset, length)
+                    moved += 1
+
+                for fd in self._segment_fds.values():
+                    os.fsync(fd)
+
+                # Rewrite the index as a new file; other processes notice the new inode
+                tmp_path = f"{self.index_path}.{os.getpid()}.tmp"
+                with open(tmp_path, 'wb') as f:
+                    for record_id, (segment_no, offset, length) in self._index.items():
+                        f.write(f"{record_id}\t{segment_no}\t{offset}\t{length}\n".encode('utf-8'))
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp_path, self.index_path)
+
+                for segment_no in victims:
+                    os.remove(self._segment_path(segment_no))
+
+                # Reopen everything against the new index
+                self._index_ino = None
+                self._refresh_index()
+
+                return {'segments': len(victims), 'records': moved}
+
+    def start_compactor(self, interval_seconds: float):
+        """Compact in a background thread (once per process)"""
+        if self._compactor is None:
+            self._compactor = threading.Thread(
+                target=self._compact_loop, args=(interval_seconds,), name='record-compaction', daemon=True
+            )
+            self._compactor.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _compact_loop(self, interval_seconds: float):
+        while not self._stop.wait(interval_seconds):
+            try:
+                self.compact()
+            except OSError as e:
+                print(f"Error in record compaction: {str(e)}")
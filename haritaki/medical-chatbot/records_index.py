@@ -0,0 +1,218 @@
+# records_index.py
+"""SQLite search index over the patient record log.
+
+The app keeps the index current as records are saved and deleted. After
+restoring or migrating the log, reconcile it once with:
+
+    python records_index.py rebuild
+"""
+import base64
+import binascii
+import os
+import sqlite3
+import sys
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+from config import Config
+import metrics
+
+# Newest first; record_id breaks ties so the keyset is unique
+SEARCH_ORDER = "ORDER BY saved_at DESC, record_id DESC"
+
+
+def _diagnosis_facets(record: Dict) -> Tuple[str, str]:
+    """Pull the searchable diagnosis name and urgency out of a saved record"""
+    diagnosis = record.get('diagnosis') or {}
+    if not isinstance(diagnosis, dict):
+        return str(diagnosis).lower(), ''
+
+    name = (diagnosis.get('primary_diagnosis') or diagnosis.get('suggested_diagnosis')
+            or diagnosis.get('name') or '')
+    urgency = diagnosis.get('urgency') or diagnosis.get('urgency_level') or ''
+    return str(name).strip().lower(), str(urgency).strip().lower()
+
+
+def parse_date(value: str, end: bool = False) -> float:
+    """Timestamp for an ISO date or datetime; a bare date used as an end bound covers that whole day"""
+    parsed = datetime.fromisoformat(value)
+    if end and len(value) == 10:
+        parsed += timedelta(days=1)
+    return parsed.timestamp()
+
+
+def encode_cursor(saved_at: float, record_id: str) -> str:
+    return base64.urlsafe_b64encode(f"{saved_at!r}|{record_id}".encode('utf-8')).decode('ascii')
+
+
+def decode_cursor(cursor: str) -> Tuple[float, str]:
+    """Raises ValueError for a malformed cursor"""
+    try:
+        saved_at, record_id = base64.urlsafe_b64decode(cursor.encode('ascii')).decode('utf-8').split('|', 1)
+        return float(saved_at), record_id
+    except (UnicodeError, TypeError, binascii.Error) as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+
+
+class RecordsIndex:
+    """Searchable SQLite index over the patient record log"""
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self._local = threading.local()
+
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        conn = self._connection()
+        conn.executescript(
+            "CREATE TABLE IF NOT EXISTS records ("
+            " record_id TEXT PRIMARY KEY,"
+            " patient_name TEXT NOT NULL,"
+            " name_key TEXT NOT NULL,"
+            " saved_at REAL NOT NULL,"
+            " diagnosis TEXT NOT NULL,"
+            " urgency TEXT NOT NULL);"
+            "CREATE INDEX IF NOT EXISTS records_saved ON records (saved_at, record_id);"
+            "CREATE INDEX IF NOT EXISTS records_name ON records (name_key, saved_at, record_id);"
+            "CREATE INDEX IF NOT EXISTS records_diagnosis ON records (diagnosis, saved_at, record_id);"
+            "CREATE INDEX IF NOT EXISTS records_urgency ON records (urgency, saved_at, record_id);"
+        )
+        conn.commit()
+
+    def _connection(self) -> sqlite3.Connection:
+        """One connection per thread, reopened after a fork"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            # The statement cache keeps every search shape prepared
+            conn = sqlite3.connect(self.db_path, timeout=30, cached_statements=256)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def add(self, record_id: str, record: Dict, saved_at: float = None):
+        """Index (or re-index) one saved record"""
+        self.add_many([(record_id, record, saved_at)])
+
+    def add_many(self, entries: List[Tuple[str, Dict, Optional[float]]]):
+        """Index (record_id, record, saved_at) entries in one transaction"""
+        rows = []
+        for record_id, record, saved_at in entries:
+            patient_name = str((record.get('patient_data') or {}).get('name') or '').strip()
+            diagnosis, urgency = _diagnosis_facets(record)
+            if saved_at is None:
+                try:
+                    saved_at = datetime.fromisoformat(record['saved_at']).timestamp()
+                except (KeyError, TypeError, ValueError):
+                    saved_at = time.time()
+            rows.append((record_id, patient_name, patient_name.lower(), saved_at, diagnosis, urgency))
+
+        with metrics.timed('records_index_write'):
+            conn = self._connection()
+            conn.executemany(
+                "INSERT OR REPLACE INTO records (record_id, patient_name, name_key, saved_at, diagnosis, urgency) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                rows
+            )
+            conn.commit()
+
+    def remove(self, record_id: str):
+        """Drop a deleted record from the index"""
+        with metrics.timed('records_index_write'):
+            conn = self._connection()
+            conn.execute("DELETE FROM records WHERE record_id = ?", (record_id,))
+            conn.commit()
+
+    def count(self) -> int:
+        return self._connection().execute("SELECT COUNT(*) FROM records").fetchone()[0]
+
+    def rebuild(self, record_store) -> Dict[str, int]:
+        """Reconcile the index with the log: add missing records, drop deleted ones"""
+        conn = self._connection()
+        indexed = {row[0] for row in conn.execute("SELECT record_id FROM records")}
+        live = set(record_store.record_ids())
+        missing = [record_id for record_id in live if record_id not in indexed]
+        deleted = [record_id for record_id in indexed if record_id not in live]
+
+        for start in range(0, len(missing), 500):
+            batch = []
+            for record_id in missing[start:start + 500]:
+                record = record_store.get(record_id)
+                if record is not None:
+                    batch.append((record_id, record, None))
+            self.add_many(batch)
+
+        conn.executemany("DELETE FROM records WHERE record_id = ?", [(record_id,) for record_id in deleted])
+        conn.commit()
+        return {'added': len(missing), 'removed': len(deleted)}
+
+    def search(self, name: str = None, date_from: float = None, date_to: float = None,
+               diagnosis: str = None, urgency: str = None, limit: int = 20,
+               cursor: str = None) -> Dict:
+        """Filter records newest first, one keyset page at a time.
+
+        name matches a case-insensitive prefix, diagnosis and urgency match
+        exactly (case-insensitive), and the date range is [date_from, date_to).
+        Pass the returned next_cursor to fetch the following page.
+        """
+        clauses, params = [], []
+        if name:
+            name_key = name.strip().lower()
+            clauses.append("name_key >= ? AND name_key < ?")
+            params += [name_key, name_key + '\uffff']
+        if date_from is not None:
+            clauses.append("saved_at >= ?")
+            params.append(date_from)
+        if date_to is not None:
+            clauses.append("saved_at < ?")
+            params.append(date_to)
+        if diagnosis:
+            clauses.append("diagnosis = ?")
+            params.append(diagnosis.strip().lower())
+        if urgency:
+            clauses.append("urgency = ?")
+            params.append(urgency.strip().lower())
+        if cursor:
+            # Resume strictly after the last row of the previous page
+            clauses.append("(saved_at, record_id) < (?, ?)")
+            params += list(decode_cursor(cursor))
+
+        where = f"WHERE {' AND '.join(clauses)} " if clauses else ""
+        rows = self._connection().execute(
+            "SELECT record_id, patient_name, saved_at, diagnosis, urgency FROM records "
+            f"{where}{SEARCH_ORDER} LIMIT ?",
+            params + [limit + 1]
+        ).fetchall()
+
+        results = [{
+            'record_id': record_id,
+            'patient_name': patient_name,
+            'saved_at': datetime.fromtimestamp(saved_at).isoformat(),
+            'diagnosis': diagnosis_name,
+            'urgency': urgency_level
+        } for record_id, patient_name, saved_at, diagnosis_name, urgency_level in rows[:limit]]
+
+        next_cursor = None
+        if len(rows) > limit:
+            last = rows[limit - 1]
+            next_cursor = encode_cursor(last[2], last[0])
+
+        return {'results': results, 'next_cursor': next_cursor}
+
+
+def main():
+    if sys.argv[1:] != ['rebuild']:
+        print(__doc__.strip().splitlines()[-1].strip())
+        sys.exit(2)
+
+    from record_store import RecordStore
+
+    base_dir = os.path.dirname(os.path.abspath(__file__))
+    index = RecordsIndex(os.path.join(base_dir, Config.RECORDS_INDEX_DB_PATH))
+    changes = index.rebuild(RecordStore(os.path.join(base_dir, Config.PATIENT_RECORDS_PATH)))
+    print(f"Indexed {changes['added']} records, removed {changes['removed']} deleted ones ({index.count()} total)")
+
+
+if __name__ == '__main__':
+    main()
@@ -6,20 +6,25 @@ from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib.units import inch
 from datetime import datetime
 import os
+import threading
 from typing import Dict, List, Any
 import json
+from report_index import ReportIndex, report_content_key, report_file_path
 
 class ReportGenerator:
-    def __init__(self):
+    def __init__(self, report_path: str = None):
         """Initialize report generator"""
         self.styles = getSampleStyleSheet()
         self._create_custom_styles()
         BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-        self.report_path = os.path.join(BASE_DIR, "reports")
+        self.report_path = report_path or os.path.join(BASE_DIR, "reports")
 
         
         # Create reports directory if it doesn't exist
         os.makedirs(self.report_path, exist_ok=True)
+        
+        # Content key -> PDF index used to skip re-rendering identical reports
+        self.report_index = ReportIndex(self.report_path)
     
     def _create_custom_styles(self):
         """Create custom paragraph styles"""
@@ -72,9 +77,16 @@ class ReportGenerator:
     
     def generate_pdf_report(self, report_data: Dict, session_id: str) -> str:
         """Generate PDF medical report"""
+        # Reuse the existing PDF if this exact report was already rendered
+        content_key = report_content_key(report_data)
+        existing_path = self.report_index.lookup(content_key)
+        if existing_path:
+            return existing_path
+        
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         filename = f"medical_report_{session_id}_{timestamp}.pdf"
-        filepath = os.path.join(self.report_path, filename)
+        filepath = report_file_path(self.report_path, filename)
+        os.makedirs(os.path.dirname(filepath), exist_ok=True)
         
         # Create document
         doc = SimpleDocTemplate(
@@ -116,6 +128,8 @@ class ReportGenerator:
         # Build PDF
         doc.build(story)
         
+        self.report_index.record(content_key, filepath)
+        
         return filepath
     
     def _create_header(self, report_data: Dict) -> List:
@@ -439,4 +453,17 @@ class ReportGenerator:
         report_text += f"Generated on: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n"
         report_text += "By: Dr. HealthAI - AI Medical Assistant\n"
         
-        return report_text
\ No newline at end of file
+        return report_text
+
+
+_shared_generator = None
+_shared_generator_lock = threading.Lock()
+
+
+def get_report_generator(report_path: str = None) -> ReportGenerator:
+    """Get the process-wide report generator, creating it on first use"""
+    global _shared_generator
+    with _shared_generator_lock:
+        if _shared_generator is None or (report_path and _shared_generator.report_path != report_path):
+            _shared_generator = ReportGenerator(report_path)
+        return _shared_generator
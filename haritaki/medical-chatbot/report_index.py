@@ -0,0 +1,149 @@
+# report_index.py
+import fcntl
+import hashlib
+import json
+import os
+import threading
+import unicodedata
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+from urllib.parse import quote
+
+# Bump when the PDF layout changes so old renders are not reused
+REPORT_FORMAT_VERSION = 1
+
+# Fields that change on every request without changing the consultation itself
+VOLATILE_FIELDS = ('consultation_date',)
+
+
+def report_file_path(report_path: str, filename: str) -> str:
+    """Sharded location for a new report, so no single directory grows huge"""
+    shard = hashlib.sha1(filename.encode('utf-8')).hexdigest()[:2]
+    return os.path.join(report_path, shard, filename)
+
+
+def find_report_file(report_path: str, filename: str) -> Optional[str]:
+    """Locate a report by name in its shard, falling back to the old flat layout"""
+    if not filename or filename != os.path.basename(filename) or filename.startswith('.'):
+        return None
+
+    for filepath in (report_file_path(report_path, filename), os.path.join(report_path, filename)):
+        if os.path.isfile(filepath):
+            return filepath
+    return None
+
+
+def download_name_options(filename: str) -> Dict[str, str]:
+    """Content-Disposition parameters for a download, as werkzeug's send_file builds them:
+    pass to headers.set('Content-Disposition', 'attachment', **options) for quoting"""
+    try:
+        filename.encode('ascii')
+    except UnicodeEncodeError:
+        # RFC 5987 name for browsers that support it, ASCII approximation for the rest
+        simple = unicodedata.normalize('NFKD', filename).encode('ascii', 'ignore').decode('ascii')
+        return {'filename': simple, 'filename*': f"UTF-8''{quote(filename, safe='!#$&+-.^_`|~')}"}
+    return {'filename': filename}
+
+
+def report_content_key(report_data: Dict) -> str:
+    """Hash the report data into a stable content key"""
+    content = {key: value for key, value in report_data.items() if key not in VOLATILE_FIELDS}
+    payload = json.dumps([REPORT_FORMAT_VERSION, content], sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class ReportIndex:
+    INDEX_FILENAME = '.report_index.json'
+
+    def __init__(self, report_path: str):
+        """Initialize the content key -> report file index"""
+        self.report_path = report_path
+        self.index_path = os.path.join(report_path, self.INDEX_FILENAME)
+        self.lock_path = self.index_path + '.lock'
+        self._cache = {}
+        self._cache_stamp = None
+        self._keys_by_file = {}
+        self._file_hashes = {}
+        self._thread_lock = threading.Lock()
+
+        os.makedirs(report_path, exist_ok=True)
+
+    @contextmanager
+    def _locked(self):
+        """Exclusive access to the index file across threads and processes"""
+        with self._thread_lock:
+            with open(self.lock_path, 'a+b') as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _load(self) -> Dict[str, str]:
+        """Read the index, re-parsing only when the file has changed"""
+        try:
+            stat = os.stat(self.index_path)
+        except FileNotFoundError:
+            return {}
+
+        stamp = (stat.st_mtime_ns, stat.st_size)
+        if stamp != self._cache_stamp:
+            try:
+                with open(self.index_path) as f:
+                    self._cache = json.load(f)
+            except json.JSONDecodeError:
+                self._cache = {}
+            self._keys_by_file = {filename: key for key, filename in self._cache.items()}
+            self._cache_stamp = stamp
+
+        return self._cache
+
+    def _write(self, entries: Dict[str, str]):
+        """Atomically replace the index file"""
+        tmp_path = f"{self.index_path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(entries, f, separators=(',', ':'))
+        os.replace(tmp_path, self.index_path)
+
+    def lookup(self, content_key: str) -> Optional[str]:
+        """Get the path of an existing report for this content key"""
+        filename = self._load().get(content_key)
+        if not filename:
+            return None
+
+        filepath = os.path.join(self.report_path, filename)
+        return filepath if os.path.exists(filepath) else None
+
+    def etag_for(self, filepath: str) -> str:
+        """Strong ETag for a report file, derived from its content"""
+        self._load()
+        content_key = self._keys_by_file.get(os.path.relpath(filepath, self.report_path))
+        if content_key:
+            return content_key
+
+        # Reports rendered before the index existed: hash the bytes once per file version
+        stat = os.stat(filepath)
+        cache_key = (filepath, stat.st_mtime_ns, stat.st_size)
+        file_hash = self._file_hashes.get(cache_key)
+        if file_hash is None:
+            digest = hashlib.sha256()
+            with open(filepath, 'rb') as f:
+                for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                    digest.update(chunk)
+            file_hash = digest.hexdigest()
+            self._file_hashes[cache_key] = file_hash
+        return file_hash
+
+    def record(self, content_key: str, filepath: str):
+        """Remember which file holds the report for this content key"""
+        with self._locked():
+            entries = dict(self._load())
+            entries[content_key] = os.path.relpath(filepath, self.report_path)
+            self._write(entries)
+
+    def remove(self, filepaths: List[str]):
+        """Forget every key pointing at deleted report files"""
+        removed = {os.path.relpath(filepath, self.report_path) for filepath in filepaths}
+        with self._locked():
+            entries = {key: name for key, name in self._load().items() if name not in removed}
+            self._write(entries)
@@ -0,0 +1,240 @@
+# report_jobs.py
+import json
+import multiprocessing
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, Optional, Tuple
+from report_index import ReportIndex, report_content_key
+import metrics
+import profiler
+
+
+def _write_status(jobs_dir: str, job_id: str, status: Dict):
+    """Atomically write a job's status file so any worker can poll it"""
+    path = os.path.join(jobs_dir, f"{job_id}.json")
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(status, f)
+    os.replace(tmp_path, path)
+
+
+def _claim_final(jobs_dir: str, job_id: str) -> bool:
+    """Take the right to write a job's final status; only the first caller gets it,
+    so a late render can't turn a job that was already failed back into done"""
+    try:
+        os.close(os.open(os.path.join(jobs_dir, f"{job_id}.final"), os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+    except FileExistsError:
+        return False
+    return True
+
+
+def _render_report(jobs_dir: str, job_id: str, report_data: Dict, session_id: str,
+                   profile: bool = False, report_path: str = None) -> Tuple[str, float]:
+    """Render one PDF inside a pool process; returns its path and the build time"""
+    if os.path.exists(os.path.join(jobs_dir, f"{job_id}.final")):
+        raise RuntimeError(f"Report job {job_id} already finished")
+
+    # The render timeout runs from here, not from when the job was queued
+    _write_status(jobs_dir, job_id, {
+        'job_id': job_id,
+        'status': 'rendering',
+        'progress': 0.5,
+        'pid': os.getpid(),
+        'started_at': time.time(),
+        'updated_at': time.time()
+    })
+
+    from report_generator import get_report_generator
+    start = time.perf_counter()
+    if profile:
+        # The request asked for a profile; the render is where its time goes
+        filepath = profiler.profile_call('pdf_build', get_report_generator(report_path).generate_pdf_report,
+                                         report_data, session_id)
+    else:
+        filepath = get_report_generator(report_path).generate_pdf_report(report_data, session_id)
+    return filepath, time.perf_counter() - start
+
+
+def _process_alive(pid: int) -> bool:
+    """Whether a process with this PID still exists on this host"""
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        # Exists, but belongs to another user
+        return True
+    return True
+
+
+def _warm_report_generator(report_path: str = None):
+    """Build the shared generator as each pool process starts"""
+    # ReportLab is imported here, in the render processes, never by the web workers
+    from report_generator import get_report_generator
+    get_report_generator(report_path)
+
+
+class ReportJobQueue:
+    # Finished job files are kept this long before they are swept
+    JOB_RETENTION_SECONDS = 24 * 3600
+
+    def __init__(self, jobs_dir: str, report_path: str, max_workers: int = 2, job_timeout: float = 300):
+        """Initialize the report job queue"""
+        self.jobs_dir = jobs_dir
+        self.report_path = report_path
+        self.report_index = ReportIndex(report_path)
+        self.max_workers = max_workers
+        # A job rendering for longer than this is reported as failed
+        self.job_timeout = job_timeout
+        self.executor = None
+        self._lock = threading.Lock()
+        self._last_cleanup = 0.0
+
+        os.makedirs(self.jobs_dir, exist_ok=True)
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        """Start the render pool on first use (after any gunicorn fork)"""
+        with self._lock:
+            if self.executor is None:
+                # spawn avoids forking a threaded web worker
+                self.executor = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    mp_context=multiprocessing.get_context('spawn'),
+                    initializer=_warm_report_generator,
+                    # Spawned processes don't inherit runtime config; pass the path explicitly
+                    initargs=(self.report_path,)
+                )
+            return self.executor
+
+    def _discard_executor(self, executor: ProcessPoolExecutor):
+        """Drop a pool that lost a process, so the next submit starts a fresh one"""
+        with self._lock:
+            if self.executor is executor:
+                self.executor = None
+        executor.shutdown(wait=False)
+
+    def submit(self, report_data: Dict, session_id: str) -> str:
+        """Queue a PDF render and return its job ID immediately"""
+        job_id = str(uuid.uuid4())
+
+        # Identical report already rendered: finish the job without touching the pool
+        existing_path = self.report_index.lookup(report_content_key(report_data))
+        if existing_path:
+            _claim_final(self.jobs_dir, job_id)
+            _write_status(self.jobs_dir, job_id, {
+                'job_id': job_id,
+                'status': 'done',
+                'progress': 1.0,
+                'report_url': f'/reports/{os.path.basename(existing_path)}',
+                'updated_at': time.time()
+            })
+            return job_id
+
+        # The queued job belongs to this worker until a render process picks it up
+        _write_status(self.jobs_dir, job_id, {
+            'job_id': job_id,
+            'status': 'queued',
+            'progress': 0.0,
+            'pid': os.getpid(),
+            'queued_at': time.time(),
+            'updated_at': time.time()
+        })
+
+        render = (_render_report, self.jobs_dir, job_id, report_data, session_id,
+                  profiler.profiling_requested(), self.report_path)
+        executor = self._get_executor()
+        try:
+            future = executor.submit(*render)
+        except BrokenProcessPool:
+            # A render process died since the last job; retry once on a fresh pool
+            self._discard_executor(executor)
+            executor = self._get_executor()
+            future = executor.submit(*render)
+        # The callback runs on a pool thread, outside this request's context
+        route = metrics.current_route()
+        future.add_done_callback(lambda done: self._finish(job_id, done, route, executor))
+
+        self._cleanup_old_jobs()
+        return job_id
+
+    def _finish(self, job_id: str, future, route: str = None, executor: ProcessPoolExecutor = None):
+        """Record the final state of a render"""
+        error = future.exception()
+        if isinstance(error, BrokenProcessPool) and executor is not None:
+            self._discard_executor(executor)
+        if not _claim_final(self.jobs_dir, job_id):
+            # Already failed (timed out) by a status poll; that answer stands
+            return
+        if error is not None:
+            status = {'job_id': job_id, 'status': 'failed', 'progress': 1.0, 'error': str(error)}
+        else:
+            filepath, build_seconds = future.result()
+            metrics.observe_stage('pdf_build', build_seconds, route=route)
+            status = {
+                'job_id': job_id,
+                'status': 'done',
+                'progress': 1.0,
+                'report_url': f'/reports/{os.path.basename(filepath)}'
+            }
+
+        status['updated_at'] = time.time()
+        _write_status(self.jobs_dir, job_id, status)
+
+    def status(self, job_id: str) -> Optional[Dict]:
+        """Get a job's status, or None if the job is unknown"""
+        try:
+            uuid.UUID(job_id)
+        except ValueError:
+            return None
+
+        status = self._read_status(job_id)
+        if status and status.get('status') in ('queued', 'rendering'):
+            status = self._check_stale(status)
+        return status
+
+    def _read_status(self, job_id: str) -> Optional[Dict]:
+        try:
+            with open(os.path.join(self.jobs_dir, f"{job_id}.json")) as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+    def _check_stale(self, status: Dict) -> Dict:
+        """Fail a pending job whose owning process is gone or that has been
+        rendering too long; otherwise nothing would ever move it on.
+
+        A queued job may wait behind a busy pool for any length of time, so
+        only its owner exiting fails it.
+        """
+        pid = status.get('pid')
+        if pid is not None and not _process_alive(pid):
+            error = f"Report {status['status']} process {pid} exited"
+        elif status['status'] == 'rendering' and time.time() - status.get('started_at', 0) > self.job_timeout:
+            error = f"Report still rendering after {self.job_timeout:g}s"
+        else:
+            return status
+
+        if not _claim_final(self.jobs_dir, status['job_id']):
+            # The render finished meanwhile
+            return self._read_status(status['job_id']) or status
+        status = dict(status, status='failed', progress=1.0, error=error, updated_at=time.time())
+        _write_status(self.jobs_dir, status['job_id'], status)
+        return status
+
+    def _cleanup_old_jobs(self):
+        """Remove stale job status files, at most once an hour"""
+        now = time.time()
+        if now - self._last_cleanup < 3600:
+            return
+        self._last_cleanup = now
+
+        for entry in os.scandir(self.jobs_dir):
+            try:
+                if now - entry.stat().st_mtime > self.JOB_RETENTION_SECONDS:
+                    os.remove(entry.path)
+            except FileNotFoundError:
+                pass
@@ -0,0 +1,124 @@
+# report_retention.py
+import fcntl
+import os
+import threading
+import time
+from typing import Dict, List
+from report_index import ReportIndex
+
+
+def mark_downloaded(filepath: str):
+    """Record a download in the file's atime, which drives LRU eviction"""
+    try:
+        os.utime(filepath, (time.time(), os.stat(filepath).st_mtime))
+    except FileNotFoundError:
+        pass
+
+
+class RetentionManager:
+    def __init__(self, report_path: str, max_age_seconds: float, max_bytes: int):
+        """Initialize report retention with age and size limits"""
+        self.report_path = report_path
+        self.max_age_seconds = max_age_seconds
+        self.max_bytes = max_bytes
+        self.report_index = ReportIndex(report_path)
+
+    def _scan(self) -> List[Dict]:
+        """List every report file in the shards and the old flat layout"""
+        reports = []
+        for entry in os.scandir(self.report_path):
+            if entry.is_dir():
+                candidates = list(os.scandir(entry.path))
+            elif entry.name.endswith('.pdf'):
+                candidates = [entry]
+            else:
+                continue
+
+            for candidate in candidates:
+                if not candidate.name.endswith('.pdf'):
+                    continue
+                try:
+                    stat = candidate.stat()
+                except FileNotFoundError:
+                    continue
+                reports.append({
+                    'path': candidate.path,
+                    'size': stat.st_size,
+                    'created': stat.st_mtime,
+                    # atime is bumped on every download; never older than creation
+                    'last_access': max(stat.st_atime, stat.st_mtime)
+                })
+        return reports
+
+    def sweep(self) -> Dict:
+        """Delete expired reports, then least recently downloaded ones until under quota"""
+        now = time.time()
+        reports = self._scan()
+
+        expired = [r for r in reports if now - r['created'] > self.max_age_seconds]
+        kept = [r for r in reports if now - r['created'] <= self.max_age_seconds]
+
+        # Least recently downloaded first
+        kept.sort(key=lambda r: r['last_access'])
+        total_bytes = sum(r['size'] for r in kept)
+        evicted = []
+        while kept and total_bytes > self.max_bytes:
+            report = kept.pop(0)
+            total_bytes -= report['size']
+            evicted.append(report)
+
+        removed = []
+        for report in expired + evicted:
+            try:
+                os.remove(report['path'])
+                removed.append(report['path'])
+            except FileNotFoundError:
+                pass
+
+        if removed:
+            self.report_index.remove(removed)
+
+        return {
+            'expired': len(expired),
+            'evicted': len(evicted),
+            'remaining_bytes': total_bytes
+        }
+
+
+class RetentionSweeper:
+    def __init__(self, manager: RetentionManager, interval_seconds: float):
+        """Run retention sweeps on a background thread"""
+        self.manager = manager
+        self.interval_seconds = interval_seconds
+        self.lock_path = os.path.join(manager.report_path, '.sweep.lock')
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """Start the sweeper thread (once per process)"""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='report-retention', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.wait(self.interval_seconds):
+            self.sweep_once()
+
+    def sweep_once(self):
+        """Sweep unless another worker process is already sweeping"""
+        with open(self.lock_path, 'a+b') as lock_file:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                return None
+
+            try:
+                return self.manager.sweep()
+            except OSError as e:
+                print(f"Error in report retention sweep: {str(e)}")
+                return None
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
@@ -0,0 +1,110 @@
+# response_cache.py
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+import metrics
+
+
+class ResponseCache:
+    def __init__(self, max_entries: int = 1000, max_bytes: int = 32 * 1024 * 1024, ttl_seconds: float = 600,
+                 name: str = None):
+        """Thread-safe LRU cache with TTL and byte-size limits.
+
+        Values are stored serialized, so every read returns a private copy
+        that callers can mutate freely. A named cache also counts its hits,
+        misses, evictions and expirations on /metrics.
+        """
+        self.name = name
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+
+        # key -> (expires_at, serialized value)
+        self._entries: "OrderedDict[Tuple, Tuple[float, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.current_bytes = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key: Tuple) -> Optional[Any]:
+        """Get a copy of a cached value, or None on a miss"""
+        expired = False
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] < time.monotonic():
+                self._remove(key)
+                self.expirations += 1
+                expired = True
+                entry = None
+
+            if entry is None:
+                self.misses += 1
+            else:
+                self._entries.move_to_end(key)
+                self.hits += 1
+
+        # Exported counters are updated outside the cache lock
+        if expired:
+            self._count('expiration')
+        if entry is None:
+            self._count('miss')
+            return None
+        self._count('hit')
+        serialized = entry[1]
+        # Deserialize outside the lock; the result is the caller's own copy
+        return json.loads(serialized)
+
+    def set(self, key: Tuple, value: Any):
+        """Cache a value, evicting least recently used entries to stay within limits"""
+        serialized = json.dumps(value, separators=(',', ':'), default=str)
+        size = len(serialized)
+        if size > self.max_bytes:
+            return
+
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, serialized)
+            self.current_bytes += size
+
+            evicted = 0
+            while len(self._entries) > self.max_entries or self.current_bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                evicted += 1
+            self.evictions += evicted
+
+        if evicted:
+            self._count('eviction', evicted)
+
+    def _count(self, event: str, amount: int = 1):
+        if self.name:
+            metrics.count_cache(self.name, event, amount)
+
+    def _remove(self, key: Tuple):
+        _, serialized = self._entries.pop(key)
+        self.current_bytes -= len(serialized)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+
+    def stats(self) -> Dict:
+        """Hit/miss counters and current size"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'bytes': self.current_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'hit_rate': round(self.hits / lookups, 3) if lookups else 0.0
+            }
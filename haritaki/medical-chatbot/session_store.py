@@ -0,0 +1,227 @@
+# session_store.py
+import json
+import os
+import sqlite3
+import threading
+import time
+import fcntl
+import zlib
+from contextlib import contextmanager
+from typing import Dict, Optional
+from config import Config
+import metrics
+
+
+class SessionStore:
+    """Common interface for session backends"""
+
+    LOCK_STRIPES = 256
+
+    def __init__(self):
+        # Striped locks give per-session exclusion without one lock object per session
+        self._locks = [threading.Lock() for _ in range(self.LOCK_STRIPES)]
+        self._last_sweep = time.time()
+
+    def stripe(self, session_id: str) -> int:
+        """Map a session to its lock stripe (stable across processes)"""
+        return zlib.crc32(session_id.encode('utf-8')) % self.LOCK_STRIPES
+
+    @contextmanager
+    def lock(self, session_id: str):
+        """Hold exclusive access to one session for a read-modify-write cycle.
+
+        /api/chat holds it for a whole turn, LLM call included, so a session's
+        turns stay in order. That is bounded by LLM_QUEUE_TIMEOUT + LLM_TIMEOUT
+        (the LLM client's deadline is wall-clock); the streaming routes only
+        hold it to read and write the session.
+        """
+        with self._locks[self.stripe(session_id)]:
+            yield
+
+    def get(self, session_id: str) -> Optional[Dict]:
+        raise NotImplementedError
+
+    def save(self, session_id: str, session: Dict):
+        raise NotImplementedError
+
+    def delete(self, session_id: str):
+        raise NotImplementedError
+
+    def sweep(self) -> int:
+        """Delete sessions idle for longer than SESSION_TTL; returns how many"""
+        raise NotImplementedError
+
+    def _expiry_cutoff(self) -> float:
+        return time.time() - Config.SESSION_TTL
+
+    def _maybe_sweep(self):
+        """Sweep expired sessions at most once per SESSION_SWEEP_INTERVAL"""
+        now = time.time()
+        if now - self._last_sweep < Config.SESSION_SWEEP_INTERVAL:
+            return
+        self._last_sweep = now
+        try:
+            self.sweep()
+        except sqlite3.Error as e:
+            print(f"Error in session sweep: {str(e)}")
+
+    def _bounded(self, session: Dict) -> Dict:
+        """Trim the conversation so the cost of storing a session stays bounded"""
+        conversation = session.get('conversation', [])
+        if len(conversation) > Config.MAX_CONVERSATION_HISTORY:
+            session = dict(session, conversation=conversation[-Config.MAX_CONVERSATION_HISTORY:])
+        return session
+
+
+class InMemorySessionStore(SessionStore):
+    """Process-local sessions; only valid with a single worker process"""
+
+    def __init__(self):
+        super().__init__()
+        self.sessions = {}
+        self.updated_at = {}
+
+    def get(self, session_id: str) -> Optional[Dict]:
+        if self.updated_at.get(session_id, 0) <= self._expiry_cutoff():
+            return None
+        return self.sessions.get(session_id)
+
+    def save(self, session_id: str, session: Dict):
+        self.sessions[session_id] = self._bounded(session)
+        self.updated_at[session_id] = time.time()
+        self._maybe_sweep()
+
+    def delete(self, session_id: str):
+        self.sessions.pop(session_id, None)
+        self.updated_at.pop(session_id, None)
+
+    def sweep(self) -> int:
+        cutoff = self._expiry_cutoff()
+        expired = [session_id for session_id, updated_at in list(self.updated_at.items()) if updated_at <= cutoff]
+        for session_id in expired:
+            self.delete(session_id)
+        return len(expired)
+
+
+class SQLiteSessionStore(SessionStore):
+    """Sessions shared by every worker on the host through a SQLite file in WAL mode"""
+
+    def __init__(self, db_path: str):
+        super().__init__()
+        self.db_path = db_path
+        self.lock_path = db_path + '.lock'
+        self._local = threading.local()
+        self._lock_file = None
+        self._lock_file_pid = None
+        self._lock_file_lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        conn = self._connection()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS sessions ("
+            "session_id TEXT PRIMARY KEY, data TEXT NOT NULL, updated_at REAL NOT NULL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS sessions_updated_at ON sessions (updated_at)")
+        conn.commit()
+
+    def _connection(self) -> sqlite3.Connection:
+        """One connection per thread, reopened after a fork"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _get_lock_file(self):
+        """Open the shared lock file once per process"""
+        if self._lock_file is None or self._lock_file_pid != os.getpid():
+            with self._lock_file_lock:
+                # Threads on other stripes may race to open it; only one does
+                if self._lock_file is None or self._lock_file_pid != os.getpid():
+                    self._lock_file = open(self.lock_path, 'a+b')
+                    self._lock_file_pid = os.getpid()
+        return self._lock_file
+
+    @contextmanager
+    def lock(self, session_id: str):
+        """Exclude other threads and other worker processes from this session"""
+        stripe = self.stripe(session_id)
+        with self._locks[stripe]:
+            # Byte-range lock on the stripe's offset makes the lock visible across processes
+            lock_file = self._get_lock_file()
+            fcntl.lockf(lock_file, fcntl.LOCK_EX, 1, stripe)
+            try:
+                yield
+            finally:
+                fcntl.lockf(lock_file, fcntl.LOCK_UN, 1, stripe)
+
+    def get(self, session_id: str) -> Optional[Dict]:
+        row = self._connection().execute(
+            "SELECT data FROM sessions WHERE session_id = ? AND updated_at > ?", (session_id, self._expiry_cutoff())
+        ).fetchone()
+        if not row:
+            return None
+
+        session = json.loads(row[0])
+        # Sessions saved as compact [role, message, type, timestamp, data] rows by an earlier release
+        session['conversation'] = [
+            message if isinstance(message, dict) else {
+                key: value for key, value in zip(('role', 'message', 'type', 'timestamp', 'data'), message)
+                if value is not None
+            }
+            for message in session.get('conversation', [])
+        ]
+        return session
+
+    def save(self, session_id: str, session: Dict):
+        session = self._bounded(session)
+        conversation = session.get('conversation', [])
+        data = self._serialize(session, conversation)
+        if len(data) > Config.SESSION_MAX_BYTES:
+            # Over budget: keep only the newest message's structured payload
+            conversation = [
+                {key: value for key, value in message.items() if key != 'data'}
+                for message in conversation[:-1]
+            ] + conversation[-1:]
+            data = self._serialize(session, conversation)
+        while len(data) > Config.SESSION_MAX_BYTES and len(conversation) > 1:
+            # Still over: drop the oldest turns
+            conversation = conversation[len(conversation) // 2:]
+            data = self._serialize(session, conversation)
+        if len(data) > Config.SESSION_MAX_BYTES:
+            raise ValueError(f"Session {session_id} is larger than SESSION_MAX_BYTES")
+
+        with metrics.timed('session_write'):
+            conn = self._connection()
+            conn.execute(
+                "INSERT OR REPLACE INTO sessions (session_id, data, updated_at) VALUES (?, ?, ?)",
+                (session_id, data, time.time())
+            )
+            conn.commit()
+        self._maybe_sweep()
+
+    def _serialize(self, session: Dict, conversation) -> str:
+        return json.dumps(dict(session, conversation=conversation), separators=(',', ':'), default=str)
+
+    def delete(self, session_id: str):
+        conn = self._connection()
+        conn.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+        conn.commit()
+
+    def sweep(self) -> int:
+        conn = self._connection()
+        deleted = conn.execute("DELETE FROM sessions WHERE updated_at <= ?", (self._expiry_cutoff(),)).rowcount
+        conn.commit()
+        return deleted
+
+
+def create_session_store(backend: str, db_path: str) -> SessionStore:
+    """Create the session backend selected in config"""
+    if backend == 'sqlite':
+        return SQLiteSessionStore(db_path)
+    if backend == 'memory':
+        return InMemorySessionStore()
+    raise ValueError(f"Unknown session backend: {backend}")
@@ -148,26 +148,12 @@ document.addEventListener('DOMContentLoaded', function() {
         showTypingIndicator();
 
         try {
-            const response = await fetch(`${API_BASE}/chat`, {
-                method: 'POST',
-                headers: {
-                    'Content-Type': 'application/json'
-                },
-                body: JSON.stringify({
-                    message: message,
-                    session_id: sessionId
-                })
-            });
-
-            const data = await response.json();
-            hideTypingIndicator();
+            // Stream the reply when the browser can read response bodies progressively
+            const aiResponse = (window.ReadableStream && window.TextDecoder)
+                ? await streamChatReply(message)
+                : await fetchChatReply(message);
 
-            if (data.response) {
-                const aiResponse = data.response;
-                
-                // Add AI response to chat
-                addMessage('assistant', aiResponse.message);
-                
+            if (aiResponse) {
                 // Update medical panels if data is available
                 if (aiResponse.data) {
                     updateMedicalPanels(aiResponse.data);
@@ -194,6 +180,110 @@ document.addEventListener('DOMContentLoaded', function() {
         }
     }
 
+    async function fetchChatReply(message) {
+        const response = await fetch(`${API_BASE}/chat`, {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json'
+            },
+            body: JSON.stringify({
+                message: message,
+                session_id: sessionId
+            })
+        });
+
+        const data = await response.json();
+
+        // The server no longer pauses for realism; play its typing-delay hint here
+        const typingDelay = data.response && data.response.data && data.response.data.typing_delay_ms;
+        if (typingDelay) {
+            await new Promise(resolve => setTimeout(resolve, typingDelay));
+        }
+        hideTypingIndicator();
+
+        if (data.response) {
+            // Add AI response to chat
+            addMessage('assistant', data.response.message);
+        }
+
+        return data.response;
+    }
+
+    async function streamChatReply(message) {
+        const response = await fetch(`${API_BASE}/chat/stream`, {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json'
+            },
+            body: JSON.stringify({
+                message: message,
+                session_id: sessionId
+            })
+        });
+
+        if (!response.ok || !response.body) {
+            throw new Error(`HTTP error! status: ${response.status}`);
+        }
+
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = '';
+        let text = '';
+        let messageDiv = null;
+        let finalResponse = null;
+
+        // Render text as it arrives; the final event carries the structured analysis
+        const showText = content => {
+            if (!messageDiv) {
+                hideTypingIndicator();
+                messageDiv = addMessage('assistant', content);
+            } else {
+                messageDiv.querySelector('.message-text p').innerHTML = formatMessage(content);
+                chatMessages.scrollTop = chatMessages.scrollHeight;
+            }
+        };
+
+        while (true) {
+            const { value, done } = await reader.read();
+            if (done) break;
+
+            buffer += decoder.decode(value, { stream: true });
+
+            let boundary;
+            while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+                const event = parseServerSentEvent(buffer.slice(0, boundary));
+                buffer = buffer.slice(boundary + 2);
+
+                if (event.name === 'delta') {
+                    text += event.data.text;
+                    showText(text);
+                } else if (event.name === 'response') {
+                    finalResponse = event.data;
+                    showText(finalResponse.message);
+                } else if (event.name === 'error') {
+                    throw new Error(event.data.error);
+                }
+            }
+        }
+
+        return finalResponse;
+    }
+
+    function parseServerSentEvent(rawEvent) {
+        let name = 'message';
+        const dataLines = [];
+
+        rawEvent.split('\n').forEach(line => {
+            if (line.startsWith('event:')) {
+                name = line.slice(6).trim();
+            } else if (line.startsWith('data:')) {
+                dataLines.push(line.slice(5).trim());
+            }
+        });
+
+        return { name: name, data: dataLines.length ? JSON.parse(dataLines.join('\n')) : {} };
+    }
+
     async function generateMedicalReport() {
         if (!sessionId) {
             alert('Please start a consultation first.');
@@ -219,7 +309,12 @@ document.addEventListener('DOMContentLoaded', function() {
                 throw new Error(`HTTP error! status: ${response.status}`);
             }
 
-            const data = await response.json();
+            let data = await response.json();
+
+            // Reports render in the background; poll until the job finishes
+            if (data.job_id) {
+                data = await waitForReport(data.status_url);
+            }
             
             if (data.report_url) {
                 // Create a temporary link to download the PDF
@@ -285,6 +380,31 @@ downloadLink.setAttribute('download', '');
         }
     }
 
+    async function waitForReport(statusUrl) {
+        const statusEndpoint = `${window.location.origin}${statusUrl}`;
+
+        for (let attempt = 0; attempt < 120; attempt++) {
+            await new Promise(resolve => setTimeout(resolve, 1000));
+
+            const response = await fetch(statusEndpoint);
+            if (!response.ok) {
+                throw new Error(`HTTP error! status: ${response.status}`);
+            }
+
+            const status = await response.json();
+            if (status.status === 'done') {
+                return status;
+            }
+            if (status.status === 'failed') {
+                return { error: status.error || 'Report generation failed' };
+            }
+
+            generateReportBtn.innerHTML = `<i class="fas fa-spinner fa-spin"></i> Generating... ${Math.round((status.progress || 0) * 100)}%`;
+        }
+
+        return { error: 'Report generation timed out' };
+    }
+
     // UI Helper Functions
     function addMessage(sender, content) {
         const messageDiv = document.createElement('div');
@@ -309,6 +429,8 @@ downloadLink.setAttribute('download', '');
         
         chatMessages.appendChild(messageDiv);
         chatMessages.scrollTop = chatMessages.scrollHeight;
+        
+        return messageDiv;
     }
 
     function formatMessage(content) {
@@ -1,7 +1,11 @@
 # symptom_checker.py
 import json
+import heapq
 from typing import Dict, List, Any
 from datetime import datetime
+from symptom_index import SymptomIndex
+from fuzzy_index import TrigramIndex
+from symptom_normalizer import get_normalizer
 
 class SymptomChecker:
     def __init__(self):
@@ -9,6 +13,39 @@ class SymptomChecker:
         self.symptom_database = self._load_symptom_database()
         self.disease_patterns = self._load_disease_patterns()
         
+        # Symptoms are compared as interned canonical IDs (see symptom_normalizer.py)
+        self.normalizer = get_normalizer()
+        self.normalizer.register_terms(self._get_all_known_symptoms())
+        for pattern in self.disease_patterns.values():
+            self.normalizer.register_terms(pattern["symptoms"])
+        
+        # Inverted symptom ID -> disease index, built once
+        self.disease_index = SymptomIndex({
+            disease: dict(pattern, symptoms=self.normalizer.normalize_all(pattern["symptoms"]))
+            for disease, pattern in self.disease_patterns.items()
+        })
+        
+        # Symptom ID -> its categories, in database order
+        self.symptom_categories: Dict[str, List[str]] = {}
+        for category, symptom_list in self.symptom_database.items():
+            for symptom_id in self.normalizer.normalize_all(symptom_list):
+                self.symptom_categories.setdefault(symptom_id, []).append(category)
+        
+        # Known symptom lexicon and its fuzzy (trigram) index; synonyms suggest their canonical symptom
+        self.known_symptoms = frozenset(self.symptom_categories)
+        self.symptom_matcher = TrigramIndex({
+            phrase: symptom_id for phrase, symptom_id in sorted(self.normalizer.variants().items())
+            if symptom_id in self.known_symptoms
+        })
+        
+        # Symptoms that raise the urgency level on their own
+        self.emergency_symptoms = frozenset(self.normalizer.normalize_all([
+            "chest pain", "shortness of breath", "severe headache", "uncontrolled bleeding", "loss of consciousness"
+        ]))
+        self.moderate_symptoms = frozenset(self.normalizer.normalize_all([
+            "fever", "vomiting", "severe pain", "dizziness"
+        ]))
+        
     def _load_symptom_database(self) -> Dict:
         """Load symptom database"""
         return {
@@ -51,33 +88,54 @@ class SymptomChecker:
     
     def analyze_symptoms(self, symptoms: List[str], patient_data: Dict) -> Dict:
         """Analyze symptoms and provide preliminary assessment"""
+        symptoms = self.normalizer.normalize_all(symptoms or [])
         if not symptoms:
             return {
                 "error": "No symptoms provided",
                 "urgency_level": "unknown"
             }
         
+        # Match against disease patterns sharing at least one symptom
+        matches = self.disease_index.score(symptoms, threshold=0.3)  # Threshold for possible match
+        
+        return self._build_assessment(symptoms, patient_data, matches)
+    
+    def analyze_symptoms_batch(self, cases: List[Dict]) -> List[Dict]:
+        """Analyze many patients at once; each result matches analyze_symptoms"""
+        symptom_lists = [self.normalizer.normalize_all(case.get("symptoms") or []) for case in cases]
+        
+        # Score every patient against every disease in one sparse matrix multiply
+        batch_matches = self.disease_index.score_batch(symptom_lists, threshold=0.3)
+        
+        results = []
+        for case, symptoms, matches in zip(cases, symptom_lists, batch_matches):
+            if not symptoms:
+                results.append({
+                    "error": "No symptoms provided",
+                    "urgency_level": "unknown"
+                })
+            else:
+                results.append(self._build_assessment(symptoms, case.get("patient_data") or {}, matches))
+        
+        return results
+    
+    def _build_assessment(self, symptoms: List[str], patient_data: Dict, matches: List) -> Dict:
+        """Build the assessment for one patient from their scored disease matches"""
         # Categorize symptoms
         categories = {}
         for symptom in symptoms:
-            for category, symptom_list in self.symptom_database.items():
-                if symptom in symptom_list:
-                    categories.setdefault(category, []).append(symptom)
+            for category in self.symptom_categories.get(symptom, ()):
+                categories.setdefault(category, []).append(symptom)
         
-        # Match against disease patterns
         possible_conditions = []
-        for disease, pattern in self.disease_patterns.items():
-            match_score = self._calculate_match_score(symptoms, pattern["symptoms"])
-            if match_score > 0.3:  # Threshold for possible match
-                possible_conditions.append({
-                    "disease": disease.replace("_", " ").title(),
-                    "match_score": match_score,
-                    "severity": pattern["severity"],
-                    "urgency": pattern["urgency"]
-                })
-        
-        # Sort by match score
-        possible_conditions.sort(key=lambda x: x["match_score"], reverse=True)
+        for disease, match_score in matches:
+            pattern = self.disease_patterns[disease]
+            possible_conditions.append({
+                "disease": disease.replace("_", " ").title(),
+                "match_score": match_score,
+                "severity": pattern["severity"],
+                "urgency": pattern["urgency"]
+            })
         
         # Determine urgency level
         urgency_level = self._determine_urgency_level(symptoms, possible_conditions)
@@ -88,7 +146,7 @@ class SymptomChecker:
         return {
             "symptoms": symptoms,
             "symptom_categories": categories,
-            "possible_conditions": possible_conditions[:5],  # Top 5
+            "possible_conditions": heapq.nlargest(5, possible_conditions, key=lambda x: x["match_score"]),  # Top 5
             "urgency_level": urgency_level,
             "severity": severity,
             "recommended_actions": self._get_recommended_actions(urgency_level),
@@ -106,10 +164,7 @@ class SymptomChecker:
     def _determine_urgency_level(self, symptoms: List[str], possible_conditions: List[Dict]) -> str:
         """Determine urgency level based on symptoms and possible conditions"""
         # Check for emergency symptoms
-        emergency_symptoms = ["chest pain", "shortness of breath", "severe headache", 
-                            "uncontrolled bleeding", "loss of consciousness"]
-        
-        if any(symptom in symptoms for symptom in emergency_symptoms):
+        if not self.emergency_symptoms.isdisjoint(symptoms):
             return "high"
         
         # Check if any possible condition has high urgency
@@ -118,8 +173,7 @@ class SymptomChecker:
                 return "high"
         
         # Check for moderate symptoms
-        moderate_symptoms = ["fever", "vomiting", "severe pain", "dizziness"]
-        if any(symptom in symptoms for symptom in moderate_symptoms):
+        if not self.moderate_symptoms.isdisjoint(symptoms):
             return "medium"
         
         return "low"
@@ -192,14 +246,10 @@ class SymptomChecker:
         valid_symptoms = []
         unrecognized = []
         
-        # Flatten all known symptoms
-        all_known_symptoms = []
-        for category in self.symptom_database.values():
-            all_known_symptoms.extend(category)
-        
         for symptom in symptoms:
-            if symptom in all_known_symptoms:
-                valid_symptoms.append(symptom)
+            symptom_id = self.normalizer.normalize(symptom)
+            if symptom_id in self.known_symptoms:
+                valid_symptoms.append(symptom_id)
             else:
                 unrecognized.append(symptom)
         
@@ -214,16 +264,11 @@ class SymptomChecker:
         suggestions = {}
         
         for symptom in symptoms:
-            symptom_lower = symptom.lower()
-            similar = []
-            
-            # Check for similar symptoms in database
-            for known_symptom in self._get_all_known_symptoms():
-                if symptom_lower in known_symptom or known_symptom in symptom_lower:
-                    similar.append(known_symptom)
+            # Ranked by spelling similarity, so typos ("diarhea") are caught too
+            similar = self.symptom_matcher.search(symptom, limit=3)
             
             if similar:
-                suggestions[symptom] = similar[:3]  # Top 3 suggestions
+                suggestions[symptom] = [known_symptom for known_symptom, _ in similar]  # Top 3 suggestions
         
         return suggestions
     
@@ -0,0 +1,99 @@
+# symptom_index.py
+from typing import Dict, List, Tuple
+
+
+class SymptomIndex:
+    def __init__(self, disease_patterns: Dict[str, Dict]):
+        """Build an inverted symptom -> disease index once at startup"""
+        self.diseases: List[str] = []
+        self.pattern_sizes: List[int] = []
+        self.index: Dict[str, List[int]] = {}
+
+        for disease_id, (disease, pattern) in enumerate(disease_patterns.items()):
+            self.diseases.append(disease)
+            self.pattern_sizes.append(len(pattern["symptoms"]))
+            for symptom in set(pattern["symptoms"]):
+                self.index.setdefault(symptom, []).append(disease_id)
+
+        # Column per symptom, built on the first batch query
+        self.symptom_columns: Dict[str, int] = {}
+        self.disease_matrix = None
+
+    def score(self, symptoms: List[str], threshold: float = 0.0) -> List[Tuple[str, float]]:
+        """Score only the diseases that share at least one symptom with the query.
+
+        The score matches the old linear scan: matched symptoms divided by the
+        size of the disease pattern. Results keep the pattern order so ties
+        break the same way they used to.
+        """
+        matched_counts: Dict[int, int] = {}
+        for symptom in set(symptoms):
+            for disease_id in self.index.get(symptom, ()):
+                matched_counts[disease_id] = matched_counts.get(disease_id, 0) + 1
+
+        matches = []
+        for disease_id in sorted(matched_counts):
+            match_score = matched_counts[disease_id] / self.pattern_sizes[disease_id]
+            if match_score > threshold:
+                matches.append((self.diseases[disease_id], match_score))
+
+        return matches
+
+    def _build_disease_matrix(self):
+        """Encode the disease patterns as a sparse binary symptom x disease matrix"""
+        # numpy/scipy are only needed for batch scoring; keep them out of startup
+        import numpy as np
+        from scipy import sparse
+
+        rows, cols = [], []
+        for column, (symptom, disease_ids) in enumerate(self.index.items()):
+            self.symptom_columns[symptom] = column
+            rows.extend([column] * len(disease_ids))
+            cols.extend(disease_ids)
+
+        self.disease_matrix = sparse.csr_matrix(
+            (np.ones(len(rows), dtype=np.float64), (rows, cols)),
+            shape=(len(self.symptom_columns), len(self.diseases))
+        )
+        self.pattern_size_array = np.array(self.pattern_sizes, dtype=np.float64)
+
+    def score_batch(self, symptom_lists: List[List[str]], threshold: float = 0.0) -> List[List[Tuple[str, float]]]:
+        """Score many symptom lists with a single sparse matrix multiply.
+
+        Each result row is identical to what ``score`` returns for that list.
+        """
+        import numpy as np
+        from scipy import sparse
+
+        if self.disease_matrix is None:
+            self._build_disease_matrix()
+
+        # One binary row per patient; unknown symptoms have no column and are skipped
+        rows, cols = [], []
+        for row, symptoms in enumerate(symptom_lists):
+            for symptom in set(symptoms):
+                column = self.symptom_columns.get(symptom)
+                if column is not None:
+                    rows.append(row)
+                    cols.append(column)
+
+        patient_matrix = sparse.csr_matrix(
+            (np.ones(len(rows), dtype=np.float64), (rows, cols)),
+            shape=(len(symptom_lists), len(self.symptom_columns))
+        )
+
+        # Matched symptom counts for every patient/disease pair, then divided by pattern size
+        scores = (patient_matrix @ self.disease_matrix).tocsr()
+        scores.sort_indices()
+        scores.data = scores.data / self.pattern_size_array[scores.indices]
+
+        results = []
+        for row in range(len(symptom_lists)):
+            start, end = scores.indptr[row], scores.indptr[row + 1]
+            results.append([
+                (self.diseases[disease_id], float(match_score))
+                for disease_id, match_score in zip(scores.indices[start:end], scores.data[start:end])
+                if match_score > threshold
+            ])
+
+        return results
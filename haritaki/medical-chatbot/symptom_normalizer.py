@@ -0,0 +1,157 @@
+# symptom_normalizer.py
+import re
+import sys
+import threading
+from functools import lru_cache
+from typing import Dict, Iterable, List
+from config import Config
+
+# Canonical symptom -> everyday phrasings and spellings that mean the same thing
+SYNONYMS = {
+    "abdominal pain": ["stomach pain", "stomach ache", "stomachache", "tummy ache", "tummy pain",
+                       "belly pain", "belly ache", "abdominal ache", "stomach cramps", "abdominal cramps"],
+    "back pain": ["backache", "back ache", "lower back pain"],
+    "body aches": ["body ache", "body pain", "aching body", "aches and pains"],
+    "chest pain": ["chest ache", "chest tightness", "tight chest", "pain in chest"],
+    "chills": ["shivering", "shivers"],
+    "congestion": ["stuffy nose", "blocked nose", "stuffed up nose"],
+    "cough": ["coughing", "coughing fits"],
+    "diarrhea": ["diarrhoea", "loose stools", "loose motions"],
+    "dizziness": ["dizzy", "lightheaded", "light headed", "lightheadedness", "vertigo"],
+    "fatigue": ["tiredness", "tired", "exhaustion", "exhausted", "lethargy", "no energy"],
+    "fever": ["high temperature", "temperature", "feverish", "pyrexia", "febrile"],
+    "headache": ["head ache", "head pain", "head hurts", "pain in head", "sore head"],
+    "heartburn": ["acid reflux", "reflux", "acidity"],
+    "insomnia": ["sleeplessness", "cant sleep", "cannot sleep", "trouble sleeping"],
+    "joint pain": ["joint ache", "arthralgia", "sore joints", "aching joints"],
+    "loss of appetite": ["no appetite", "poor appetite", "not hungry", "appetite loss"],
+    "loss of taste/smell": ["loss of taste", "loss of smell", "anosmia", "cant taste", "cant smell"],
+    "muscle pain": ["muscle ache", "myalgia", "sore muscles", "aching muscles"],
+    "nausea": ["nauseous", "nauseated", "queasy", "feeling sick", "sick to my stomach"],
+    "palpitations": ["racing heart", "heart racing", "pounding heart", "heart pounding"],
+    "runny nose": ["running nose", "nose running", "rhinorrhea", "dripping nose"],
+    "shortness of breath": ["breathlessness", "short of breath", "difficulty breathing",
+                            "trouble breathing", "hard to breathe", "dyspnea", "breathless"],
+    "sneezing": ["sneeze", "sneezes"],
+    "sore throat": ["throat pain", "scratchy throat", "throat ache", "painful throat", "throat hurts"],
+    "sweating": ["sweats", "sweaty", "perspiration"],
+    "vomiting": ["throwing up", "vomit", "puking", "being sick"],
+}
+
+# Filler words that never change which symptom is meant
+STOP_WORDS = frozenset(("a", "an", "the", "my", "i", "have", "got", "some", "really", "very", "bit"))
+
+IRREGULAR = {"feet": "foot", "teeth": "tooth", "lice": "louse"}
+
+WORD = re.compile(r"[a-z0-9/]+")
+
+
+def lemma(word: str) -> str:
+    """Crude inflection stripper; both lexicon and queries go through it, so
+    it only has to be consistent, not linguistically exact"""
+    if word in IRREGULAR:
+        return IRREGULAR[word]
+    if len(word) > 4:
+        if word.endswith("ies"):
+            word = word[:-3] + "y"
+        elif word.endswith("sses"):
+            word = word[:-2]
+        elif word.endswith(("ches", "shes", "xes", "zes")):
+            word = word[:-2]
+        elif word.endswith("s") and not word.endswith(("ss", "us", "is")):
+            word = word[:-1]
+    for suffix in ("ing", "ed"):
+        # "bleed" is a stem, not bleed-ed
+        if suffix == "ed" and word.endswith("eed"):
+            break
+        if word.endswith(suffix) and len(word) - len(suffix) >= 3:
+            word = word[:-len(suffix)]
+            # running -> run, but swelling -> swell
+            if len(word) > 3 and word[-1] == word[-2] and word[-1] not in "lsz":
+                word = word[:-1]
+            break
+    # ache/aches and nose/noses must meet at the same stem
+    if len(word) > 3 and word.endswith("e"):
+        word = word[:-1]
+    return word
+
+
+def phrase_key(phrase: str) -> str:
+    """Lookup key: lowercase, punctuation and filler dropped, every word lemmatized"""
+    words = WORD.findall(phrase.lower().replace("'", ""))
+    return " ".join(lemma(word) for word in words if word not in STOP_WORDS)
+
+
+class SymptomNormalizer:
+    def __init__(self, synonyms: Dict[str, List[str]] = SYNONYMS, cache_size: int = 4096):
+        """Map raw symptom phrases to interned canonical symptom IDs"""
+        self._keys: Dict[str, str] = {}
+        self._phrases: Dict[str, str] = {}
+        self._lock = threading.Lock()
+        # Bounded memo of raw phrase -> ID; repeated phrases skip the pipeline
+        self._normalize_cached = lru_cache(maxsize=cache_size)(self._normalize)
+
+        for canonical, variants in synonyms.items():
+            self.register(canonical, variants)
+
+    def register(self, canonical: str, variants: Iterable[str] = ()):
+        """Add a canonical symptom and its variants; earlier mappings win"""
+        symptom_id = sys.intern(" ".join(canonical.lower().split()))
+        with self._lock:
+            for phrase in (canonical, *variants):
+                self._keys.setdefault(phrase_key(phrase), symptom_id)
+                self._phrases.setdefault(" ".join(phrase.lower().split()), symptom_id)
+            self._normalize_cached.cache_clear()
+
+    def register_terms(self, terms: Iterable[str]):
+        """Add known symptoms that have no listed variants"""
+        for term in terms:
+            self.register(term)
+
+    def _normalize(self, phrase: str) -> str:
+        key = phrase_key(phrase)
+        symptom_id = self._keys.get(key)
+        if symptom_id is None:
+            # Unknown symptom: its own ID, cleaned up so spacing and case don't matter
+            symptom_id = " ".join(phrase.lower().split())
+        return sys.intern(symptom_id)
+
+    def normalize(self, phrase: str) -> str:
+        """Canonical ID for one symptom phrase"""
+        return self._normalize_cached(phrase)
+
+    def normalize_all(self, phrases: Iterable[str]) -> List[str]:
+        """Canonical IDs in first-seen order, without duplicates or blanks"""
+        normalize = self._normalize_cached
+        ids = []
+        seen = set()
+        for phrase in phrases:
+            if not isinstance(phrase, str):
+                continue
+            symptom_id = normalize(phrase)
+            if symptom_id and symptom_id not in seen:
+                seen.add(symptom_id)
+                ids.append(symptom_id)
+        return ids
+
+    def variants(self) -> Dict[str, str]:
+        """Every registered phrase -> canonical ID (e.g. for a fuzzy index)"""
+        with self._lock:
+            return dict(self._phrases)
+
+    def cache_info(self):
+        return self._normalize_cached.cache_info()
+
+
+_normalizer = None
+_normalizer_lock = threading.Lock()
+
+
+def get_normalizer() -> SymptomNormalizer:
+    """Process-wide normalizer shared by the symptom checker, treatment DB and chatbot"""
+    global _normalizer
+    if _normalizer is None:
+        with _normalizer_lock:
+            if _normalizer is None:
+                _normalizer = SymptomNormalizer(cache_size=Config.SYMPTOM_NORMALIZER_CACHE_SIZE)
+    return _normalizer
@@ -0,0 +1,54 @@
+# conftest.py
+import os
+import sys
+import tempfile
+
+import pytest
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, APP_DIR)
+
+# Keep test runs away from the real databases and the real LLM; this has to
+# happen before config.py is imported
+SCRATCH_DIR = tempfile.mkdtemp(prefix='chatbot-tests-')
+os.environ['OPENAI_API_BASE'] = 'http://127.0.0.1:9/v1'
+os.environ['LLM_TIMEOUT'] = '1'
+os.environ['THINKING_DELAY_MODE'] = 'client'
+os.environ['LLM_CACHE_DB_PATH'] = os.path.join(SCRATCH_DIR, 'llm_cache.db')
+os.environ['SESSION_DB_PATH'] = os.path.join(SCRATCH_DIR, 'sessions.db')
+os.environ['RECORDS_INDEX_DB_PATH'] = os.path.join(SCRATCH_DIR, 'records_index.db')
+os.environ['METRICS_DIR'] = ''
+os.environ['PROFILE_DIR'] = ''
+
+from config import Config  # noqa: E402
+
+Config.PATIENT_RECORDS_PATH = os.path.join(SCRATCH_DIR, 'patient_records')
+Config.REPORT_JOBS_PATH = os.path.join(SCRATCH_DIR, 'report_jobs')
+Config.REPORT_PATH = os.path.join(SCRATCH_DIR, 'reports')
+
+
+@pytest.fixture(scope='session')
+def chatbot():
+    from medical_api import MedicalChatbot
+    return MedicalChatbot()
+
+
+@pytest.fixture(scope='session')
+def client():
+    import main
+    return main.app.test_client()
+
+
+@pytest.fixture
+def patient():
+    return {'name': 'Ann', 'age': 34, 'gender': 'female', 'medical_history': 'None provided'}
+
+
+@pytest.fixture
+def fresh_caches(chatbot, monkeypatch, tmp_path):
+    """Empty response and LLM caches, so a test sees its own LLM calls"""
+    from llm_cache import LLMAnswerCache
+    from response_cache import ResponseCache
+
+    monkeypatch.setattr(chatbot, 'llm_cache', LLMAnswerCache(str(tmp_path / 'llm_cache.db')))
+    monkeypatch.setattr(chatbot, 'response_cache', ResponseCache(max_entries=100, max_bytes=1024 * 1024, ttl_seconds=60))
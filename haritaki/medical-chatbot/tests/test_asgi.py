@@ -0,0 +1,105 @@
+# test_asgi.py
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+asgi = pytest.importorskip('asgi')
+
+
+def test_cancelled_waiter_does_not_leak_the_session_lock():
+    async def scenario():
+        held = asgi.sessions.lock('session-1')
+        held.__enter__()
+
+        async def wait_for_lock():
+            async with asgi.session_lock('session-1'):
+                pass
+
+        waiter = asyncio.ensure_future(wait_for_lock())
+        await asyncio.sleep(0.05)
+        waiter.cancel()
+        # Keep the traceback (and with it the waiter's frame) alive, as error
+        # logging would; the lock must not depend on garbage collection
+        with pytest.raises(asyncio.CancelledError) as cancelled:
+            await waiter
+        held.__exit__(None, None, None)
+
+        # The abandoned acquire gets the lock and must hand it straight back
+        async def take():
+            async with asgi.session_lock('session-1'):
+                return True
+
+        try:
+            return await asyncio.wait_for(take(), timeout=2)
+        finally:
+            del cancelled
+
+    assert asyncio.run(scenario())
+
+
+def test_same_session_requests_outnumbering_the_threads_all_finish(patient, monkeypatch):
+    chatbot = asgi.get_chatbot()
+    blocking = ThreadPoolExecutor(max_workers=4)
+    monkeypatch.setattr(chatbot, '_blocking_executor', blocking)
+
+    async def scenario():
+        # Nothing may depend on the loop's default executor either
+        asyncio.get_running_loop().set_default_executor(ThreadPoolExecutor(max_workers=4))
+        client = asgi.app.test_client()
+        started = await client.post('/api/start_session', json=patient)
+        session_id = (await started.get_json())['session_id']
+
+        async def send(i):
+            response = await client.post('/api/chat', json={'message': f"question {i}", 'session_id': session_id})
+            return response.status_code
+
+        statuses = await asyncio.wait_for(asyncio.gather(*(send(i) for i in range(40))), timeout=30)
+        session = await asgi.run_blocking(asgi.sessions.get, session_id)
+        return statuses, session
+
+    try:
+        statuses, session = asyncio.run(scenario())
+    finally:
+        blocking.shutdown(wait=False)
+
+    assert statuses == [200] * 40
+    # Every turn was kept: no request overwrote another's
+    user_turns = [m['message'] for m in session['conversation'] if m['role'] == 'user']
+    assert len(user_turns) == min(40, asgi.Config.MAX_CONVERSATION_HISTORY // 2)
+
+
+def test_chatbot_is_built_before_serving():
+    async def scenario():
+        async with asgi.app.test_app():
+            return asgi._chatbot
+
+    assert asyncio.run(scenario()) is not None
+
+
+def test_diagnosis_and_treatment_endpoints(patient):
+    async def scenario():
+        client = asgi.app.test_client()
+        diagnosis = await client.post('/api/diagnosis', json={'symptoms': ['fever', 'headache'], 'patient_data': patient})
+        body = await diagnosis.get_json()
+        treatment = await client.post('/api/treatment', json={'diagnosis': body, 'patient_data': patient})
+        return diagnosis.status_code, body, treatment.status_code, await treatment.get_json()
+
+    diagnosis_status, diagnosis, treatment_status, treatment = asyncio.run(scenario())
+
+    assert diagnosis_status == 200
+    assert diagnosis['symptoms'] == ['fever', 'headache']
+    assert treatment_status == 200
+    assert treatment['treatments']
+
+
+def test_batch_endpoint_rejects_invalid_cases():
+    async def scenario():
+        client = asgi.app.test_client()
+        statuses = []
+        for body in ({'cases': ['fever']}, {'cases': [{'symptoms': 'fever'}]}, []):
+            response = await client.post('/api/diagnosis/batch', json=body)
+            statuses.append(response.status_code)
+        return statuses
+
+    assert asyncio.run(scenario()) == [400, 400, 400]
@@ -0,0 +1,100 @@
+# test_diagnosis_batch.py
+import random
+
+import pytest
+
+from config import Config
+
+
+@pytest.fixture(scope='module')
+def checker():
+    from symptom_checker import SymptomChecker
+    return SymptomChecker()
+
+
+def _linear_scan(checker, symptoms, threshold=0.3):
+    """The original per-disease loop that the index replaced"""
+    symptoms = checker.normalizer.normalize_all(symptoms)
+    matches = []
+    for disease, pattern in checker.disease_patterns.items():
+        disease_symptoms = checker.normalizer.normalize_all(pattern['symptoms'])
+        match_score = checker._calculate_match_score(symptoms, disease_symptoms)
+        if match_score > threshold:
+            matches.append((disease, match_score))
+    return matches
+
+
+def _random_cases(checker, count):
+    known = sorted(checker.known_symptoms)
+    rng = random.Random(7)
+    return [rng.sample(known, rng.randint(1, 6)) + (['not a symptom'] if i % 5 == 0 else [])
+            for i in range(count)]
+
+
+def test_index_scores_match_the_linear_scan(checker):
+    for symptoms in _random_cases(checker, 200):
+        assert checker.disease_index.score(checker.normalizer.normalize_all(symptoms), threshold=0.3) \
+            == _linear_scan(checker, symptoms)
+
+
+def test_batch_scores_match_the_linear_scan(checker):
+    cases = _random_cases(checker, 200)
+    batch = checker.disease_index.score_batch([checker.normalizer.normalize_all(s) for s in cases], threshold=0.3)
+
+    for symptoms, matches in zip(cases, batch):
+        expected = _linear_scan(checker, symptoms)
+        assert [disease for disease, _ in matches] == [disease for disease, _ in expected]
+        assert [score for _, score in matches] == pytest.approx([score for _, score in expected])
+
+
+def test_batch_results_match_single_analysis(checker, patient):
+    cases = [{'symptoms': symptoms, 'patient_data': patient} for symptoms in _random_cases(checker, 20)]
+    cases.append({'symptoms': []})
+
+    for case, result in zip(cases, checker.analyze_symptoms_batch(cases)):
+        single = checker.analyze_symptoms(case['symptoms'], case.get('patient_data') or {})
+        result.pop('timestamp', None)
+        single.pop('timestamp', None)
+        assert result == single
+
+
+def test_batch_endpoint_scores_valid_cases(client, patient):
+    response = client.post('/api/diagnosis/batch', json={'cases': [
+        {'symptoms': ['fever', 'cough'], 'patient_data': patient},
+        {'symptoms': []}
+    ]})
+
+    assert response.status_code == 200
+    results = response.get_json()['results']
+    assert len(results) == 2
+    assert results[1]['error'] == 'No symptoms provided'
+
+
+@pytest.mark.parametrize('body', [
+    None,
+    [],
+    {},
+    {'cases': []},
+    {'cases': {'symptoms': ['fever']}},
+    {'cases': ['fever']},
+    {'cases': [{'symptoms': 'fever'}]},
+    {'cases': [{'symptoms': ['fever', 3]}]},
+    {'cases': [{'symptoms': ['fever'], 'patient_data': 'Ann'}]},
+])
+def test_batch_endpoint_rejects_invalid_bodies(client, body):
+    response = client.post('/api/diagnosis/batch', json=body)
+
+    assert response.status_code == 400
+    assert 'error' in response.get_json()
+
+
+def test_batch_endpoint_rejects_a_missing_body(client):
+    assert client.post('/api/diagnosis/batch').status_code == 400
+
+
+def test_batch_endpoint_caps_the_batch_size(client, monkeypatch):
+    monkeypatch.setattr(Config, 'MAX_DIAGNOSIS_BATCH', 3)
+
+    response = client.post('/api/diagnosis/batch', json={'cases': [{'symptoms': ['fever']}] * 4})
+
+    assert response.status_code == 400
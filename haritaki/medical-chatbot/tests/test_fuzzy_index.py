@@ -0,0 +1,66 @@
+# test_fuzzy_index.py
+import pytest
+
+from fuzzy_index import TrigramIndex, trigrams
+
+
+@pytest.fixture
+def index():
+    return TrigramIndex({
+        'back pain': 'back pain',
+        'backache': 'back pain',
+        'chest pain': 'chest pain',
+        'headache': 'headache',
+    })
+
+
+def test_trigrams_are_padded_per_word_and_distinct():
+    assert trigrams('Aaa') == ['  a', ' aa', 'aaa', 'aa ']
+    assert trigrams('') == []
+
+
+def test_typos_find_the_intended_term(index):
+    assert index.search('headake')[0][0] == 'headache'
+    assert index.search('bakache')[0][0] == 'back pain'
+
+
+def test_a_word_suggests_the_phrases_containing_it(index):
+    assert [value for value, _ in index.search('pain')] == ['back pain', 'chest pain']
+
+
+def test_synonyms_collapse_into_one_suggestion(index):
+    values = [value for value, _ in index.search('back pain backache', limit=5)]
+
+    assert values.count('back pain') == 1
+
+
+def test_limit_and_min_similarity(index):
+    assert len(index.search('pain', limit=1)) == 1
+    assert index.search('xyz') == []
+    assert index.search('pain', min_similarity=0.99) == []
+    assert index.search('') == []
+
+
+def test_terms_are_case_and_space_insensitive(index):
+    assert 'Back   PAIN' in index
+    index.add('BACKACHE', 'lumbago')
+
+    assert len(index) == 4
+    assert index.search('backache')[0][0] == 'lumbago'
+
+
+def test_new_terms_are_searchable_after_a_search(index):
+    index.search('pain')
+    index.add('knee pain')
+
+    assert 'knee pain' in [value for value, _ in index.search('knee pian')]
+
+
+def test_validate_symptoms_suggests_spellings():
+    from symptom_checker import SymptomChecker
+
+    result = SymptomChecker().validate_symptoms(['fever', 'diarhea', 'zzzz'])
+
+    assert result['valid_symptoms'] == ['fever']
+    assert result['unrecognized_symptoms'] == ['diarhea', 'zzzz']
+    assert result['suggestions'] == {'diarhea': ['diarrhea']}
@@ -0,0 +1,71 @@
+# test_intent_routing.py
+import pytest
+
+from intent_router import IntentRouter
+
+
+@pytest.mark.parametrize('message', [
+    'I think my father is having a heart attack',
+    'He has had two heart attacks before and now his chest hurts',
+    'my mum had strokes in the past and her face is drooping',
+    'I think she is having a stroke',
+    'the cut bleeds and will not stop',
+    'I cant breathe',
+    'I can’t breathe properly',
+    'he is unresponsive',
+    'This is an EMERGENCY',
+])
+def test_emergency_phrases_reach_the_emergency_handler(chatbot, patient, message):
+    response = chatbot.process_message(message, patient, [])
+
+    assert response['type'] == 'emergency'
+
+
+@pytest.mark.parametrize('message', [
+    'I have a bad headache',
+    'headaches every morning',
+    'terrible stomachache since lunch',
+    'my backache is getting worse',
+    'a throbbing toothache',
+])
+def test_pain_compounds_classify_as_pain(chatbot, message):
+    assert 'pain' in chatbot.intent_router.classify(message)
+
+
+def test_keywords_match_whole_words_only(chatbot):
+    # "hi" inside "this" and "ache" inside "cachet" used to trigger intents
+    assert chatbot.intent_router.classify('this cachet') == []
+
+
+def test_intents_come_back_in_priority_order():
+    router = IntentRouter({'emergency': ['stroke'], 'pain': ['pain'], 'greeting': ['hello']})
+
+    assert router.classify('hello, stroke pain') == ['emergency', 'pain', 'greeting']
+
+
+def test_longest_keyword_wins():
+    router = IntentRouter({'short': ['heart'], 'long': ['heart attack']})
+
+    assert router.match('a heart attack') == {'long'}
+    assert router.match('my heart') == {'short'}
+
+
+@pytest.mark.parametrize('message, intent', [
+    ('She really appreciates your help', 'thanks'),
+    ('Is downloading it possible?', 'report'),
+    ('THANKS!!', 'thanks'),
+    ('my knees are hurting', 'pain'),
+    ('the toothaches keep coming back', 'pain'),
+])
+def test_keywords_and_messages_are_lemmatized_alike(chatbot, message, intent):
+    assert chatbot.intent_router.classify(message)[0] == intent
+
+
+def test_router_normalizes_keywords_and_text_with_the_same_function():
+    from symptom_normalizer import phrase_key
+
+    router = IntentRouter({'report': ['download']}, normalize=phrase_key)
+
+    assert router.classify('downloads') == ['report']
+    assert router.classify('downloaded') == ['report']
+    assert IntentRouter({'report': ['download']}).classify('downloaded') == []
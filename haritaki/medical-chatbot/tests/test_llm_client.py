@@ -0,0 +1,72 @@
+# test_llm_client.py
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from llm_client import LLMClient, LLMUnavailable
+
+
+def _client(create, **kwargs):
+    client = LLMClient(api_key='test', model='mock', **kwargs)
+    # Stands in for the openai module, so no upstream is needed
+    client._openai = SimpleNamespace(ChatCompletion=SimpleNamespace(create=create))
+    return client
+
+
+def _chunks(words, delay=0.0):
+    for word in words:
+        time.sleep(delay)
+        yield {'choices': [{'delta': {'content': word}}]}
+
+
+def test_reply_is_assembled_from_the_stream():
+    requests = []
+
+    def create(**kwargs):
+        requests.append(kwargs)
+        return _chunks(['Rest ', 'and ', 'fluids.'])
+
+    client = _client(create)
+    deltas = []
+
+    assert client.chat([{'role': 'user', 'content': 'hi'}]) == 'Rest and fluids.'
+    assert client.chat([{'role': 'user', 'content': 'hi'}], on_delta=deltas.append) == 'Rest and fluids.'
+    assert deltas == ['Rest ', 'and ', 'fluids.']
+    assert all(request['stream'] for request in requests)
+
+
+def test_trickling_reply_is_cut_off_at_the_deadline():
+    client = _client(lambda **kwargs: _chunks(['word '] * 100, delay=0.05), timeout=0.3, max_concurrency=1,
+                     queue_timeout=0, failure_threshold=1)
+    deltas = []
+
+    start = time.monotonic()
+    with pytest.raises(LLMUnavailable):
+        client.chat([{'role': 'user', 'content': 'hi'}], on_delta=deltas.append)
+
+    assert time.monotonic() - start < 1
+    assert 0 < len(deltas) < 100
+    assert client.breaker.state == 'open'
+    assert client.stats()['failures'] == 1
+    # The slot was handed back
+    assert client._slots.acquire(timeout=0)
+
+
+def test_counters_are_exact_under_concurrency():
+    client = _client(lambda **kwargs: _chunks(['ok']), max_concurrency=64)
+    start = threading.Barrier(8)
+
+    def call():
+        start.wait()
+        for _ in range(200):
+            client.chat([{'role': 'user', 'content': 'hi'}])
+
+    threads = [threading.Thread(target=call) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert client.stats()['calls'] == 1600
@@ -0,0 +1,125 @@
+# test_llm_replies.py
+import metrics
+from llm_client import LLMUnavailable
+
+
+def _llm_stage_count(stage):
+    return sum(sum(series[:-1]) for labels, series in metrics.STAGE_SECONDS.snapshot().items() if labels[2] == stage)
+
+
+def test_symptom_reply_comes_from_llm(chatbot, patient, monkeypatch):
+    calls = []
+
+    def chat(messages, **kwargs):
+        calls.append(messages)
+        return 'LLM answer'
+
+    monkeypatch.setattr(chatbot.llm, 'chat', chat)
+    before = _llm_stage_count('llm_call')
+
+    reply = chatbot._get_ai_response_for_symptoms_enhanced('I have a cough', patient, ['cough'], {})
+
+    assert reply == 'LLM answer'
+    assert len(calls) == 1
+    assert calls[0][0]['role'] == 'system'
+    assert _llm_stage_count('llm_call') == before + 1
+
+
+def test_unavailable_llm_falls_back_to_rule_based_text(chatbot, patient, monkeypatch):
+    def chat(messages, **kwargs):
+        raise LLMUnavailable('circuit open')
+
+    monkeypatch.setattr(chatbot.llm, 'chat', chat)
+
+    symptoms_reply = chatbot._get_ai_response_for_symptoms_enhanced(
+        'I have a cough', patient, ['cough'], {'urgency_level': 'low'})
+    general_reply = chatbot._get_ai_response_for_general_message(
+        'what is a virus?', patient, [{'role': 'user', 'message': 'what is a virus?'}])
+
+    assert symptoms_reply == chatbot._symptom_response_text(patient, ['cough'], {'urgency_level': 'low'})
+    assert general_reply == chatbot._general_response_text(patient)
+
+
+def test_fallback_is_only_built_when_needed(chatbot, patient, monkeypatch):
+    monkeypatch.setattr(chatbot.llm, 'chat', lambda messages, **kwargs: 'LLM answer')
+
+    def fallback():
+        raise AssertionError('fallback built although the LLM answered')
+
+    assert chatbot._ask_llm([{'role': 'user', 'content': 'hi'}], fallback) == 'LLM answer'
+
+
+def test_symptom_replies_are_shared_through_the_llm_cache(chatbot, patient, monkeypatch, tmp_path):
+    from llm_cache import LLMAnswerCache
+
+    monkeypatch.setattr(chatbot, 'llm_cache', LLMAnswerCache(str(tmp_path / 'llm_cache.db')))
+    calls = []
+
+    def chat(messages, **kwargs):
+        calls.append(messages)
+        return f"{patient['name']}, rest and drink fluids."
+
+    monkeypatch.setattr(chatbot.llm, 'chat', chat)
+    analysis = {'urgency_level': 'low', 'severity': 'mild'}
+
+    first = chatbot._get_ai_response_for_symptoms_enhanced('I have a cough', patient, ['cough'], analysis)
+    other_patient = dict(patient, name='Bea', age=36)
+    second = chatbot._get_ai_response_for_symptoms_enhanced('coughing a lot', other_patient, ['cough'], analysis)
+
+    assert len(calls) == 1
+    assert first == 'Ann, rest and drink fluids.'
+    assert second == 'Bea, rest and drink fluids.'
+
+    # A different clinical facet is a different answer
+    chatbot._get_ai_response_for_symptoms_enhanced('I have a cough', dict(patient, age=70), ['cough'], analysis)
+    assert len(calls) == 2
+
+
+def test_free_text_replies_are_not_cached(chatbot, patient, monkeypatch, tmp_path):
+    from llm_cache import LLMAnswerCache
+
+    monkeypatch.setattr(chatbot, 'llm_cache', LLMAnswerCache(str(tmp_path / 'llm_cache.db')))
+    calls = []
+    monkeypatch.setattr(chatbot.llm, 'chat', lambda messages, **kwargs: calls.append(messages) or 'answer')
+
+    history = [{'role': 'user', 'message': 'what is a virus?'}]
+    chatbot._get_ai_response_for_general_message('what is a virus?', patient, history)
+    chatbot._get_ai_response_for_general_message('what is a virus?', patient, history)
+
+    assert len(calls) == 2
+
+
+def test_names_that_are_ordinary_words_are_not_refilled(tmp_path):
+    from llm_cache import LLMAnswerCache
+
+    cache = LLMAnswerCache(str(tmp_path / 'llm_cache.db'))
+    will = {'name': 'Will', 'age': 30}
+
+    cache.set('greeting-only', 'Hi Will, you should rest.', will)
+    cache.set('word-in-text', 'Hi Will, this will pass in a few days.', will)
+    cache.set('no-greeting', 'May cause drowsiness.', {'name': 'May'})
+
+    assert cache.get('greeting-only', {'name': 'Hope'}) == 'Hi Hope, you should rest.'
+    assert cache.get('word-in-text', {'name': 'Hope'}) is None
+    assert cache.get('no-greeting', {'name': 'Hope'}) is None
+
+
+def test_hits_refresh_last_used_at_most_once_per_interval(tmp_path, monkeypatch):
+    import llm_cache
+    from llm_cache import LLMAnswerCache
+
+    now = [1000.0]
+    monkeypatch.setattr(llm_cache.time, 'time', lambda: now[0])
+    cache = LLMAnswerCache(str(tmp_path / 'llm_cache.db'))
+    cache.set('key', 'Rest well.', {'name': 'Ann'})
+
+    def last_used():
+        return cache._connection().execute("SELECT last_used FROM answers").fetchone()[0]
+
+    now[0] += llm_cache.TOUCH_INTERVAL / 2
+    assert cache.get('key', {}) == 'Rest well.'
+    assert last_used() == 1000.0
+
+    now[0] += llm_cache.TOUCH_INTERVAL
+    cache.get('key', {})
+    assert last_used() == now[0]
@@ -0,0 +1,97 @@
+# test_medical_api.py
+import pytest
+
+
+def test_symptoms_are_found_through_inflections_but_not_when_negated(chatbot):
+    symptoms = chatbot._extract_symptoms_with_context('I have been coughing and have headaches but no fever', [])
+
+    assert symptoms == ['cough', 'headache']
+
+
+def test_pain_details(chatbot):
+    details = chatbot._extract_pain_details('a sharp, throbbing pain in my knee, about 7/10')
+
+    assert details == {'locations': ['joints'], 'types': ['sharp', 'throbbing'], 'severity': 7}
+
+
+def test_medications_by_generic_or_brand_name(chatbot):
+    medications = chatbot._extract_medication_keywords_enhanced('can I take Advil with tylenol or ibuprofen?')
+
+    assert medications == ['Ibuprofen', 'Acetaminophen']
+
+
+def test_conditions_by_the_names_patients_use(chatbot):
+    assert chatbot._extract_disease_keywords('I think I have the flu or a sinus infection') == ['influenza', 'sinusitis']
+    assert chatbot._extract_disease_keywords('my back is sore') == []
+
+
+def test_diagnosis_accepts_a_comma_separated_string(chatbot, patient):
+    from_string = chatbot.get_diagnosis('fever, cough , zzzz', patient)
+    from_list = chatbot.get_diagnosis(['fever', 'cough', 'zzzz'], patient)
+
+    assert from_string['symptoms'] == from_list['symptoms'] == ['fever', 'cough', 'zzzz']
+    assert from_string['unrecognized_symptoms'] == ['zzzz']
+    for key in ('primary_diagnosis', 'confidence', 'possible_conditions', 'urgency', 'recommended_tests'):
+        assert from_string[key] == from_list[key]
+
+
+def test_diagnosis_ranks_matching_conditions(chatbot, patient):
+    diagnosis = chatbot.get_diagnosis(['headache', 'nausea', 'sensitivity to light'], patient)
+
+    assert diagnosis['primary_diagnosis'] == diagnosis['possible_conditions'][0]['name'] == 'Migraine'
+    scores = [condition['match_score'] for condition in diagnosis['possible_conditions']]
+    assert scores == sorted(scores, reverse=True)
+
+
+def test_treatment_plan_adds_self_care_and_follow_up(chatbot, patient):
+    diagnosis = chatbot.get_diagnosis(['fever', 'cough'], patient)
+
+    plan = chatbot.get_treatment_plan(diagnosis, patient)
+
+    assert plan['self_care_tips']
+    assert plan['when_to_seek_help']
+    assert plan['follow_up_advice']
+
+
+def _diagnosis_turn(chatbot, patient, message):
+    response = chatbot.process_message(message, patient, [])
+    assert response['type'] == 'diagnosis'
+    return {'role': 'assistant', 'message': response['message'], 'type': 'diagnosis', 'data': response['data']}
+
+
+def test_report_data_comes_from_the_last_diagnosis(chatbot, patient, fresh_caches):
+    conversation = [
+        {'role': 'user', 'message': 'hello', 'type': 'text', 'data': {}},
+        _diagnosis_turn(chatbot, patient, 'runny nose, sneezing and a sore throat'),
+    ]
+
+    report = chatbot.prepare_report_data(patient, conversation)
+
+    assert report['patient'] == patient
+    assert report['symptoms'] == ['runny nose', 'sneezing', 'sore throat']
+    assert report['diagnosis'] == [{'name': 'Common Cold', 'confidence': '50%'}]
+    assert 'Common Cold' in report['summary']
+    assert report['treatment_plan']
+    assert report['recommendations']
+
+
+def test_report_data_without_a_diagnosis(chatbot, patient):
+    report = chatbot.prepare_report_data(patient, [{'role': 'user', 'message': 'hello'}])
+
+    assert (report['symptoms'], report['diagnosis'], report['treatment_plan']) == ([], [], [])
+    assert report['summary'].startswith('Ann consulted ')
+
+
+@pytest.mark.parametrize('response, expected', [
+    ({}, {'message': '', 'type': 'general', 'data': {}}),
+    ({'message': None, 'type': 'text', 'data': None}, {'message': '', 'type': 'text', 'data': {}}),
+])
+def test_replies_always_have_the_frontend_shape(chatbot, response, expected):
+    assert chatbot._ensure_response_structure(response) == expected
+
+
+def test_a_changed_diagnosis_is_pointed_out(chatbot):
+    history = [{'role': 'assistant', 'type': 'diagnosis', 'data': {'suggested_diagnosis': 'Common Cold'}}]
+    response = {'message': 'Reply', 'type': 'diagnosis', 'data': {'suggested_diagnosis': 'Influenza'}}
+
+    assert 'Earlier we talked about common cold' in chatbot._add_human_touches(response, history)['message']
@@ -0,0 +1,114 @@
+# test_metrics.py
+import os
+import subprocess
+import sys
+
+import pytest
+
+import metrics
+from config import Config
+from response_cache import ResponseCache
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _dead_pid():
+    process = subprocess.Popen([sys.executable, '-c', 'pass'])
+    process.wait()
+    return process.pid
+
+
+def _cache_events(cache):
+    return {labels[1]: series[0] for labels, series in metrics.CACHE_EVENTS.snapshot().items() if labels[0] == cache}
+
+
+def test_named_cache_exports_its_counters():
+    cache = ResponseCache(max_entries=1, ttl_seconds=60, name='test-cache')
+    cache.get(('a',))
+    cache.set(('a',), {'message': 'hi'})
+    cache.get(('a',))
+    cache.set(('b',), {'message': 'there'})
+
+    assert _cache_events('test-cache') == {'miss': 1, 'hit': 1, 'eviction': 1}
+    stats = cache.stats()
+    assert (stats['hits'], stats['misses'], stats['evictions']) == (1, 1, 1)
+
+
+def test_expired_entries_count_as_expiration_and_miss():
+    cache = ResponseCache(ttl_seconds=-1, name='test-expiring')
+    cache.set(('a',), 1)
+
+    assert cache.get(('a',)) is None
+    assert _cache_events('test-expiring') == {'expiration': 1, 'miss': 1}
+
+
+def test_cache_counters_render_as_prometheus_counters():
+    ResponseCache(name='test-render').get(('missing',))
+
+    text = metrics.render()
+
+    assert '# TYPE chatbot_cache_events_total counter' in text
+    assert 'chatbot_cache_events_total{cache="test-render",event="miss"} 1' in text
+
+
+def _request_count(text, route):
+    prefix = f'chatbot_request_duration_seconds_count{{route="{route}",method="GET",status="200"}} '
+    return sum(int(line[len(prefix):]) for line in text.splitlines() if line.startswith(prefix))
+
+
+def _exited_process_state(route, count):
+    histogram = metrics.Histogram(metrics.REQUEST_SECONDS.name, '', metrics.REQUEST_SECONDS.label_names)
+    for _ in range(count):
+        histogram.observe(0.01, route, 'GET', '200')
+    return {histogram.name: [[list(labels), series] for labels, series in histogram.snapshot().items()]}
+
+
+@pytest.fixture
+def metrics_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(Config, 'METRICS_DIR', str(tmp_path))
+    return tmp_path
+
+
+def test_exited_process_files_fold_into_the_aggregate(metrics_dir):
+    dead_pid = _dead_pid()
+    metrics._write_json(str(metrics_dir / f'metrics-{dead_pid}-aaaa.json'), _exited_process_state('/gone', 3))
+
+    first = metrics.render()
+    second = metrics.render()
+
+    assert _request_count(first, '/gone') == _request_count(second, '/gone') == 3
+    assert sorted(p.name for p in metrics_dir.glob('metrics-*.json')) == [metrics.AGGREGATE_FILE]
+
+
+def test_reused_pid_does_not_overwrite_earlier_counts(metrics_dir):
+    # Two processes that had the same PID, one after the other
+    metrics._write_json(str(metrics_dir / f'metrics-{os.getpid()}-aaaa.json'), _exited_process_state('/reused', 2))
+    metrics._write_json(str(metrics_dir / f'metrics-{os.getpid()}-bbbb.json'), _exited_process_state('/reused', 1))
+
+    assert _request_count(metrics.render(), '/reused') == 3
+
+
+def test_interrupted_fold_is_not_counted_twice(metrics_dir):
+    dead_pid = _dead_pid()
+    name = f'metrics-{dead_pid}-aaaa.json'
+    state = _exited_process_state('/crash', 4)
+    # The aggregate already holds the file, but the fold died before removing it
+    metrics._write_json(str(metrics_dir / name), state)
+    metrics._write_json(str(metrics_dir / metrics.AGGREGATE_FILE), dict(state, folded=[name]))
+
+    assert _request_count(metrics.render(), '/crash') == 4
+    metrics.fold_exited()
+    assert not (metrics_dir / name).exists()
+    assert _request_count(metrics.render(), '/crash') == 4
+
+
+def test_clean_exit_hands_counts_to_the_aggregate(metrics_dir):
+    script = ('import metrics; '
+              'metrics.observe_request("/child", "GET", 200, 0.01); '
+              'metrics.observe_request("/child", "GET", 200, 0.01)')
+    env = dict(os.environ, METRICS_DIR=str(metrics_dir), METRICS_FLUSH_SECONDS='60')
+    result = subprocess.run([sys.executable, '-c', script], cwd=APP_DIR, env=env, capture_output=True, text=True)
+
+    assert result.returncode == 0, result.stderr
+    assert sorted(p.name for p in metrics_dir.glob('metrics-*.json')) == [metrics.AGGREGATE_FILE]
+    assert _request_count(metrics.render(), '/child') == 2
@@ -0,0 +1,140 @@
+# test_profiler.py
+import contextvars
+import os
+import pstats
+import threading
+import time
+
+import pytest
+
+import profiler
+from config import Config
+
+TOKEN = 'test-admin-token'
+
+
+def _busy(seconds):
+    """Burn CPU in a frame the profilers can attribute"""
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        sum(range(100))
+
+
+def _worker_step():
+    _busy(0.01)
+
+
+@pytest.fixture
+def profile_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(Config, 'PROFILE_DIR', str(tmp_path))
+    monkeypatch.setattr(Config, 'PROFILE_ADMIN_TOKEN', TOKEN)
+    monkeypatch.setattr(Config, 'PROFILE_SAMPLE_RATE', 0.0)
+    monkeypatch.setattr(Config, 'PROFILE_SLOW_MS', 0)
+    return tmp_path
+
+
+def test_check_token(monkeypatch):
+    monkeypatch.setattr(Config, 'PROFILE_ADMIN_TOKEN', '')
+    assert not profiler.check_token('')
+    assert not profiler.check_token('anything')
+
+    monkeypatch.setattr(Config, 'PROFILE_ADMIN_TOKEN', TOKEN)
+    assert not profiler.check_token(None)
+    assert not profiler.check_token('wrong')
+    assert profiler.check_token(TOKEN)
+
+
+def test_nothing_is_profiled_when_off(profile_dir, monkeypatch):
+    assert profiler.begin('/chat', 'POST') is None
+
+    monkeypatch.setattr(Config, 'PROFILE_DIR', '')
+    assert profiler.begin('/chat', 'POST', TOKEN) is None
+    assert profiler.end(None) == []
+    assert profiler.list_profiles() == []
+
+
+def test_header_writes_a_cprofile_covering_attached_threads(profile_dir):
+    token = profiler.begin('/chat/<session_id>', 'POST', TOKEN)
+    assert profiler.profiling_requested()
+    _busy(0.01)
+    context = contextvars.copy_context()
+    worker = threading.Thread(target=context.run, args=(profiler.run_attached, _worker_step))
+    worker.start()
+    worker.join()
+
+    written = profiler.end(token, 200)
+
+    assert not profiler.profiling_requested()
+    assert len(written) == 1 and written[0].endswith('.prof')
+    assert '-POST-chat_session_id-200-' in os.path.basename(written[0])
+    functions = {function for _, _, function in pstats.Stats(written[0]).stats}
+    assert {'_busy', '_worker_step'} <= functions
+
+
+def test_slow_request_writes_sampled_stacks(profile_dir, monkeypatch):
+    monkeypatch.setattr(Config, 'PROFILE_SLOW_MS', 50)
+    monkeypatch.setattr(Config, 'PROFILE_SAMPLE_AFTER_MS', 0)
+    monkeypatch.setattr(Config, 'PROFILE_SAMPLE_INTERVAL_MS', 5)
+    # The sampler reads its settings once, so start a fresh one
+    monkeypatch.setattr(profiler, '_sampler_pid', None)
+
+    token = profiler.begin('/slow', 'GET')
+    _busy(0.2)
+    written = profiler.end(token, 200)
+
+    assert len(written) == 1 and written[0].endswith('.folded')
+    with open(written[0]) as f:
+        lines = f.read().splitlines()
+    assert lines and all(line.rsplit(' ', 1)[1].isdigit() for line in lines)
+    assert any('_busy (test_profiler.py' in line for line in lines)
+
+
+def test_fast_request_writes_nothing(profile_dir, monkeypatch):
+    monkeypatch.setattr(Config, 'PROFILE_SLOW_MS', 60000)
+
+    token = profiler.begin('/fast', 'GET')
+    assert token is not None
+    assert profiler.end(token, 200) == []
+    assert profiler.list_profiles() == []
+
+
+def test_profile_call_saves_and_rotates(profile_dir, monkeypatch):
+    monkeypatch.setattr(Config, 'PROFILE_MAX_FILES', 2)
+
+    results = [profiler.profile_call(f'render_{i}', sum, [i, 1]) for i in range(3)]
+
+    assert results == [1, 2, 3]
+    profiles = profiler.list_profiles()
+    assert len(profiles) == 2 == len(list(profile_dir.iterdir()))
+    assert [p['format'] for p in profiles] == ['pstats', 'pstats']
+    assert profiles[0]['name'] > profiles[1]['name']
+    assert '-JOB-render_2-' in profiles[0]['name']
+
+
+def test_profile_path_rejects_unsafe_names(profile_dir):
+    profiler.profile_call('render', sum, [1])
+    name = profiler.list_profiles()[0]['name']
+    (profile_dir / 'notes.txt').write_text('x')
+
+    assert profiler.profile_path(name) == str(profile_dir / name)
+    assert profiler.profile_path('../x.prof') is None
+    assert profiler.profile_path(f'sub/{name}') is None
+    assert profiler.profile_path('notes.txt') is None
+    assert profiler.profile_path('missing.prof') is None
+
+
+def test_admin_endpoints_need_the_token(profile_dir, client):
+    response = client.get('/health', headers={profiler.PROFILE_HEADER: TOKEN})
+    assert response.status_code == 200
+
+    assert client.get('/admin/profiles').status_code == 404
+    assert client.get('/admin/profiles', headers={profiler.ADMIN_HEADER: 'wrong'}).status_code == 404
+
+    headers = {profiler.ADMIN_HEADER: TOKEN}
+    profiles = client.get('/admin/profiles', headers=headers).get_json()['profiles']
+    assert len(profiles) == 1 and '-GET-health-200-' in profiles[0]['name']
+
+    download = client.get(f"/admin/profiles/{profiles[0]['name']}", headers=headers)
+    assert download.status_code == 200
+    assert download.data == (profile_dir / profiles[0]['name']).read_bytes()
+    assert client.get('/admin/profiles/..%2Fconfig.py', headers=headers).status_code == 404
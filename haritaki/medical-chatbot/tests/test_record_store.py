@@ -0,0 +1,92 @@
+# test_record_store.py
+import os
+import threading
+import time
+
+import pytest
+
+import record_store
+from record_store import RecordStore
+
+
+def _fill(store, count):
+    """Save records with padding so they spread over several small segments"""
+    return [store.save({'name': f"Patient {i}", 'notes': 'x' * 100}, f"r{i:03d}") for i in range(count)]
+
+
+@pytest.fixture
+def store(tmp_path):
+    return RecordStore(str(tmp_path / 'records'), segment_bytes=1024, fsync_policy='none', compact_ratio=0.5)
+
+
+def test_save_get_replace_and_delete(store):
+    store.save({'name': 'Ann'}, 'a')
+    store.save({'name': 'Ann Smith'}, 'a')
+    store.save({'name': 'Bob'}, 'b')
+    store.delete('b')
+
+    assert store.get('a') == {'name': 'Ann Smith'}
+    assert store.get('b') is None
+    assert store.record_ids() == ['a']
+
+
+def test_compaction_keeps_live_records_and_drops_dead_segments(store, tmp_path):
+    ids = _fill(store, 40)
+    for record_id in ids[:30]:
+        store.delete(record_id)
+    segments_before = store._segment_numbers()
+
+    result = store.compact()
+
+    assert result['segments'] > 0
+    assert len(store._segment_numbers()) < len(segments_before)
+    assert sorted(store.record_ids()) == ids[30:]
+    for record_id in ids[30:]:
+        assert store.get(record_id)['name'] == f"Patient {int(record_id[1:])}"
+
+    # Another process opening the log sees the compacted state
+    other = RecordStore(str(tmp_path / 'records'), segment_bytes=1024, fsync_policy='none')
+    assert sorted(other.record_ids()) == ids[30:]
+    assert other.get(ids[-1])['name'] == 'Patient 39'
+
+
+def test_compaction_in_another_instance_is_picked_up(store, tmp_path):
+    ids = _fill(store, 40)
+    other = RecordStore(str(tmp_path / 'records'), segment_bytes=1024, fsync_policy='none')
+    for record_id in ids[:30]:
+        other.delete(record_id)
+    other.compact()
+
+    # store still holds fds to segments the other instance removed
+    assert store.get(ids[0]) is None
+    assert store.get(ids[35])['name'] == 'Patient 35'
+    store.save({'name': 'After'}, 'after')
+    assert other.get('after') == {'name': 'After'}
+
+
+def test_group_commit_survives_compaction_during_the_sync(tmp_path, monkeypatch, capsys):
+    store = RecordStore(str(tmp_path / 'records'), segment_bytes=1024, fsync_policy='group', compact_ratio=0.5)
+    ids = _fill(store, 40)
+    for record_id in ids[:30]:
+        store.delete(record_id)
+
+    # Hold the flusher between taking its fds and syncing them, and compact meanwhile
+    real_fsync = os.fsync
+    flusher_syncing = threading.Event()
+
+    def slow_fsync(fd):
+        if threading.current_thread().name == 'record-fsync' and not flusher_syncing.is_set():
+            flusher_syncing.set()
+            time.sleep(0.3)
+        return real_fsync(fd)
+
+    monkeypatch.setattr(record_store.os, 'fsync', slow_fsync)
+    writer = threading.Thread(target=store.save, args=({'name': 'During'}, 'during'))
+    writer.start()
+    assert flusher_syncing.wait(5)
+    assert store.compact()['segments'] > 0
+    writer.join(5)
+
+    assert not writer.is_alive()
+    assert 'Error in record fsync' not in capsys.readouterr().out
+    assert store.get('during') == {'name': 'During'}
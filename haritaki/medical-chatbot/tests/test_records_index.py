@@ -0,0 +1,91 @@
+# test_records_index.py
+import pytest
+
+from record_store import RecordStore
+from records_index import RecordsIndex, decode_cursor, encode_cursor, parse_date
+
+
+def _record(name, diagnosis='Influenza', urgency='medium', saved_at='2024-03-01T10:00:00'):
+    return {
+        'patient_data': {'name': name},
+        'diagnosis': {'primary_diagnosis': diagnosis, 'urgency': urgency},
+        'saved_at': saved_at
+    }
+
+
+@pytest.fixture
+def index(tmp_path):
+    return RecordsIndex(str(tmp_path / 'records_index.db'))
+
+
+def test_cursor_pages_cover_every_match_once(index):
+    # Many records share a timestamp, so the record ID has to break ties
+    index.add_many([(f"r{i:03d}", _record(f"Patient {i}"), 1000.0 + i // 4) for i in range(50)])
+
+    seen = []
+    cursor = None
+    while True:
+        page = index.search(limit=7, cursor=cursor)
+        seen.extend(row['record_id'] for row in page['results'])
+        cursor = page['next_cursor']
+        if cursor is None:
+            break
+
+    assert len(seen) == len(set(seen)) == 50
+    assert seen == [f"r{i:03d}" for i in sorted(range(50), key=lambda i: (1000.0 + i // 4, f"r{i:03d}"), reverse=True)]
+
+
+def test_last_page_has_no_cursor(index):
+    index.add_many([(f"r{i}", _record('Ann'), float(i)) for i in range(3)])
+
+    assert index.search(limit=3)['next_cursor'] is None
+    assert index.search(limit=2)['next_cursor'] is not None
+
+
+def test_filters(index):
+    index.add('a', _record('Ann Smith', 'Influenza', 'medium', '2024-03-01T10:00:00'))
+    index.add('b', _record('Annabel Jones', 'Migraine', 'low', '2024-03-02T10:00:00'))
+    index.add('c', _record('Bob', 'influenza', 'HIGH', '2024-03-03T10:00:00'))
+
+    def ids(**filters):
+        return [row['record_id'] for row in index.search(**filters)['results']]
+
+    assert ids(name='ann') == ['b', 'a']
+    assert ids(diagnosis='Influenza') == ['c', 'a']
+    assert ids(urgency='high') == ['c']
+    assert ids(date_from=parse_date('2024-03-02'), date_to=parse_date('2024-03-02', end=True)) == ['b']
+
+
+def test_cursor_round_trip_and_malformed_cursor():
+    assert decode_cursor(encode_cursor(1234.5, 'record|with|bars')) == (1234.5, 'record|with|bars')
+    with pytest.raises(ValueError):
+        decode_cursor('not a cursor')
+
+
+def test_rebuild_adds_missing_and_drops_deleted_records(index, tmp_path):
+    store = RecordStore(str(tmp_path / 'records'), fsync_policy='none')
+    kept = store.save(_record('Ann'))
+    deleted = store.save(_record('Bob'))
+    assert index.rebuild(store) == {'added': 2, 'removed': 0}
+
+    store.delete(deleted)
+
+    assert index.rebuild(store) == {'added': 0, 'removed': 1}
+    assert [row['record_id'] for row in index.search()['results']] == [kept]
+
+
+def test_deleting_a_record_removes_it_from_search():
+    main = pytest.importorskip('main')
+    client = main.app.test_client()
+
+    record_id = client.post('/api/save_patient_record', json={
+        'patient_data': {'name': 'Zed Deletable'},
+        'diagnosis': {'primary_diagnosis': 'Migraine'}
+    }).get_json()['record_id']
+    assert [row['record_id'] for row in client.get('/api/records/search?name=zed').get_json()['results']] == [record_id]
+
+    assert client.delete(f'/api/patient_record/{record_id}').status_code == 200
+
+    assert client.get('/api/records/search?name=zed').get_json()['results'] == []
+    assert client.get(f'/api/patient_record/{record_id}').status_code == 404
+    assert client.delete(f'/api/patient_record/{record_id}').status_code == 404
@@ -0,0 +1,33 @@
+# test_report_download.py
+import os
+
+import pytest
+
+from config import Config
+from report_index import report_file_path
+
+
+@pytest.fixture
+def report(client):
+    import main
+
+    def write(filename):
+        filepath = report_file_path(main.REPORTS_DIR, filename)
+        os.makedirs(os.path.dirname(filepath), exist_ok=True)
+        with open(filepath, 'wb') as f:
+            f.write(b'%PDF-1.4 test')
+        return filename
+    return write
+
+
+@pytest.mark.parametrize('filename', ['report_1.pdf', 'report "quoted".pdf', 'rapport_é.pdf'])
+def test_x_accel_disposition_matches_send_file(client, report, monkeypatch, filename):
+    report(filename)
+    monkeypatch.setattr(Config, 'REPORT_SENDFILE_MODE', '')
+    direct = client.get(f'/reports/{filename}')
+    monkeypatch.setattr(Config, 'REPORT_SENDFILE_MODE', 'x-accel-redirect')
+    accel = client.get(f'/reports/{filename}')
+
+    assert direct.status_code == accel.status_code == 200
+    assert accel.headers['X-Accel-Redirect'].endswith(filename)
+    assert accel.headers['Content-Disposition'] == direct.headers['Content-Disposition']
@@ -0,0 +1,54 @@
+# test_report_index.py
+import glob
+import os
+
+import pytest
+
+from benchmarks.bench_report_render import SAMPLE_REPORT
+from report_generator import ReportGenerator
+from report_index import ReportIndex, report_content_key
+
+
+@pytest.fixture
+def generator(tmp_path):
+    return ReportGenerator(report_path=str(tmp_path / 'reports'))
+
+
+def _pdfs(generator):
+    return glob.glob(os.path.join(generator.report_path, '*', '*.pdf'))
+
+
+def test_consultation_date_is_not_part_of_the_key():
+    later = dict(SAMPLE_REPORT, consultation_date='2024-06-30 17:45:00')
+
+    assert report_content_key(later) == report_content_key(SAMPLE_REPORT)
+
+
+def test_other_fields_change_the_key():
+    assert report_content_key(dict(SAMPLE_REPORT, summary='Follow-up visit')) != report_content_key(SAMPLE_REPORT)
+    assert report_content_key(dict(SAMPLE_REPORT, symptoms=['fever'])) != report_content_key(SAMPLE_REPORT)
+
+
+def test_identical_report_is_served_from_the_index(generator):
+    first = generator.generate_pdf_report(SAMPLE_REPORT, 's1')
+    again = generator.generate_pdf_report(dict(SAMPLE_REPORT, consultation_date='2024-06-30 17:45:00'), 's2')
+
+    assert again == first
+    assert _pdfs(generator) == [first]
+
+
+def test_changed_report_is_rendered_again(generator):
+    first = generator.generate_pdf_report(SAMPLE_REPORT, 's1')
+    changed = generator.generate_pdf_report(dict(SAMPLE_REPORT, summary='Follow-up visit'), 's2')
+
+    assert changed != first
+    assert sorted(_pdfs(generator)) == sorted([first, changed])
+
+
+def test_deleted_report_is_a_miss(generator):
+    first = generator.generate_pdf_report(SAMPLE_REPORT, 's1')
+    os.remove(first)
+
+    assert ReportIndex(generator.report_path).lookup(report_content_key(SAMPLE_REPORT)) is None
+    again = generator.generate_pdf_report(SAMPLE_REPORT, 's2')
+    assert os.path.exists(again)
@@ -0,0 +1,114 @@
+# test_report_jobs.py
+import os
+import subprocess
+import sys
+import time
+import uuid
+from concurrent.futures import Future
+
+import pytest
+
+from report_jobs import ReportJobQueue, _write_status
+
+
+@pytest.fixture
+def jobs(tmp_path):
+    queue = ReportJobQueue(str(tmp_path / 'jobs'), str(tmp_path / 'reports'), max_workers=1, job_timeout=60)
+    yield queue
+    if queue.executor is not None:
+        queue.executor.shutdown(wait=True, cancel_futures=True)
+
+
+def _pending(jobs, **fields):
+    job_id = str(uuid.uuid4())
+    _write_status(jobs.jobs_dir, job_id, dict({'job_id': job_id, 'status': 'rendering', 'progress': 0.5,
+                                               'started_at': time.time(), 'updated_at': time.time()}, **fields))
+    return job_id
+
+
+def _dead_pid():
+    process = subprocess.Popen([sys.executable, '-c', 'pass'])
+    process.wait()
+    return process.pid
+
+
+def test_job_owned_by_a_dead_process_is_failed(jobs):
+    job_id = _pending(jobs, pid=_dead_pid())
+
+    status = jobs.status(job_id)
+
+    assert status['status'] == 'failed'
+    assert 'exited' in status['error']
+    # Written back, so every worker polling the job sees the same answer
+    assert jobs.status(job_id)['status'] == 'failed'
+
+
+def test_job_rendering_past_the_timeout_is_failed(jobs):
+    job_id = _pending(jobs, pid=os.getpid(), started_at=time.time() - 120)
+
+    assert jobs.status(job_id)['status'] == 'failed'
+
+
+def test_job_queued_behind_a_busy_pool_does_not_time_out(jobs):
+    job_id = str(uuid.uuid4())
+    queued = {'job_id': job_id, 'status': 'queued', 'progress': 0.0, 'pid': os.getpid(),
+              'queued_at': time.time() - 120, 'updated_at': time.time() - 120}
+    _write_status(jobs.jobs_dir, job_id, queued)
+
+    assert jobs.status(job_id)['status'] == 'queued'
+
+    # Once it starts rendering, the timeout runs from then
+    _write_status(jobs.jobs_dir, job_id, dict(queued, status='rendering', started_at=time.time()))
+    assert jobs.status(job_id)['status'] == 'rendering'
+
+
+def test_late_render_does_not_undo_a_timeout(jobs, tmp_path):
+    job_id = _pending(jobs, pid=os.getpid(), started_at=time.time() - 120)
+    assert jobs.status(job_id)['status'] == 'failed'
+
+    # The render process finishes after the poll gave up on it
+    finished = Future()
+    finished.set_result((str(tmp_path / 'reports' / 'late.pdf'), 0.1))
+    jobs._finish(job_id, finished)
+
+    assert jobs.status(job_id)['status'] == 'failed'
+
+
+def test_timeout_does_not_undo_a_finished_render(jobs, tmp_path):
+    job_id = _pending(jobs, pid=os.getpid(), started_at=time.time() - 120)
+    stale = jobs._read_status(job_id)
+
+    finished = Future()
+    finished.set_result((str(tmp_path / 'reports' / 'done.pdf'), 0.1))
+    jobs._finish(job_id, finished)
+    # A poll that read the old status before the render finished
+    status = jobs._check_stale(stale)
+
+    assert status['status'] == 'done'
+    assert jobs.status(job_id)['status'] == 'done'
+
+
+def test_running_job_is_left_alone(jobs):
+    job_id = _pending(jobs, pid=os.getpid())
+
+    assert jobs.status(job_id)['status'] == 'rendering'
+
+
+def test_killed_render_process_fails_the_job_and_replaces_the_pool(jobs):
+    from benchmarks.bench_report_render import sample_report
+
+    job_id = jobs.submit(sample_report(1), 'killed')
+    for process in list(jobs.executor._processes.values()):
+        process.kill()
+
+    deadline = time.time() + 30
+    while jobs.status(job_id)['status'] not in ('done', 'failed') and time.time() < deadline:
+        time.sleep(0.05)
+    assert jobs.status(job_id)['status'] == 'failed'
+
+    # The broken pool is dropped; the next report renders on a fresh one
+    job_id = jobs.submit(sample_report(2), 'after')
+    deadline = time.time() + 60
+    while jobs.status(job_id)['status'] not in ('done', 'failed') and time.time() < deadline:
+        time.sleep(0.05)
+    assert jobs.status(job_id)['status'] == 'done'
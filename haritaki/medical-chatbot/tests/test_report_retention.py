@@ -0,0 +1,93 @@
+# test_report_retention.py
+import os
+import subprocess
+import sys
+import time
+
+import pytest
+
+from report_index import report_file_path
+from report_retention import RetentionManager, RetentionSweeper, mark_downloaded
+
+HOLD_LOCK = """
+import fcntl, sys
+with open(sys.argv[1], 'a+b') as lock_file:
+    fcntl.flock(lock_file, fcntl.LOCK_EX)
+    print('locked', flush=True)
+    sys.stdin.read()
+"""
+
+
+@pytest.fixture
+def report_path(tmp_path):
+    path = tmp_path / 'reports'
+    path.mkdir()
+    return str(path)
+
+
+def _report(report_path, name, created, last_access=None):
+    filepath = report_file_path(report_path, name)
+    os.makedirs(os.path.dirname(filepath), exist_ok=True)
+    with open(filepath, 'wb') as f:
+        f.write(b'x' * 100)
+    os.utime(filepath, (last_access or created, created))
+    return filepath
+
+
+def test_least_recently_downloaded_reports_are_evicted_first(report_path):
+    now = time.time()
+    oldest = _report(report_path, 'a.pdf', created=now - 300)
+    middle = _report(report_path, 'b.pdf', created=now - 200)
+    newest = _report(report_path, 'c.pdf', created=now - 100)
+    # Downloading the oldest report makes it the most recently used
+    mark_downloaded(oldest)
+
+    result = RetentionManager(report_path, max_age_seconds=3600, max_bytes=200).sweep()
+
+    assert result == {'expired': 0, 'evicted': 1, 'remaining_bytes': 200}
+    assert os.path.exists(oldest)
+    assert not os.path.exists(middle)
+    assert os.path.exists(newest)
+
+
+def test_eviction_follows_access_time_not_creation(report_path):
+    now = time.time()
+    first = _report(report_path, 'a.pdf', created=now - 300, last_access=now - 10)
+    second = _report(report_path, 'b.pdf', created=now - 200, last_access=now - 20)
+    third = _report(report_path, 'c.pdf', created=now - 100, last_access=now - 30)
+
+    RetentionManager(report_path, max_age_seconds=3600, max_bytes=100).sweep()
+
+    assert [os.path.exists(path) for path in (first, second, third)] == [True, False, False]
+
+
+def test_expired_reports_are_removed_regardless_of_access(report_path):
+    now = time.time()
+    expired = _report(report_path, 'a.pdf', created=now - 7200, last_access=now)
+    fresh = _report(report_path, 'b.pdf', created=now - 60)
+
+    result = RetentionManager(report_path, max_age_seconds=3600, max_bytes=10 ** 6).sweep()
+
+    assert result['expired'] == 1
+    assert not os.path.exists(expired)
+    assert os.path.exists(fresh)
+
+
+def test_sweeper_skips_while_another_process_holds_the_lock(report_path):
+    now = time.time()
+    stale = _report(report_path, 'a.pdf', created=now - 7200)
+    sweeper = RetentionSweeper(RetentionManager(report_path, max_age_seconds=3600, max_bytes=10 ** 6),
+                               interval_seconds=3600)
+
+    holder = subprocess.Popen([sys.executable, '-c', HOLD_LOCK, sweeper.lock_path],
+                              stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True)
+    try:
+        assert holder.stdout.readline().strip() == 'locked'
+        assert sweeper.sweep_once() is None
+        assert os.path.exists(stale)
+    finally:
+        holder.communicate('')
+
+    # Once the other process lets go, the next sweep runs
+    assert sweeper.sweep_once()['expired'] == 1
+    assert not os.path.exists(stale)
@@ -0,0 +1,119 @@
+# test_session_store.py
+import json
+import threading
+import time
+
+import pytest
+
+from config import Config
+from session_store import SQLiteSessionStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    return SQLiteSessionStore(str(tmp_path / 'sessions.db'))
+
+
+def test_round_trip_keeps_the_conversation(store, patient):
+    conversation = [
+        {'role': 'user', 'message': 'I have a fever'},
+        {'role': 'assistant', 'message': 'How long have you had it?', 'type': 'diagnosis',
+         'data': {'symptoms': ['fever']}}
+    ]
+    store.save('s1', {'patient_data': patient, 'conversation': conversation})
+
+    session = store.get('s1')
+
+    assert session['patient_data'] == patient
+    assert [m['message'] for m in session['conversation']] == ['I have a fever', 'How long have you had it?']
+    assert session['conversation'][-1]['data'] == {'symptoms': ['fever']}
+
+
+def test_sessions_saved_as_compact_rows_still_load(store, patient):
+    conn = store._connection()
+    conn.execute(
+        "INSERT INTO sessions (session_id, data, updated_at) VALUES (?, ?, ?)",
+        ('s1', json.dumps({'patient_data': patient, 'conversation': [['user', 'I have a fever', 'text', 1.0, None]]}),
+         time.time())
+    )
+    conn.commit()
+
+    session = store.get('s1')
+
+    assert session['conversation'] == [{'role': 'user', 'message': 'I have a fever', 'type': 'text', 'timestamp': 1.0}]
+
+
+def test_oversized_sessions_are_trimmed_to_the_budget(store, patient, monkeypatch):
+    monkeypatch.setattr(Config, 'SESSION_MAX_BYTES', 4096)
+    conversation = [{'role': 'user', 'message': f"turn {i} " + 'x' * 500} for i in range(20)]
+
+    store.save('s1', {'patient_data': patient, 'conversation': conversation})
+    session = store.get('s1')
+
+    assert 0 < len(session['conversation']) < 20
+    # The newest turns are the ones kept
+    assert session['conversation'][-1]['message'].startswith('turn 19 ')
+
+
+def test_session_that_cannot_fit_is_rejected(store, patient, monkeypatch):
+    monkeypatch.setattr(Config, 'SESSION_MAX_BYTES', 1024)
+
+    with pytest.raises(ValueError):
+        store.save('s1', {'patient_data': dict(patient, medical_history='x' * 2048), 'conversation': []})
+    assert store.get('s1') is None
+
+
+def test_lock_file_is_opened_once_under_concurrent_first_use(store, monkeypatch):
+    opened = []
+    real_open = open
+
+    def counting_open(path, *args, **kwargs):
+        if path == store.lock_path:
+            opened.append(path)
+            # Widen the window in which a second thread could also open it
+            time.sleep(0.05)
+        return real_open(path, *args, **kwargs)
+
+    monkeypatch.setattr('builtins.open', counting_open)
+    start = threading.Barrier(8)
+
+    def take(i):
+        start.wait()
+        with store.lock(f"session-{i}"):
+            pass
+
+    threads = [threading.Thread(target=take, args=(i,)) for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(opened) == 1
+
+
+@pytest.mark.parametrize('backend', ['memory', 'sqlite'])
+def test_idle_sessions_expire_and_are_swept(backend, tmp_path, patient, monkeypatch):
+    import session_store
+
+    store = session_store.create_session_store(backend, str(tmp_path / 'sessions.db'))
+    now = [1000.0]
+    monkeypatch.setattr(session_store.time, 'time', lambda: now[0])
+    monkeypatch.setattr(Config, 'SESSION_TTL', 60)
+    monkeypatch.setattr(Config, 'SESSION_SWEEP_INTERVAL', 600)
+    store._last_sweep = now[0]
+
+    store.save('old', {'patient_data': patient, 'conversation': []})
+    now[0] += 30
+    store.save('new', {'patient_data': patient, 'conversation': []})
+    now[0] += 40
+
+    assert store.get('old') is None
+    assert store.get('new') is not None
+    assert store.sweep() == 1
+    assert store.sweep() == 0
+
+    # Saving sweeps by itself once the interval has passed
+    now[0] += 600
+    store.save('newest', {'patient_data': patient, 'conversation': []})
+    assert store.sweep() == 0
+    assert store.get('newest') is not None
@@ -0,0 +1,19 @@
+# test_startup.py
+import os
+import subprocess
+import sys
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_importing_the_app_starts_no_threads_or_storage():
+    # A fresh interpreter, so nothing earlier in the session has started them
+    result = subprocess.run(
+        [sys.executable, '-c',
+         'import threading, main; '
+         'print(threading.active_count(), main._patient_records is None, main._records_index is None)'],
+        cwd=APP_DIR, capture_output=True, text=True, env=os.environ.copy()
+    )
+
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.split() == ['1', 'True', 'True']
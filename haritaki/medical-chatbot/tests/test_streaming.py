@@ -0,0 +1,115 @@
+# test_streaming.py
+import json
+import threading
+from http.server import ThreadingHTTPServer
+
+import pytest
+
+from benchmarks.mock_llm_server import make_handler
+from llm_client import LLMClient
+
+
+@pytest.fixture
+def mock_llm():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), make_handler(0.0, 0.0, 0.0, token_delay=0.0))
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}/v1"
+    server.shutdown()
+    server.server_close()
+
+
+def _slow_llm(first_delta_seen):
+    """An LLM that streams its first words, then waits until the client has relayed them"""
+    def chat(messages, on_delta=None, **kwargs):
+        assert on_delta is not None, 'the reply was not requested as a stream'
+        on_delta('Rest ')
+        assert first_delta_seen.wait(5), 'the first delta was not relayed while the LLM was still answering'
+        on_delta('and fluids.')
+        return 'Rest and fluids.'
+    return chat
+
+
+def test_client_streams_the_completion(mock_llm):
+    client = LLMClient(api_key='test', model='mock', api_base=mock_llm, timeout=5)
+    deltas = []
+
+    reply = client.chat([{'role': 'user', 'content': 'hello there'}], on_delta=deltas.append)
+
+    assert len(deltas) > 1
+    assert ''.join(deltas) == reply == 'Mock reply to: hello there'
+
+
+def test_deltas_are_relayed_while_the_llm_answers(chatbot, patient, fresh_caches, monkeypatch):
+    first_delta_seen = threading.Event()
+    monkeypatch.setattr(chatbot.llm, 'chat', _slow_llm(first_delta_seen))
+
+    events = []
+    history = [{'role': 'user', 'message': 'I have a cough'}]
+    for event, payload in chatbot.stream_message('I have a cough', patient, history):
+        events.append((event, payload))
+        if event == 'delta':
+            first_delta_seen.set()
+
+    names = [event for event, _ in events]
+    assert names[0] == 'start' and names[-1] == 'response'
+    texts = ''.join(payload['text'] for event, payload in events if event == 'delta')
+    assert texts == events[-1][1]['message']
+    assert texts.startswith('Rest and fluids.')
+
+
+def test_async_deltas_are_relayed_while_the_llm_answers(chatbot, patient, fresh_caches, monkeypatch):
+    import asyncio
+
+    first_delta_seen = threading.Event()
+    monkeypatch.setattr(chatbot.llm, 'chat', _slow_llm(first_delta_seen))
+
+    async def scenario():
+        events = []
+        history = [{'role': 'user', 'message': 'I have a cough'}]
+        async for event, payload in chatbot.stream_message_async('I have a cough', patient, history):
+            events.append(event)
+            if event == 'delta':
+                first_delta_seen.set()
+        return events
+
+    events = asyncio.run(scenario())
+
+    assert events[0] == 'start' and events[-1] == 'response'
+    assert events.count('delta') >= 2
+
+
+def test_rule_based_reply_arrives_as_one_delta(chatbot, patient, fresh_caches):
+    events = list(chatbot.stream_message('hello', patient, [{'role': 'user', 'message': 'hello'}]))
+
+    deltas = [payload['text'] for event, payload in events if event == 'delta']
+    assert deltas == [events[-1][1]['message']]
+
+
+def test_session_is_not_locked_while_streaming(chatbot, patient, fresh_caches, monkeypatch):
+    main = pytest.importorskip('main')
+    client = main.app.test_client()
+    session_id = client.post('/api/start_session', json=patient).get_json()['session_id']
+
+    lock_was_free = threading.Event()
+
+    def chat(messages, on_delta=None, **kwargs):
+        def take_lock():
+            with main.sessions.lock(session_id):
+                lock_was_free.set()
+        threading.Thread(target=take_lock, daemon=True).start()
+        lock_was_free.wait(5)
+        return 'Rest and fluids.'
+
+    monkeypatch.setattr(main, '_chatbot', chatbot)
+    monkeypatch.setattr(chatbot.llm, 'chat', chat)
+
+    response = client.post('/api/chat/stream', json={'message': 'I have a cough', 'session_id': session_id})
+    body = response.get_data(as_text=True)
+
+    assert lock_was_free.is_set()
+    assert 'event: done' in body
+    conversation = main.sessions.get(session_id)['conversation']
+    assert [message['role'] for message in conversation][-2:] == ['user', 'assistant']
+    final = [json.loads(line[len('data: '):]) for line in body.splitlines() if line.startswith('data: ')][-2]
+    assert conversation[-1]['message'] == final['message']
@@ -0,0 +1,46 @@
+# test_symptom_index.py
+import pytest
+
+from symptom_index import SymptomIndex
+
+PATTERNS = {
+    'flu': {'symptoms': ['fever', 'cough', 'fatigue', 'body aches']},
+    'cold': {'symptoms': ['cough', 'runny nose', 'sneezing']},
+    'migraine': {'symptoms': ['headache', 'nausea']},
+    'strep': {'symptoms': ['fever', 'sore throat']},
+}
+
+
+@pytest.fixture
+def index():
+    return SymptomIndex(PATTERNS)
+
+
+def test_scores_are_matched_over_pattern_size(index):
+    assert index.score(['fever', 'cough']) == [('flu', 0.5), ('cold', 1 / 3), ('strep', 0.5)]
+
+
+def test_only_diseases_sharing_a_symptom_are_scored(index):
+    assert index.score(['headache']) == [('migraine', 0.5)]
+    assert index.score(['unknown symptom']) == []
+    assert index.score([]) == []
+
+
+def test_threshold_is_exclusive(index):
+    assert index.score(['fever', 'cough'], threshold=0.5) == []
+    assert index.score(['fever', 'cough'], threshold=0.4) == [('flu', 0.5), ('strep', 0.5)]
+
+
+def test_repeated_symptoms_count_once(index):
+    assert index.score(['fever', 'fever', 'sore throat']) == [('flu', 0.25), ('strep', 1.0)]
+
+
+def test_batch_matches_single_queries(index):
+    queries = [['fever', 'cough'], ['headache', 'nausea', 'unknown'], [], ['sneezing', 'sneezing']]
+
+    batch = index.score_batch(queries, threshold=0.3)
+
+    for query, matches in zip(queries, batch):
+        expected = index.score(query, threshold=0.3)
+        assert [disease for disease, _ in matches] == [disease for disease, _ in expected]
+        assert [score for _, score in matches] == pytest.approx([score for _, score in expected])
@@ -0,0 +1,74 @@
+# test_symptom_normalizer.py
+import pytest
+
+from symptom_normalizer import SymptomNormalizer, lemma, phrase_key
+
+
+@pytest.fixture
+def normalizer():
+    return SymptomNormalizer()
+
+
+@pytest.mark.parametrize('word, expected', [
+    ('allergies', 'allergy'),
+    ('running', 'run'),
+    ('swelling', 'swell'),
+    ('feet', 'foot'),
+    ('sinus', 'sinus'),
+])
+def test_lemma(word, expected):
+    assert lemma(word) == expected
+
+
+@pytest.mark.parametrize('words', [
+    ('ache', 'aches'),
+    ('headache', 'headaches'),
+    ('nose', 'noses'),
+    ('bleed', 'bleeds', 'bleeding'),
+    ('vomit', 'vomited', 'vomiting'),
+])
+def test_inflections_share_a_stem(words):
+    assert len({lemma(word) for word in words}) == 1
+
+
+def test_phrase_key_drops_case_punctuation_and_filler():
+    assert phrase_key("I've got a really BAD Headache!") == phrase_key('ive bad headache')
+    assert phrase_key('my stomach aches') == phrase_key('stomach ache')
+
+
+@pytest.mark.parametrize('phrase', ['stomach ache', 'Stomach  Aches', 'tummy pain', 'my belly ache', 'stomachache'])
+def test_synonyms_and_inflections_map_to_the_canonical_symptom(normalizer, phrase):
+    assert normalizer.normalize(phrase) == 'abdominal pain'
+
+
+def test_unknown_symptoms_keep_a_cleaned_up_id(normalizer):
+    assert normalizer.normalize('  Itchy   ELBOW ') == 'itchy elbow'
+
+
+def test_normalize_all_dedupes_in_first_seen_order(normalizer):
+    assert normalizer.normalize_all(['tired', 'fever', 'exhaustion', '', None, 'high temperature']) == \
+        ['fatigue', 'fever']
+
+
+def test_ids_are_interned(normalizer):
+    first = normalizer.normalize('dizzy')
+    second = normalizer.normalize(''.join(['light', 'headed']))
+
+    assert first is second
+
+
+def test_registering_clears_the_memo_and_earlier_mappings_win(normalizer):
+    assert normalizer.normalize('hiccups') == 'hiccups'
+
+    normalizer.register('hiccough', ['hiccups'])
+    normalizer.register('other', ['hiccups'])
+
+    assert normalizer.normalize('hiccups') == 'hiccough'
+
+
+def test_repeated_phrases_hit_the_memo(normalizer):
+    normalizer.normalize('sore throat')
+    hits = normalizer.cache_info().hits
+    normalizer.normalize('sore throat')
+
+    assert normalizer.cache_info().hits == hits + 1
@@ -0,0 +1,40 @@
+# test_thinking_delay.py
+import medical_api
+from config import Config
+
+
+def _process(chatbot, patient, monkeypatch, mode):
+    """Process a message in the given THINKING_DELAY_MODE, returning the reply and the sleeps taken"""
+    sleeps = []
+    monkeypatch.setattr(Config, 'THINKING_DELAY_MODE', mode)
+    monkeypatch.setattr(medical_api.time, 'sleep', sleeps.append)
+    return chatbot.process_message('hello', patient, []), sleeps
+
+
+def test_client_mode_sends_a_typing_hint_without_sleeping(chatbot, patient, fresh_caches, monkeypatch):
+    response, sleeps = _process(chatbot, patient, monkeypatch, 'client')
+
+    assert 100 <= response['data']['typing_delay_ms'] <= 300
+    assert sleeps == []
+
+
+def test_client_mode_cache_hits_reply_at_once(chatbot, patient, fresh_caches, monkeypatch):
+    _process(chatbot, patient, monkeypatch, 'client')
+    response, sleeps = _process(chatbot, patient, monkeypatch, 'client')
+
+    assert 'typing_delay_ms' not in response['data']
+    assert sleeps == []
+
+
+def test_server_mode_sleeps_in_the_worker(chatbot, patient, fresh_caches, monkeypatch):
+    response, sleeps = _process(chatbot, patient, monkeypatch, 'server')
+
+    assert len(sleeps) == 1 and 0.1 <= sleeps[0] <= 0.3
+    assert 'typing_delay_ms' not in response['data']
+
+
+def test_off_mode_neither_sleeps_nor_hints(chatbot, patient, fresh_caches, monkeypatch):
+    response, sleeps = _process(chatbot, patient, monkeypatch, 'off')
+
+    assert sleeps == []
+    assert 'typing_delay_ms' not in response['data']
@@ -3,6 +3,7 @@ import json
 import os
 from typing import Dict, List, Any
 from datetime import datetime
+from symptom_normalizer import get_normalizer
 
 class TreatmentDatabase:
     def __init__(self):
@@ -11,6 +12,22 @@ class TreatmentDatabase:
         self.medications = self._load_medications()
         self.tests = self._load_tests()
         
+        # Symptom rules work on canonical symptom IDs (see symptom_normalizer.py)
+        self.normalizer = get_normalizer()
+        normalize_all = self.normalizer.normalize_all
+        self.test_rules = [
+            (frozenset(normalize_all(['fever', 'fatigue', 'infection'])),
+             ["Complete Blood Count (CBC)", "C-reactive Protein (CRP)"]),
+            (frozenset(normalize_all(['abdominal pain', 'nausea', 'vomiting'])),
+             ["Basic Metabolic Panel (BMP)", "Liver Function Tests"]),
+            (frozenset(normalize_all(['chest pain', 'shortness of breath', 'palpitations'])),
+             ["Electrocardiogram (ECG)", "Chest X-ray"]),
+            (frozenset(normalize_all(['headache', 'dizziness', 'neurological'])),
+             ["Neurological examination"])
+        ]
+        self.pain_relief_symptoms = frozenset(normalize_all(['fever', 'pain']))
+        self.cough_relief_symptoms = frozenset(normalize_all(['cough', 'congestion']))
+        
     def _load_treatments(self) -> Dict:
         """Load treatment database"""
         return {
@@ -149,7 +166,7 @@ class TreatmentDatabase:
     
     def _get_general_treatment(self, diagnosis: Dict, patient_data: Dict) -> Dict:
         """Get general treatment for unspecified diagnosis"""
-        symptoms = diagnosis.get('symptoms', [])
+        symptoms = self.normalizer.normalize_all(diagnosis.get('symptoms', []))
         
         general_treatment = {
             "name": "General Symptom Management",
@@ -165,14 +182,14 @@ class TreatmentDatabase:
         }
         
         # Add symptom-specific recommendations
-        if any(s in symptoms for s in ['fever', 'pain']):
+        if not self.pain_relief_symptoms.isdisjoint(symptoms):
             general_treatment['medications'].append({
                 "name": "Acetaminophen",
                 "purpose": "Fever and pain relief",
                 "dosage": "500mg every 6 hours as needed"
             })
         
-        if any(s in symptoms for s in ['cough', 'congestion']):
+        if not self.cough_relief_symptoms.isdisjoint(symptoms):
             general_treatment['medications'].append({
                 "name": "Dextromethorphan",
                 "purpose": "Cough suppression",
@@ -218,23 +235,12 @@ class TreatmentDatabase:
     
     def _get_recommended_tests(self, diagnosis: Dict) -> List[str]:
         """Get recommended tests based on diagnosis"""
-        symptoms = diagnosis.get('symptoms', [])
+        symptoms = frozenset(self.normalizer.normalize_all(diagnosis.get('symptoms', [])))
         tests = []
         
-        if any(s in symptoms for s in ['fever', 'fatigue', 'infection']):
-            tests.append("Complete Blood Count (CBC)")
-            tests.append("C-reactive Protein (CRP)")
-        
-        if any(s in symptoms for s in ['abdominal pain', 'nausea', 'vomiting']):
-            tests.append("Basic Metabolic Panel (BMP)")
-            tests.append("Liver Function Tests")
-        
-        if any(s in symptoms for s in ['chest pain', 'shortness of breath', 'palpitations']):
-            tests.append("Electrocardiogram (ECG)")
-            tests.append("Chest X-ray")
-        
-        if any(s in symptoms for s in ['headache', 'dizziness', 'neurological']):
-            tests.append("Neurological examination")
+        for rule_symptoms, rule_tests in self.test_rules:
+            if not rule_symptoms.isdisjoint(symptoms):
+                tests.extend(rule_tests)
         
         return tests[:5]  # Return max 5 tests
     